@@ -1,365 +1,556 @@
 import pandas as pd
 import numpy as np
-import tfidf_matcher as tm
 import datetime as dt
 import calendar
 import time
 import os
+import json
+import argparse
 import xlsxwriter
-from difflib import SequenceMatcher
 from functools import reduce
 from colorama import init
 from termcolor import colored
-
-init()
-
-elapsed_time = time.time()
-
-print(colored("#" * 130, 'magenta'))
-
-print(colored('''
-Hi there! Let\'s have a quick introduction to this script; it's designed to highlight irregularities in the underlying dataset
-to facilitate sampling and guide further analysis of these irregularities. Among the several tests performed by this script is
-the identification of similarities among different unrelated records using n_gram and tf-idf statistical measure, you'll be
-prompted to specify two parameters being n_gram and n_matches to be used in analysing the data and producing related results.
-It's advisable to use the default parameters being 3 and 10 for n_gram and n_match respectively, as they produce the best match
-results. However, feel free to tinker based on how your data is structured.
-
-What's an n_gram? For sake of simplicity, it's a sequence of N words. Example: for the word (McDonald's) an n_gram of 1 would be
-'m', 'c', 'd'. n_gram of 2 would be 'mc', 'cd', 'do'. n_gram of 3 would be 'mcd', 'cdo', 'don' and so on. Comparing (McDonald's) and
-(McDnld's) using this script will first generate an n_gram for each word then compute how closely they match.
-
-What about n_match? It's the number of possible matches you desire for a single word/record. You may be looking for only the first
-highest match or more than one possible matches, so adjust the number accordingly.
-''', 'cyan'))
-
-print(colored("#" * 130, 'magenta'))
-
-# path of current folder to load and save data
-path = os.path.dirname(os.path.abspath(__file__))
-
-# load data
-print('\nLoading data...\n')
-start_time = time.time()
-
-vmf_df = pd.read_csv(f'{path}\VMF_vendor_list.csv',
-                     sep='\t', encoding='utf-16')
-access_rights_df = pd.read_csv(
-    f'{path}\VMF_access_rights.csv', sep='\t', encoding='utf-16').dropna(how='all')
-employees_df = pd.read_csv(
-    f'{path}\VMF_employee_list.csv', sep='\t', encoding='utf-16').dropna(how='all')
-terminated_employees_df = pd.read_csv(
-    f'{path}\VMF_terminated_employees.csv', sep='\t', encoding='utf-16').dropna(how='all')
-po_df = pd.read_csv(f'{path}\VMF_po_list.csv', sep='\t',
-                    encoding='utf-16').dropna(how='all')
-
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
-
-# Apply proper dtypes
-print('\nApplying correct data type to columns...\n')
-start_time = time.time()
-
-vmf_df.name = vmf_df.name.astype(str)
-vmf_df.creation_date = pd.to_datetime(vmf_df.creation_date)
-vmf_df.modification_date = pd.to_datetime(vmf_df.modification_date)
-
-employees_df.employee_name = employees_df.employee_name.astype(str)
-employees_df.hiring_date = pd.to_datetime(employees_df.hiring_date)
-
-terminated_employees_df.employee_name = terminated_employees_df.employee_name.astype(
-    str)
-terminated_employees_df.hiring_date = pd.to_datetime(
-    terminated_employees_df.hiring_date)
-terminated_employees_df.termination_date = pd.to_datetime(
-    terminated_employees_df.termination_date)
-
-po_df.po_date = pd.to_datetime(po_df.po_date)
-po_df.po_total = po_df.po_total.str.replace(',', '').astype(int)
-
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
-
-# solicit user input for n_gram parameter
-while True:
-    n_gram = input(
-        'Please specify desired n_gram sequence from range of 1 to 6. Type \"d" for default (3) :').replace(" ", "").strip().lower()
-    if n_gram.isdigit():
-        if (int(n_gram) < 1) or (int(n_gram) > 6):
+from vmf_matcher import matcher, self_top_k_matches, fold_pairs, cached_ngram_index, transform_names
+from vmf_delta import load_state, save_state, data_as_of, changed_records, update_vendor_matches, update_employee_matches
+from vmf_similarity import batch_similarity, metric_available, METRICS
+from vmf_sweep import parameter_sweep
+from vmf_pipeline import Stage, run_stages, input_columns
+from vmf_io import read_inputs, iter_input_chunks, save_frame, INPUTS
+from vmf_employees import build_employee_index, lookup_employees, EMPLOYEE_COLUMNS
+from vmf_memory import compact_frame, compact_frames
+from vmf_fields import FIELD_COMPARATORS, compare_field, field_of
+from vmf_report import open_workbook, write_table, write_detail_sheets, save_detail_table, detail_formats
+from vmf_instrument import RunReport
+from vmf_names import canonical_names, cached_canonical_names, build_acronym_index, acronym_pairs, add_acronym_pairs, \
+    add_pairs, exact_pairs, expand_matches, expand_pairs, equal_names, match_types
+from vmf_blocking import BLOCKING_KEYS, record_blocks, candidate_pairs, blocked_top_k_pairs, blocked_self_top_k_pairs, \
+    estimate_recall_loss, blocking_summary, print_blocking_report
+from vmf_lsh import lsh_blocks, LSH_BANDS, LSH_ROWS, MAX_BANDS
+from vmf_keys import KEYS, build_key_codes, encode, join_positions, last_by_code, lookup_codes
+from vmf_clusters import cluster_labels, CLUSTER_SIMILARITY, CLUSTER_SCORE
+
+# similarity metric used by all name and details comparisons, set from the run settings,
+# 'ratio' matches difflib SequenceMatcher, see vmf_similarity.METRICS for faster options
+similarity_metric = 'ratio'
+
+
+def parse_settings():
+    '''command line and config file settings, any parameter given here skips its prompt'''
+    parser = argparse.ArgumentParser(
+        description='Vendor Master File automated test procedures.')
+    parser.add_argument('--config', help='JSON file holding any of n_gram, n_matches, weekends, abnormal_working_hours, '
+                        'similarity_metric, delta, workers, po_chunksize, checkpoint, low_memory, detail_format, excel_rows, profile, '
+                        'report_sheet, blocking, lsh, exact_only and workbook, command line values take precedence')
+    parser.add_argument('--n-gram', dest='n_gram', type=int, nargs='+',
+                        help='n_gram sequence, several values run a parameter sweep')
+    parser.add_argument('--n-matches', dest='n_matches', type=int, nargs='+',
+                        help='number of matches per name, several values run a parameter sweep')
+    parser.add_argument('--weekends', type=int, nargs='+',
+                        help='one or two weekend days, Monday being 0 and Sunday is 6')
+    parser.add_argument('--abnormal-hours', dest='abnormal_working_hours', type=int, nargs='+',
+                        help='first and optionally second hour of abnormal working hours (0 to 23)')
+    parser.add_argument('--similarity-metric', dest='similarity_metric',
+                        help='similarity metric used by all comparisons (ratio, quick or indel)')
+    parser.add_argument('--delta', choices=['y', 'n'],
+                        help='match only new or changed records when a previous run state exists')
+    parser.add_argument('--workers', type=int,
+                        help='number of tests run concurrently, 1 runs them one after another (default: cpu count)')
+    parser.add_argument('--po-chunksize', dest='po_chunksize', type=int,
+                        help='read the PO list in chunks of this many rows with bounded memory instead of loading it whole')
+    parser.add_argument('--checkpoint', nargs='+',
+                        help='intermediate results saved to vmf_cache/checkpoint as they are produced, i.e. r2 r3')
+    parser.add_argument('--low-memory', dest='low_memory', action='store_true', default=None,
+                        help='hold loaded data in compact dtypes (categories, Arrow strings, small integers) '
+                        'and report the memory footprint of each input')
+    parser.add_argument('--detail-format', dest='detail_format', choices=['parquet', 'csv'],
+                        help='also save every detail table in full to Results/VMF_Analysed as Parquet or gzipped CSV')
+    parser.add_argument('--excel-rows', dest='excel_rows', type=int,
+                        help='with --detail-format, keep only this many rows of each detail table in the workbook')
+    parser.add_argument('--profile', nargs='+',
+                        help='steps run under cProfile and tracemalloc, profiles are saved to Results/profile, '
+                        'i.e. r1 r15, load, save or all')
+    parser.add_argument('--report-sheet', dest='report_sheet', action='store_true', default=None,
+                        help='add the run report (time, memory and rows of every step) to the workbook')
+    parser.add_argument('--blocking', nargs='+', choices=BLOCKING_KEYS,
+                        help='score only names sharing a block under any of these keys, i.e. soundex postal prefix')
+    parser.add_argument('--lsh', type=int, nargs=2, metavar=('BANDS', 'ROWS'),
+                        help=f'approximate vendor name matching over MinHash/LSH buckets, i.e. {LSH_BANDS} {LSH_ROWS}')
+    parser.add_argument('--exact-only', dest='exact_only', action='store_true', default=None,
+                        help='list only exact (and abbreviation) name matches, skipping fuzzy matching')
+    parser.add_argument('--workbook', metavar='FILE',
+                        help='read the input lists from the sheets of this workbook (i.e. VMF.xlsm) instead of the CSV files')
+    args = parser.parse_args()
+
+    settings = {}
+
+    if args.config:
+        with open(args.config) as f:
+            settings.update(json.load(f))
+
+    settings.update({key: value for key, value in vars(args).items()
+                     if key != 'config' and value is not None})
+
+    if 'delta' in settings and isinstance(settings['delta'], str):
+        settings['delta'] = settings['delta'] == 'y'
+
+    # n_gram and n_matches accept a single value or a list of values to sweep
+    for key in ('n_gram', 'n_matches'):
+        if key in settings and not isinstance(settings[key], list):
+            settings[key] = [settings[key]]
+
+    return settings
+
+
+def load_data(path, cache_folder, columns=None, stream_po=False, low_memory=False, workbook=None):
+    '''loading all input lists with proper dtypes through the typed ingest cache,
+    CSV files (or the workbook, when given) are only decoded again when they change.
+    the PO list isn't loaded (None) when it's streamed,
+    low_memory converts all inputs to compact dtypes (see vmf_memory)'''
+    print('\nLoading data...\n')
+    start_time = time.time()
+
+    names = ['vendors', 'access_rights', 'employees', 'terminated_employees'] + \
+        ([] if stream_po else ['po'])
+
+    inputs = read_inputs(path, os.path.join(
+        cache_folder, 'inputs'), columns, names, workbook)
+
+    if low_memory:
+        print('\nCompacting data (memory in MB)...\n')
+        inputs = compact_frames(inputs)
+
+    print(
+        colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
+    print(colored('-'*80, 'magenta'))
+
+    return inputs['vendors'], inputs['access_rights'], inputs['employees'], inputs['terminated_employees'], inputs.get('po')
+
+
+# solicit user input for parameters, skipped for any parameter given by --config or command line
+def ask_n_gram():
+    '''solicit user input for n_gram parameter'''
+    while True:
+        n_gram = input(
+            'Please specify desired n_gram sequence from range of 1 to 6. Type \"d" for default (3) :').replace(" ", "").strip().lower()
+        if n_gram.isdigit():
+            if (int(n_gram) < 1) or (int(n_gram) > 6):
+                print(colored('Oops! That\'s not a valid input; please select only one n_gram from range of 1 to 6. Type \"d" for default (3)', 'yellow'))
+                continue
+            else:
+                print(colored(f'Selected n_gram ---> ### {n_gram} ### \n', 'cyan'))
+                return int(n_gram)
+        elif n_gram != 'd':
             print(colored('Oops! That\'s not a valid input; please select only one n_gram from range of 1 to 6. Type \"d" for default (3)', 'yellow'))
             continue
         else:
+            n_gram = 3
             print(colored(f'Selected n_gram ---> ### {n_gram} ### \n', 'cyan'))
-            n_gram = int(n_gram)
-            break
-    elif n_gram != 'd':
-        print(colored('Oops! That\'s not a valid input; please select only one n_gram from range of 1 to 6. Type \"d" for default (3)', 'yellow'))
-        continue
-    else:
-        n_gram = 3
-        print(colored(f'Selected n_gram ---> ### {n_gram} ### \n', 'cyan'))
-        break
-
-# solicit user input for n_matches parameter
-while True:
-    n_matches = input(
-        'Please specify desired nonzero n_matches within the maximum length of items being matched. Type \"d" for default (10) :').replace(" ", "").strip().lower()
-    if n_matches.isdigit():
-        if (int(n_matches) == 0) or (int(n_matches) > len(vmf_df.name.tolist())) or (int(n_matches) > len(employees_df.employee_name.tolist())) or (int(n_matches) > len(terminated_employees_df.employee_name.tolist())):
+            return n_gram
+
+
+def max_n_matches(vmf_df, employees_df, terminated_employees_df):
+    '''n_matches can't exceed the length of any list of names being matched'''
+    return min(len(vmf_df.name.tolist()), len(employees_df.employee_name.tolist()), len(terminated_employees_df.employee_name.tolist()))
+
+
+def ask_n_matches(max_matches):
+    '''solicit user input for n_matches parameter'''
+    while True:
+        n_matches = input(
+            'Please specify desired nonzero n_matches within the maximum length of items being matched. Type \"d" for default (10) :').replace(" ", "").strip().lower()
+        if n_matches.isdigit():
+            if (int(n_matches) == 0) or (int(n_matches) > max_matches):
+                print(colored('Oops! That\'s not a valid input; please select only a nonzero number within the maximum length of items being matched. Type \"d" for default (10)', 'yellow'))
+                continue
+            else:
+                print(
+                    colored(f'Selected n_matches ---> ### {n_matches} ### \n', 'cyan'))
+                return int(n_matches)
+        elif n_matches != 'd':
             print(colored('Oops! That\'s not a valid input; please select only a nonzero number within the maximum length of items being matched. Type \"d" for default (10)', 'yellow'))
             continue
         else:
+            n_matches = 10
             print(
                 colored(f'Selected n_matches ---> ### {n_matches} ### \n', 'cyan'))
-            n_matches = int(n_matches)
-            break
-    elif n_matches != 'd':
-        print(colored('Oops! That\'s not a valid input; please select only a nonzero number within the maximum length of items being matched. Type \"d" for default (10)', 'yellow'))
-        continue
-    else:
-        n_matches = 10
-        print(
-            colored(f'Selected n_matches ---> ### {n_matches} ### \n', 'cyan'))
-        break
-
-# solicit user input for weekend days
-weekends = []
-
-while True:
-    if len(weekends) < 1:
-        first_weekend_day = input(
-            'Please specify first weekend day in numeric form (0-6), Monday being 0 and Sunday is 6. Type \"d" for default (4-Fri/5-Sat) :').replace(" ", "").strip().lower()
-        if first_weekend_day.isdigit():
-            if (int(first_weekend_day) < 0) or (int(first_weekend_day) > 6):
-                print(colored(
-                    'Oops! That\'s not a valid input; please select only one day from range of (0-6)', 'yellow'))
-                continue
+            return n_matches
+
+
+def ask_weekends():
+    '''solicit user input for weekend days'''
+    weekends = []
+
+    while True:
+        if len(weekends) < 1:
+            first_weekend_day = input(
+                'Please specify first weekend day in numeric form (0-6), Monday being 0 and Sunday is 6. Type \"d" for default (4-Fri/5-Sat) :').replace(" ", "").strip().lower()
+            if first_weekend_day.isdigit():
+                if (int(first_weekend_day) < 0) or (int(first_weekend_day) > 6):
+                    print(colored(
+                        'Oops! That\'s not a valid input; please select only one day from range of (0-6)', 'yellow'))
+                    continue
+                else:
+                    weekends.append(int(first_weekend_day))
+                    print(colored(
+                        f'Selected first weekend day ---> ### {calendar.day_name[weekends[0]]} ### \n', 'cyan'))
+                    continue
+            elif (first_weekend_day != 'd'):
+                print(colored('Oops! That\'s not a valid input; please select only one day from range of (0-6). Type \"d" for default (4-Fri/5-Sat)', 'yellow'))
             else:
-                weekends.append(int(first_weekend_day))
+                weekends.append(4)
                 print(colored(
                     f'Selected first weekend day ---> ### {calendar.day_name[weekends[0]]} ### \n', 'cyan'))
                 continue
-        elif (first_weekend_day != 'd'):
-            print(colored('Oops! That\'s not a valid input; please select only one day from range of (0-6). Type \"d" for default (4-Fri/5-Sat)', 'yellow'))
         else:
-            weekends.append(4)
-            print(colored(
-                f'Selected first weekend day ---> ### {calendar.day_name[weekends[0]]} ### \n', 'cyan'))
-            continue
-    else:
-        second_weekend_day = input(
-            'Please specify second weekend day in numeric form (0-6), Monday being 0 and Sunday is 6. Type \"d" for default (4-Fri/5-Sat), \"N/A" to skip :').replace(" ", "").strip().lower()
-        if second_weekend_day.isdigit():
-            if (int(second_weekend_day) < 0) or (int(second_weekend_day) > 6):
+            second_weekend_day = input(
+                'Please specify second weekend day in numeric form (0-6), Monday being 0 and Sunday is 6. Type \"d" for default (4-Fri/5-Sat), \"N/A" to skip :').replace(" ", "").strip().lower()
+            if second_weekend_day.isdigit():
+                if (int(second_weekend_day) < 0) or (int(second_weekend_day) > 6):
+                    print(colored(
+                        'Oops! That\'s not a valid input; please select only one day from range of (0-6), use default or skip', 'yellow'))
+                    continue
+                else:
+                    weekends.append(int(second_weekend_day))
+                    print(colored(
+                        f'Selected second weekend day ---> ### {calendar.day_name[(weekends[1])]} ### \n', 'cyan'))
+                    return weekends
+            elif second_weekend_day == 'd':
+                weekends.append(5)
                 print(colored(
-                    'Oops! That\'s not a valid input; please select only one day from range of (0-6), use default or skip', 'yellow'))
-                continue
+                    f'Selected second weekend day ---> ### {calendar.day_name[(weekends[1])]} ### \n', 'cyan'))
+                return weekends
+            elif second_weekend_day == 'n/a':
+                print(colored(f'Selecting second weekend day has been skipped \n', 'cyan'))
+                return weekends
             else:
-                weekends.append(int(second_weekend_day))
                 print(colored(
-                    f'Selected second weekend day ---> ### {calendar.day_name[(weekends[1])]} ### \n', 'cyan'))
-                break
-        elif second_weekend_day == 'd':
-            weekends.append(5)
-            print(colored(
-                f'Selected second weekend day ---> ### {calendar.day_name[(weekends[1])]} ### \n', 'cyan'))
-            break
-        elif second_weekend_day == 'n/a':
-            print(colored(f'Selecting second weekend day has been skipped \n', 'cyan'))
-            break
-        else:
-            print(colored(
-                'Oops! That\'s not a valid input; please select only one day from range of (0-6), use default or skip', 'yellow'))
-            continue
+                    'Oops! That\'s not a valid input; please select only one day from range of (0-6), use default or skip', 'yellow'))
+                continue
 
-# solicit user input for abnormal working hours
-abnormal_working_hours = []
 
-while True:
-    if len(abnormal_working_hours) < 1:
-        first_abnormal_hour = input(
-            'Please specify first hour in abnormal working hours range using 24H format (0 to 23). Type \"d" for default (20) :').replace(" ", "").strip().lower()
-        if first_abnormal_hour.isdigit():
-            if (int(first_abnormal_hour)) not in np.arange(0, 24):
-                print(colored(
-                    'Oops! That\'s not a valid input; please specify first hour using 24H format (0 to 23). Type \"d" for default (20)', 'yellow'))
-                continue
+def ask_abnormal_working_hours():
+    '''solicit user input for abnormal working hours'''
+    abnormal_working_hours = []
+
+    while True:
+        if len(abnormal_working_hours) < 1:
+            first_abnormal_hour = input(
+                'Please specify first hour in abnormal working hours range using 24H format (0 to 23). Type \"d" for default (20) :').replace(" ", "").strip().lower()
+            if first_abnormal_hour.isdigit():
+                if (int(first_abnormal_hour)) not in np.arange(0, 24):
+                    print(colored(
+                        'Oops! That\'s not a valid input; please specify first hour using 24H format (0 to 23). Type \"d" for default (20)', 'yellow'))
+                    continue
+                else:
+                    abnormal_working_hours.append(int(first_abnormal_hour))
+                    print(colored(
+                        f'Selected first abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[0]), "%H").strftime("%I %p")} ### \n', 'cyan'))
+                    continue
+            elif (first_abnormal_hour != 'd'):
+                print(colored('Oops! That\'s not a valid input; please specify first hour using 24H format (0 to 23). Type \"d" for default (20)', 'yellow'))
             else:
-                abnormal_working_hours.append(int(first_abnormal_hour))
+                abnormal_working_hours.append(20)
                 print(colored(
                     f'Selected first abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[0]), "%H").strftime("%I %p")} ### \n', 'cyan'))
                 continue
-        elif (first_abnormal_hour != 'd'):
-            print(colored('Oops! That\'s not a valid input; please specify first hour using 24H format (0 to 23). Type \"d" for default (20)', 'yellow'))
         else:
-            abnormal_working_hours.append(20)
-            print(colored(
-                f'Selected first abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[0]), "%H").strftime("%I %p")} ### \n', 'cyan'))
-            continue
-    else:
-        second_abnormal_hour = input(
-            'Please specify second hour in abnormal working hours range using 24H format (0 to 23). Type \"d" for default (5), \"N/A" to skip :').replace(" ", "").strip().lower()
-        if second_abnormal_hour.isdigit():
-            if (int(second_abnormal_hour)) not in np.arange(0, 24):
-                print(colored(
-                    'Oops! That\'s not a valid input; please specify second hour using 24H format (0 to 23), use default or skip', 'yellow'))
-                continue
-            elif (int(second_abnormal_hour)) <= (int(abnormal_working_hours[0])):
-                if (int(abnormal_working_hours[0]) in np.arange(12, 24)) and (int(second_abnormal_hour) in np.arange(0, 12)):
+            second_abnormal_hour = input(
+                'Please specify second hour in abnormal working hours range using 24H format (0 to 23). Type \"d" for default (5), \"N/A" to skip :').replace(" ", "").strip().lower()
+            if second_abnormal_hour.isdigit():
+                if (int(second_abnormal_hour)) not in np.arange(0, 24):
+                    print(colored(
+                        'Oops! That\'s not a valid input; please specify second hour using 24H format (0 to 23), use default or skip', 'yellow'))
+                    continue
+                elif (int(second_abnormal_hour)) <= (int(abnormal_working_hours[0])):
+                    if (int(abnormal_working_hours[0]) in np.arange(12, 24)) and (int(second_abnormal_hour) in np.arange(0, 12)):
+                        abnormal_working_hours.append(int(second_abnormal_hour))
+                        print(colored(
+                            f'Selected second abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[1]), "%H").strftime("%I %p")} ### \n', 'cyan'))
+                        return abnormal_working_hours
+                    else:
+                        print(colored('Oops! That\'s not a valid input; please specify second hour that is greater than first hour using 24H format (0 to 23), use default or skip', 'yellow'))
+                        continue
+                else:
                     abnormal_working_hours.append(int(second_abnormal_hour))
                     print(colored(
                         f'Selected second abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[1]), "%H").strftime("%I %p")} ### \n', 'cyan'))
-                    break
-                else:
-                    print(colored('Oops! That\'s not a valid input; please specify second hour that is greater than first hour using 24H format (0 to 23), use default or skip', 'yellow'))
-                    continue
-            else:
-                abnormal_working_hours.append(int(second_abnormal_hour))
+                    return abnormal_working_hours
+            elif second_abnormal_hour == 'd':
+                abnormal_working_hours.append(5)
                 print(colored(
                     f'Selected second abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[1]), "%H").strftime("%I %p")} ### \n', 'cyan'))
-                break
-        elif second_abnormal_hour == 'd':
-            abnormal_working_hours.append(5)
-            print(colored(
-                f'Selected second abnormal hour ---> ### {dt.datetime.strptime(str(abnormal_working_hours[1]), "%H").strftime("%I %p")} ### \n', 'cyan'))
-            break
-        elif second_abnormal_hour == 'n/a':
-            print(colored(f'Selecting second abnormal hour has been skipped \n', 'cyan'))
-            break
-        else:
-            print(colored(
-                'Oops! That\'s not a valid input; please specify second hour using 24H format, use default or skip', 'yellow'))
-            continue
-
-print(colored('-'*80, 'magenta'))
+                return abnormal_working_hours
+            elif second_abnormal_hour == 'n/a':
+                print(colored(f'Selecting second abnormal hour has been skipped \n', 'cyan'))
+                return abnormal_working_hours
+            else:
+                print(colored(
+                    'Oops! That\'s not a valid input; please specify second hour using 24H format, use default or skip', 'yellow'))
+                continue
 
-# Recurring functions
 
+def check_settings(settings, max_matches):
+    '''validating parameters given by --config or command line against the same rules as the prompts'''
+    for n_gram in settings.get('n_gram', []):
+        if not 1 <= n_gram <= 6:
+            raise ValueError(
+                f'n_gram {n_gram} is not valid; please select n_gram from range of 1 to 6')
+
+    for n_matches in settings.get('n_matches', []):
+        if not 0 < n_matches <= max_matches:
+            raise ValueError(
+                f'n_matches {n_matches} is not valid; please select a nonzero number within the maximum length of items being matched')
+
+    weekends = settings.get('weekends')
+    if weekends is not None and not (1 <= len(weekends) <= 2 and all(0 <= day <= 6 for day in weekends)):
+        raise ValueError(
+            f'weekends {weekends} is not valid; please select one or two days from range of (0-6)')
+
+    hours = settings.get('abnormal_working_hours')
+    if hours is not None:
+        if not (1 <= len(hours) <= 2 and all(0 <= hour <= 23 for hour in hours)):
+            raise ValueError(
+                f'abnormal_working_hours {hours} is not valid; please select one or two hours using 24H format (0 to 23)')
+        if len(hours) == 2 and hours[1] <= hours[0] and not (hours[0] >= 12 and hours[1] < 12):
+            raise ValueError(
+                f'abnormal_working_hours {hours} is not valid; second hour must be greater than first hour')
+
+    workers = settings.get('workers')
+    if workers is not None and workers < 1:
+        raise ValueError(
+            f'workers {workers} is not valid; please select at least one worker')
+
+    po_chunksize = settings.get('po_chunksize')
+    if po_chunksize is not None and po_chunksize < 1:
+        raise ValueError(
+            f'po_chunksize {po_chunksize} is not valid; please select a chunk size of at least one row')
+
+    detail_format = settings.get('detail_format')
+    if detail_format is not None and detail_format not in detail_formats():
+        raise ValueError(
+            f'detail_format {detail_format} is not valid; please select one of {detail_formats()}, parquet requires pyarrow')
+
+    excel_rows = settings.get('excel_rows')
+    if excel_rows is not None and (excel_rows < 0 or detail_format is None):
+        raise ValueError(
+            f'excel_rows {excel_rows} is not valid; please select a positive number of rows along with a detail_format')
+
+    results = {name for stage in STAGES + STREAMED_PO_STAGES for name in stage.outputs
+               if name.startswith('r')}
+    for name in settings.get('checkpoint', []):
+        if name not in results:
+            raise ValueError(
+                f'checkpoint {name} is not valid; please select results produced by the tests, i.e. r2 r3')
+
+    steps = {name for stage in STAGES + STREAMED_PO_STAGES for name in stage.outputs} | {'load', 'save', 'all'}
+    for name in settings.get('profile', []):
+        if name not in steps:
+            raise ValueError(
+                f'profile {name} is not valid; please select outputs of the tests, load, save or all, i.e. r1 r15')
+
+    for key in settings.get('blocking', []):
+        if key not in BLOCKING_KEYS:
+            raise ValueError(
+                f'blocking key {key} is not valid; please select any of {BLOCKING_KEYS}')
+
+    lsh = settings.get('lsh')
+    if lsh is not None and (len(lsh) != 2 or not 1 <= lsh[0] <= MAX_BANDS or lsh[1] < 1):
+        raise ValueError(
+            f'lsh {lsh} is not valid; please select a number of bands from 1 to {MAX_BANDS} and of rows per band of at least one')
+
+    if settings.get('similarity_metric', 'ratio') not in METRICS:
+        raise ValueError(
+            f'similarity_metric {settings["similarity_metric"]} is not valid; please select one of {METRICS}')
+
+    if not metric_available(settings.get('similarity_metric', 'ratio')):
+        raise ValueError(
+            "similarity_metric indel requires rapidfuzz; please install it or select 'ratio'")
 
-def similar(df, col1, col2):
-    '''calculate similarities of returned results from tfidf matcher
-    to facilitate filtering results'''
-    return round(SequenceMatcher(None, df[col1], df[col2]).ratio(), 2)
 
 
-def similar_with_nan(df, col1, col2):
-    '''calculate similarities between two dataframe columns while ignoring nan values'''
-    if not df[[col1, col2]].isnull().any():
-        return round(SequenceMatcher(None, df[col1], df[col2]).ratio(), 2)
-    else:
-        return 0
+# Recurring functions
 
 
 def non_english_names(name):
     return name.isascii()
 
 
-def employee_vs_vendor_records(vendor_df, employee_df, n_gram, n_matches):
+# details of the vendor and employee records listed with every name match
+VENDOR_DETAIL_COLUMNS = ['id', 'name', 'vendor_status', 'phone', 'postal_code', 'address',
+                         'taxpayer_identification_number_tin']
+EMPLOYEE_DETAIL_COLUMNS = ['employee_id', 'employee_name', 'phone', 'postal_code', 'address',
+                           'social_security_number_ssn']
+
+# columns of the employee vs. vendor name matching results
+EMPLOYEE_MATCH_COLUMNS = ['employee_id', 'employee_name', 'vendor_name', 'vendor_id', 'similarity', 'match_type',
+                          'vendor_status', 'employee_phone', 'vendor_phone', 'employee_postal_code', 'vendor_postal_code',
+                          'employee_address', 'vendor_address', 'employee_ssn', 'vendor_tin']
+
+
+def similar_names(left_names, right_names):
+    '''similarities of two aligned lists of canonical names (see vmf_names),
+    equal names score 1 without being compared'''
+    left_names = np.asarray(left_names, dtype=object)
+    right_names = np.asarray(right_names, dtype=object)
+
+    equal = equal_names(left_names, right_names)
+
+    scores = np.ones(len(left_names), dtype=float)
+
+    scores[~equal] = np.round(batch_similarity(
+        left_names[~equal], right_names[~equal], metric=similarity_metric), 2)
+
+    return scores
+
+
+def employee_vs_vendor_records(vendor_df, employee_df, vendor_names, employee_names, n_gram, n_matches,
+                               vendor_index=None, stored_matches=None, vendor_delta=None, changed_employees=None):
     '''finding exact and fuzzy matches between employee and vendor names
     based on user specified n_gram and number of desired matches 'n_matches'.
+    names are matched and scored on their canonical forms (vendor_names and employee_names,
+    aligned to the frames) and reported as written in the frames.
     results are not filtered but are sorted in a descending order for convenience.
+    vendor_index is the n_gram index of canonical vendor names, fitted here if not provided.
+    stored_matches are the matches of the previous run for a delta run (see vmf_delta), with vendor_delta
+    the changed vendors and removed vendor ids and changed_employees flagging the new or changed employee records.
+    returns the records and the matches of every name by vendor id
     '''
+    employee_names = np.asarray(employee_names, dtype=object)
 
-    # identifying which datafram is loaded to properly name results while saving
-    # as this function will be applied for both active and terminated employees
-    employee_status = ''
+    # matching the first employee of every canonical name, its matches are then listed for the others
+    first = np.flatnonzero(~pd.Series(employee_names).duplicated().to_numpy() | (employee_names == ''))
 
-    if employee_df is employees_df:
-        employee_status = 'active'
+    if stored_matches is None:
+        # applying match function, pairs are returned as positions rather than as one column per match
+        employee_pos, vendor_pos, _ = matcher(
+            employee_names[first], vendor_names, n_gram=n_gram, n_matches=n_matches, index=vendor_index)
     else:
-        employee_status = 'terminated'
+        # only names whose matches may have changed since the previous run are matched again,
+        # names shared by any new or changed employee record included
+        changed_names = np.isin(employee_names[first], employee_names[changed_employees])
 
-    # preparing list of names to match
-    vendor_names_list = vendor_df.name.tolist()
+        employee_pos, vendor_pos, _ = update_employee_matches(
+            stored_matches, transform_names(vendor_index, list(employee_names[first])), employee_names[first],
+            changed_names, vendor_index['matrix'], vendor_df.id.to_numpy(), *vendor_delta, n_matches)
 
-    employee_names_list = employee_df.employee_name.tolist()
+    matches = pd.DataFrame({'name': employee_names[first][employee_pos],
+                            'vendor_id': vendor_df.id.to_numpy()[vendor_pos]})
 
-    # applying match function, adjusting data view and calculating similarities of returned results
-    em_name_match_df = tm.matcher(
-        employee_names_list, vendor_names_list, ngram_length=n_gram, k_matches=n_matches)
+    # matches are reported for every employee and every vendor sharing the matched names, each pair once
+    employee_pos, vendor_pos = expand_matches(first[employee_pos], vendor_pos, vendor_names, employee_names)
 
-    em_name_match_df = pd.merge(em_name_match_df, employee_df[[
-                                'employee_id']], left_index=True, right_index=True, how='left')
+    return employee_positions_to_records(employee_pos, vendor_pos, vendor_df, employee_df, vendor_names,
+                                         employee_names), matches
 
-    em_name_match_df.drop_duplicates(subset='Original Name', inplace=True)
 
-    em_name_match_df.drop(columns=['Match Confidence'], inplace=True)
+def vendor_pairs_to_records(vendor_pos, match_pos, vendor_df, vendor_names, acronym=None):
+    '''collecting all match vendor details of matched vendor positions
+    and sorting data for better view and comparison, names are scored on their
+    canonical forms, acronym flags the pairs found by the acronym index'''
+    vendor_details = vendor_df[VENDOR_DETAIL_COLUMNS].reset_index(drop=True)
 
-    em_name_match_df.reset_index(drop=True, inplace=True)
+    vendor_x = vendor_details.take(vendor_pos).reset_index(drop=True)
 
-    em_name_match_df = em_name_match_df.melt(
-        id_vars=["Original Name", 'employee_id'], ignore_index=False)
+    vendor_y = vendor_details.take(match_pos).reset_index(drop=True)
 
-    em_name_match_df.drop(columns=['variable'], inplace=True)
+    vendor_names = np.asarray(vendor_names, dtype=object)
 
-    em_name_match_df.reset_index(drop=True, inplace=True)
+    vn_name_match_df = pd.DataFrame({'vendor_id': vendor_x.id, 'vendor_name': vendor_x.name,
+                                     'match_vendor_name': vendor_y.name, 'match_vendor_id': vendor_y.id})
 
-    em_name_match_df['similarity'] = em_name_match_df.apply(
-        similar, args=('Original Name', 'value'), axis=1)
+    vn_name_match_df['similarity'] = similar_names(
+        vendor_names[vendor_pos], vendor_names[match_pos])
 
-    em_name_match_df.drop_duplicates(inplace=True)
+    vn_name_match_df['match_type'] = match_types(
+        vendor_names[vendor_pos], vendor_names[match_pos], acronym)
 
-    em_name_match_df.rename(columns={'value': 'name'}, inplace=True)
+    vn_name_match_df['vendor_status'] = vendor_y.vendor_status
 
-    em_name_match_df.index = em_name_match_df.name
+    for column, label in [('phone', 'phone'), ('postal_code', 'postal_code'), ('address', 'address'),
+                          ('taxpayer_identification_number_tin', 'tin')]:
+        vn_name_match_df[f'vendor_{label}'] = vendor_x[column]
+        vn_name_match_df[f'match_vendor_{label}'] = vendor_y[column]
 
-    vendor_df.index = vendor_df.name
+    return vn_name_match_df.sort_values(by='similarity', ascending=False)
 
-    # collecting vendor details for matched vendors
-    em_name_match_df = pd.merge(em_name_match_df, vendor_df[[
-                                'id', 'vendor_status']], left_index=True, right_index=True, how='left')
 
-    em_name_match_df.reset_index(drop=True, inplace=True)
+def employee_positions_to_records(employee_pos, vendor_pos, vendor_df, employee_df, vendor_names, employee_names):
+    '''collecting all employee/vendor details of matched employee and vendor positions,
+    same data view as employee_vs_vendor_records'''
+    employee_x = employee_df[EMPLOYEE_DETAIL_COLUMNS].take(employee_pos).reset_index(drop=True)
 
-    vendor_df.reset_index(drop=True, inplace=True)
+    vendor_y = vendor_df[VENDOR_DETAIL_COLUMNS].take(vendor_pos).reset_index(drop=True)
 
-    # removing reverse duplicate matches to eliminate data redundancy,
-    # i.e: match result of x,y and y,x basically refer to same records
-    # first we join and sort both names to create a unique value for each result
-    # then drop duplicate joined names
-    em_name_match_df['reverse_duplicates'] = em_name_match_df.apply(
-        lambda row: ' '.join(sorted([row['Original Name'], row['name']])), axis=1)
+    employee_keys = np.asarray(employee_names, dtype=object)[employee_pos]
 
-    em_name_match_df.drop_duplicates(subset='reverse_duplicates', inplace=True)
+    vendor_keys = np.asarray(vendor_names, dtype=object)[vendor_pos]
 
-    em_name_match_df.drop(columns='reverse_duplicates', inplace=True)
+    em_name_match_df = pd.DataFrame({'employee_id': employee_x.employee_id, 'employee_name': employee_x.employee_name,
+                                     'vendor_name': vendor_y.name, 'vendor_id': vendor_y.id})
 
-    em_name_match_df.reset_index(drop=True, inplace=True)
+    em_name_match_df['similarity'] = similar_names(employee_keys, vendor_keys)
 
-    # collecting all employee/vendor details and sorting data for better view and comparison
-    em_name_match_df = pd.merge(em_name_match_df, employee_df[[
-                                'employee_id', 'phone', 'postal_code', 'address', 'social_security_number_ssn']], on='employee_id', how='left')
+    em_name_match_df['match_type'] = match_types(employee_keys, vendor_keys)
 
-    em_name_match_df.rename(columns={'Original Name': 'employee_name', 'phone': 'employee_phone', 'postal_code': 'employee_postal_code',
-                            'address': 'employee_address', 'social_security_number_ssn': 'employee_ssn'}, inplace=True)
+    em_name_match_df['vendor_status'] = vendor_y.vendor_status
 
-    em_name_match_df = pd.merge(em_name_match_df, vendor_df[[
-                                'id', 'phone', 'postal_code', 'address', 'taxpayer_identification_number_tin']], on='id', how='left')
+    for employee_column, vendor_column, employee_label, vendor_label in [
+            ('phone', 'phone', 'employee_phone', 'vendor_phone'),
+            ('postal_code', 'postal_code', 'employee_postal_code', 'vendor_postal_code'),
+            ('address', 'address', 'employee_address', 'vendor_address'),
+            ('social_security_number_ssn', 'taxpayer_identification_number_tin', 'employee_ssn', 'vendor_tin')]:
+        em_name_match_df[employee_label] = employee_x[employee_column]
+        em_name_match_df[vendor_label] = vendor_y[vendor_column]
 
-    em_name_match_df.rename(columns={'id': 'vendor_id', 'name': 'vendor_name', 'phone': 'vendor_phone', 'postal_code': 'vendor_postal_code',
-                            'address': 'vendor_address', 'taxpayer_identification_number_tin': 'vendor_tin'}, inplace=True)
+    return em_name_match_df.sort_values(by='similarity', ascending=False)
 
-    result_columns = em_name_match_df.columns.tolist()
-    columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:3]+result_columns[4:5]+result_columns[3:4] \
-        + result_columns[5:6]+result_columns[6:7]+result_columns[10:11]+result_columns[7:8]+result_columns[11:12]+result_columns[8:9] \
-        + result_columns[12:13]+result_columns[9:10]+result_columns[13:]
 
-    em_name_match_df = em_name_match_df[columns_sort].sort_values(
-        by='similarity', ascending=False)
+def employee_vs_vendor_blocked(vendor_df, employee_df, vendor_names, employee_names, vendor_index, candidates,
+                               n_matches):
+    '''blocked version of employee_vs_vendor_records, only candidate pairs of employees
+    and vendors sharing a block are scored (see vmf_blocking)'''
+    employee_matrix = transform_names(vendor_index, list(employee_names))
+
+    employee_pos, vendor_pos, _ = blocked_top_k_pairs(
+        employee_matrix, vendor_index['matrix'], *candidates, n_matches)
+
+    return employee_positions_to_records(employee_pos, vendor_pos, vendor_df, employee_df, vendor_names, employee_names)
 
-    # saving results based on type of dataframe loaded into the function
-    if employee_status == 'active':
-        em_name_match_df.to_csv(
-            (os.path.join(path, 'Active_em_name_match.csv')), index=False)
-        r = em_name_match_df.copy()
-    else:
-        em_name_match_df.to_csv(
-            (os.path.join(path, 'Terminated_em_name_match.csv')), index=False)
-        r = em_name_match_df.copy()
 
-    return r
+def employee_vs_vendor_matching(vendor_df, employee_df, vendor_names, employee_names, vendor_index, exact, candidates,
+                                exact_only, n_gram, n_matches, stored_matches=None, vendor_delta=None,
+                                employee_delta=None):
+    '''exact pairs of equal canonical names are listed first, only employees without any exact match
+    are then matched by the fuzzy engine, over their candidate pairs when blocked (see block_records).
+    exact_only skips fuzzy matching altogether. a delta run starts from stored_matches (see employee_vs_vendor_records),
+    employee_delta flagging the new or changed employee records.
+    returns the records and the fuzzy matches kept for the next delta run, None when blocked or exact only'''
+    employee_pos, vendor_pos = exact
+
+    matches = None
+
+    records = [employee_positions_to_records(employee_pos, vendor_pos, vendor_df, employee_df, vendor_names,
+                                             employee_names)]
+
+    print(colored(f'{len(employee_pos)} exact name matches', 'cyan'))
+
+    if not exact_only:
+        rest = np.setdiff1d(np.arange(len(employee_df)), employee_pos)
+
+        if candidates is not None:
+            keep = np.isin(candidates[0], rest)
+            records.append(employee_vs_vendor_blocked(vendor_df, employee_df, vendor_names, employee_names, vendor_index,
+                                                      (candidates[0][keep], candidates[1][keep]), n_matches))
+        elif len(rest):
+            fuzzy, matches = employee_vs_vendor_records(vendor_df, employee_df.iloc[rest], vendor_names,
+                                                        np.asarray(employee_names, dtype=object)[rest], n_gram,
+                                                        n_matches, vendor_index, stored_matches, vendor_delta,
+                                                        None if employee_delta is None else employee_delta[rest])
+            records.append(fuzzy)
+        else:
+            matches = pd.DataFrame({'name': [], 'vendor_id': []})
+
+    return pd.concat(records, ignore_index=True).sort_values(by='similarity', ascending=False), matches
 
 
 def weekday_or_weekend(date_col):
@@ -369,902 +560,1372 @@ def weekday_or_weekend(date_col):
     return dt.datetime.weekday(date_col)
 
 
-print('\nVendor records exact and fuzzy name matching...\n')
-start_time = time.time()
-#  vendor records exact and fuzzy matches
+def details_similarity(name_match_df):
+    '''similarity of every pair of details columns following the name similarity,
+    considering only close name matches and abbreviations of full names. each field is scored by its comparator
+    (see vmf_fields.FIELD_COMPARATORS), the total adds up the name and all details scores'''
+    temp_df = name_match_df[(name_match_df.similarity >= .6) | (
+        name_match_df.match_type == 'acronym')].copy()
 
-# finding exact and fuzzy matches between vendor names to identify possible duplicates
-# based on user specified n_gram and number of desired matches 'n_matches'.
-# n_gram and n_matches default values are 3 and 10 respectively which mostly yield best results
-# results are not filtered but are sorted in a descending order for convenience.
+    score_columns = []
 
-# preparing list of names to match
-vendor_name = vmf_df.name.tolist()
+    # details columns come in pairs after the vendor status
+    for i, e in zip(*[iter(temp_df.columns[temp_df.columns.get_loc('vendor_status') + 1:])] * 2):
+        field = field_of(i)
+        print('matching' + ' ' + i + ' ' + 'with' + ' ' + e +
+              ' (' + FIELD_COMPARATORS.get(field, similarity_metric) + ')')
+        temp_df[i] = np.round(compare_field(
+            field, temp_df[i], temp_df[e], metric=similarity_metric), 2)
+        temp_df.drop(columns=e, inplace=True)
+        score_columns.append(i)
 
-match_name = vmf_df.name.tolist()
+    temp_df['total_similarity_score'] = temp_df['similarity'] + \
+        temp_df[score_columns].sum(axis=1)
 
-# applying match function, adjusting data view and calculating similarities of returned results
-vn_name_match_df = tm.matcher(
-    vendor_name, match_name, ngram_length=n_gram, k_matches=n_matches)
+    return temp_df.sort_values(by='total_similarity_score', ascending=False)
 
-vn_name_match_df = pd.merge(
-    vn_name_match_df, vmf_df[['id']], left_index=True, right_index=True, how='left')
 
-vn_name_match_df.drop_duplicates(subset='Original Name', inplace=True)
+# Test procedures
+# each test reads only the values named by its parameters and returns its results,
+# see STAGES below for the outputs of every test and the order they can run in.
 
-vn_name_match_df.drop(columns=['Match Confidence', 'Lookup 1'], inplace=True)
 
-vn_name_match_df.reset_index(drop=True, inplace=True)
+def encode_keys(vmf_df, access_rights_df, employees_df, terminated_employees_df, po_df):
+    '''integer codes of the vendor names and user ids joining the input lists (see vmf_keys),
+    PO chunks of a streamed PO list are encoded by the tests reading them'''
+    return build_key_codes({'vendors': vmf_df, 'access_rights': access_rights_df, 'employees': employees_df,
+                            'terminated_employees': terminated_employees_df, 'po': po_df})
 
-vn_name_match_df = vn_name_match_df.melt(
-    id_vars=["Original Name", 'id'], ignore_index=False)
 
-vn_name_match_df.drop(columns=['variable'], inplace=True)
+def normalize_names(vmf_df, employees_df, terminated_employees_df, cache_folder):
+    '''canonical vendor and employee names (see vmf_names), aligned to their frames,
+    computed once for all name tests and saved next to the input files, with the acronym index of vendor names'''
+    names_folder = os.path.join(cache_folder, 'names')
 
-vn_name_match_df.reset_index(drop=True, inplace=True)
+    vendor_names, employee_names, terminated_names = (
+        pd.Series(cached_canonical_names(df[col], names_folder), index=df.index, name='canonical_name')
+        for df, col in [(vmf_df, 'name'), (employees_df, 'employee_name'), (terminated_employees_df, 'employee_name')])
 
-vn_name_match_df['similarity'] = vn_name_match_df.apply(
-    similar, args=('Original Name', 'value'), axis=1)
+    return vendor_names, employee_names, terminated_names, build_acronym_index(vmf_df.name)
 
-vn_name_match_df.index = vn_name_match_df.value
 
-vmf_df.index = vmf_df.name
+def fit_vendor_name_index(vendor_names, n_gram, cache_folder):
+    '''canonical vendor names are vectorized once and the index is saved next to the input files,
+    it's reused by the employee tests and by later runs over an unchanged vendor list'''
+    return cached_ngram_index(list(vendor_names), n_gram, cache_folder)
 
-# collecting vendor details for matched vendors
-vn_name_match_df = pd.merge(vn_name_match_df, vmf_df[[
-                            'id', 'vendor_status']], left_index=True, right_index=True, how='left')
 
-vn_name_match_df.reset_index(drop=True, inplace=True)
+def exact_name_matching(vendor_names, employee_names, terminated_names):
+    '''pairs of equal canonical names among vendors and between employees and vendors,
+    found by a hash join before any fuzzy matching (see vmf_names.exact_pairs)'''
+    return {'vendors': exact_pairs(vendor_names), 'active': exact_pairs(employee_names, vendor_names),
+            'terminated': exact_pairs(terminated_names, vendor_names)}
 
-vmf_df.reset_index(drop=True, inplace=True)
 
-# remove duplicate records
-temp_df = vn_name_match_df.groupby(
-    ['id_x', 'Original Name', 'id_y', 'value', 'similarity', 'vendor_status'])['value'].count().to_frame()
+def block_records(vmf_df, employees_df, terminated_employees_df, vendor_names, employee_names, terminated_names,
+                  vendor_name_index, n_matches, blocking, lsh, delta_state):
+    '''candidate pairs of the name matching tests by test (vendors, active, terminated), vendors are paired
+    by MinHash/LSH buckets when lsh (bands, rows) is given (see vmf_lsh), otherwise by the selected blocking keys,
+    employees by the blocking keys only (see vmf_blocking). returns the candidates with a report of the pairs pruned
+    and the estimated share of matches lost. delta runs already match only new or changed records and aren't blocked'''
+    candidates, report = {}, []
 
-vn_name_match_df = temp_df.index.to_frame()
+    if delta_state is not None:
+        return candidates, None
 
-vn_name_match_df.reset_index(drop=True, inplace=True)
+    tests = [('active', employees_df, employee_names), ('terminated', terminated_employees_df, terminated_names)] \
+        if blocking else []
 
-# remove exact id matches
-vn_name_match_df = vn_name_match_df[vn_name_match_df.id_x !=
-                                    vn_name_match_df.id_y]
+    if blocking or lsh:
+        tests.insert(0, ('vendors', vmf_df, vendor_names))
 
-vn_name_match_df[['id_x', 'id_y']
-                 ] = vn_name_match_df[['id_x', 'id_y']].astype(str)
+    vendor_blocks = record_blocks(vendor_names, vmf_df.postal_code, blocking) if blocking else None
 
-# removing reverse duplicate matches to eliminate data redundancy,
-# i.e: match result of x,y and y,x basically refer to same records
-# first we join and sort both vendor ids to create a unique value for each result
-# then drop duplicate joined ids
-vn_name_match_df['reverse_duplicates'] = vn_name_match_df.apply(
-    lambda row: ''.join(sorted([row.id_x, row.id_y])), axis=1)
+    for test, df, names in tests:
+        self_match = test == 'vendors'
 
-vn_name_match_df.drop_duplicates(subset='reverse_duplicates', inplace=True)
+        keys = blocking
 
-vn_name_match_df.drop(columns='reverse_duplicates', inplace=True)
+        if self_match and lsh:
+            keys = ['lsh {}x{}'.format(*lsh)]
+            query_blocks = lookup_blocks = lsh_blocks(vendor_name_index['matrix'], *lsh)
+        else:
+            lookup_blocks = vendor_blocks
+            query_blocks = vendor_blocks if self_match else record_blocks(names, df.postal_code, blocking)
+
+        left, right, skipped = candidate_pairs(query_blocks, lookup_blocks, len(df), len(vmf_df), self_match)
 
-vn_name_match_df.reset_index(drop=True, inplace=True)
+        query_matrix = vendor_name_index['matrix'] if self_match else transform_names(
+            vendor_name_index, list(names))
 
-# collecting all match vendor details and sorting data for better view and comparison
-vn_name_match_df[['id_x', 'id_y']] = vn_name_match_df[[
-    'id_x', 'id_y']].astype(float)
+        recall = estimate_recall_loss(query_matrix, vendor_name_index['matrix'], left, right, n_matches, names,
+                                      vendor_names, self_match, metric=similarity_metric)
 
-vn_name_match_df.rename(
-    columns={'id_x': 'id', 'Original Name': 'name'}, inplace=True)
+        candidates[test] = (left, right)
 
-vn_name_match_df = pd.merge(vn_name_match_df, vmf_df[[
-                            'id', 'phone', 'postal_code', 'address', 'taxpayer_identification_number_tin']], on='id', how='left')
+        report.append(blocking_summary(test, keys, len(df), len(vmf_df), left, right, skipped, recall, self_match))
 
-vn_name_match_df.rename(columns={'id': 'vendor_id', 'name': 'vendor_name', 'phone': 'vendor_phone', 'postal_code': 'vendor_postal_code',
-                        'address': 'vendor_address', 'taxpayer_identification_number_tin': 'vendor_tin'}, inplace=True)
+    if not report:
+        return candidates, None
 
-vn_name_match_df.rename(columns={'id_y': 'id', 'value': 'name'}, inplace=True)
+    report = pd.DataFrame(report)
 
-vn_name_match_df = pd.merge(vn_name_match_df, vmf_df[[
-                            'id', 'phone', 'postal_code', 'address', 'taxpayer_identification_number_tin']], on='id', how='left')
+    print_blocking_report(report)
 
-vn_name_match_df.rename(columns={'id': 'match_vendor_id', 'name': 'match_vendor_name', 'phone': 'match_vendor_phone',
-                        'postal_code': 'match_vendor_postal_code', 'address': 'match_vendor_address', 'taxpayer_identification_number_tin': 'match_vendor_tin'}, inplace=True)
+    return candidates, report
 
-result_columns = vn_name_match_df.columns.tolist()
 
-columns_sort = result_columns[:2]+result_columns[3:4]+result_columns[2:3]+result_columns[4:6]+result_columns[6:7] \
-    + result_columns[10:11]+result_columns[7:8]+result_columns[11:12]+result_columns[8:9]+result_columns[12:13] \
-    + result_columns[9:10]+result_columns[13:]
+def vendor_name_matching(vmf_df, vendor_names, acronym_index, vendor_name_index, exact_matches, candidates, exact_only,
+                         n_gram, n_matches, delta_state):
+    '''vendor records exact and fuzzy matches'''
+    # finding exact and fuzzy matches between vendor names to identify possible duplicates
+    # based on user specified n_gram and number of desired matches 'n_matches'.
+    # n_gram and n_matches default values are 3 and 10 respectively which mostly yield best results
+    # results are not filtered but are sorted in a descending order for convenience.
+    # vendors sharing a canonical name are paired by exact_name_matching, only the first of them
+    # is matched by the fuzzy engine so the exact twins aren't scored against each other again,
+    # its fuzzy matches are then listed for all of them
+    vendor_delta = matches = vendor_matches = None
 
-vn_name_match_df = vn_name_match_df[columns_sort].sort_values(
-    by='similarity', ascending=False)
+    exact_left, exact_right = exact_matches['vendors']
 
-r1 = vn_name_match_df.copy()
+    print(colored(f'{len(exact_left)} exact name matches', 'cyan'))
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    names = np.asarray(vendor_names, dtype=object)
 
-print('\nActive employees vs. vendor records exact and fuzzy name matching...\n')
-start_time = time.time()
-# Active employees records vs. vendors records
+    first = np.flatnonzero(~pd.Series(names).duplicated().to_numpy() | (names == ''))
 
-r2 = employee_vs_vendor_records(vmf_df, employees_df, n_gram, n_matches)
+    if delta_state is not None:
+        # only names whose matches may have changed are matched again against the full index,
+        # the others keep the matches stored by the previous run
+        vendor_delta = changed_records(vmf_df, 'id', 'name', ['creation_date', 'modification_date'],
+                                       delta_state['tables']['vendors'], delta_state['as_of'])
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+        print(colored(
+            f'{vendor_delta[0].sum()} new or changed vendor records', 'cyan'))
 
-print('\nTerminated employees vs. vendor records exact and fuzzy name matching...\n')
-start_time = time.time()
-# Terminated employees records vs. vendors records
+        matches = update_vendor_matches(delta_state['tables']['vendor_matches'], vendor_name_index['matrix'][first],
+                                        names[first], n_matches)
+    elif exact_only:
+        vendor_pos = match_pos = np.zeros(0, dtype=np.int64)
+    elif 'vendors' in candidates:
+        # scoring only the pairs of vendors sharing a block or an LSH bucket
+        left, right = candidates['vendors']
+        keep = np.isin(left, first) & np.isin(right, first)
+        vendor_pos, match_pos, _ = blocked_self_top_k_pairs(
+            vendor_name_index['matrix'], left[keep], right[keep], n_matches)
+        vendor_pos, match_pos = expand_pairs(vendor_pos, match_pos, vendor_names)
+    else:
+        # applying self match function to the first vendor of every canonical name,
+        # every vendor is ranked against all the others
+        matches = self_top_k_matches(vendor_name_index['matrix'][first], n_matches)
 
-r3 = employee_vs_vendor_records(
-    vmf_df, terminated_employees_df, n_gram, n_matches)
+    if matches is not None:
+        # matches kept by name for the next delta run
+        vendor_matches = pd.DataFrame({'name': names[first[matches[0]]], 'match_name': names[first[matches[1]]]})
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+        # each pair of vendor records is returned once, never matched to itself nor in reverse order,
+        # then listed for all vendors sharing the matched names
+        vendor_pos, match_pos, _ = fold_pairs(*matches, len(first))
+        vendor_pos, match_pos = expand_pairs(first[vendor_pos], first[match_pos], vendor_names)
 
-print('\nFiltering out non-English names...\n')
-start_time = time.time()
-# lang_filter
+    vendor_pos, match_pos, _ = add_pairs(vendor_pos, match_pos, exact_left, exact_right)
 
-r4 = vmf_df[~vmf_df['name'].apply(non_english_names)]
+    # abbreviations share too few n_grams with their full names to be matched above,
+    # they are looked up in the acronym index instead, on every run as lookups are cheap
+    vendor_pos, match_pos, acronym = add_acronym_pairs(
+        vendor_pos, match_pos, *acronym_pairs(acronym_index, vmf_df.name))
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    # collecting all match vendor details and sorting data for better view and comparison
+    r1 = vendor_pairs_to_records(vendor_pos, match_pos, vmf_df, vendor_names, acronym)
 
-print('\nIdentifying all POs issued to employees...\n')
-start_time = time.time()
-# POs issued to employees
-# identify all POs issued in the name of employees either active or terminated,
-# using the r3/r4 and linking to po list
-# both exact and fuzzy name matches are considered
+    return r1, vendor_delta, vendor_matches
 
-active = pd.read_csv(f'{path}\Active_em_name_match.csv')
-terminated = pd.read_csv(f'{path}\Terminated_em_name_match.csv')
 
-# building the dataframe
-# filtering close matches, according to difflib official documentation
-# value over 0.6 means the sequences are close matches
-fltrd_active_temp_df = active[active.similarity >= .6].copy()
+def employee_changes(employee_df, date_cols, snapshot, as_of):
+    '''employee records that are new, renamed, hired or terminated since the previous run'''
+    changed, _ = changed_records(employee_df, 'employee_id', 'employee_name', date_cols, snapshot, as_of)
 
-fltrd_active_temp_df['employee_status'] = 'Active'
+    print(colored(f'{changed.sum()} new or changed employee records', 'cyan'))
 
-fltrd_term_temp_df = terminated[terminated.similarity >= .6].copy()
+    return changed
 
-fltrd_term_temp_df['employee_status'] = 'Terminated'
 
-employee_vs_po_list = fltrd_active_temp_df.append(
-    fltrd_term_temp_df, ignore_index=True)
+def active_employee_matching(vmf_df, employees_df, vendor_names, employee_names, vendor_name_index, exact_matches,
+                             candidates, exact_only, vendor_delta, n_gram, n_matches, delta_state):
+    '''Active employees records vs. vendors records'''
+    stored_matches = employee_delta = None
 
-# mapping termination date to terminated employees
-for i in employee_vs_po_list.employee_name.unique():
+    if delta_state is not None:
+        stored_matches = delta_state['tables']['active_matches']
+        employee_delta = employee_changes(employees_df, ['hiring_date'], delta_state['tables']['active_employees'],
+                                          delta_state['as_of'])
 
-    term_date_dict = terminated_employees_df.set_index(
-        'employee_name').to_dict()['termination_date']
+    return employee_vs_vendor_matching(vmf_df, employees_df, vendor_names, employee_names, vendor_name_index,
+                                       exact_matches['active'], candidates.get('active'), exact_only, n_gram, n_matches,
+                                       stored_matches, vendor_delta, employee_delta)
 
-    if i in terminated_employees_df.employee_name.values:
 
-        employee_vs_po_list['termination_date'] = employee_vs_po_list.employee_name.map(
-            term_date_dict)
+def terminated_employee_matching(vmf_df, terminated_employees_df, vendor_names, terminated_names, vendor_name_index,
+                                 exact_matches, candidates, exact_only, vendor_delta, n_gram, n_matches, delta_state):
+    '''Terminated employees records vs. vendors records'''
+    stored_matches = employee_delta = None
 
-    else:
+    if delta_state is not None:
+        stored_matches = delta_state['tables']['terminated_matches']
+        employee_delta = employee_changes(terminated_employees_df, ['hiring_date', 'termination_date'],
+                                          delta_state['tables']['terminated_employees'], delta_state['as_of'])
+
+    return employee_vs_vendor_matching(vmf_df, terminated_employees_df, vendor_names, terminated_names,
+                                       vendor_name_index, exact_matches['terminated'], candidates.get('terminated'),
+                                       exact_only, n_gram, n_matches, stored_matches, vendor_delta, employee_delta)
+
+
+def save_delta_state(vmf_df, employees_df, terminated_employees_df, vendor_matches, active_matches,
+                     terminated_matches, n_gram, n_matches, delta_folder, delta_supported):
+    '''saving vendor and employee names and fuzzy matches of this run for the next delta run,
+    blocked and exact only runs don't rank every name and save nothing'''
+    tables = {'vendor_matches': vendor_matches, 'active_matches': active_matches,
+              'terminated_matches': terminated_matches}
 
-        employee_vs_po_list['termination_date'] = 'N/A'
+    if not delta_supported or any(table is None for table in tables.values()):
+        return False
 
-employee_vs_po_list = pd.merge(employee_vs_po_list, po_df[[
-                               'vendor_name', 'po_number', 'po_date', 'po_status', 'po_total', 'currency']], on='vendor_name', how='left')
+    save_state(delta_folder, data_as_of([vmf_df.creation_date, vmf_df.modification_date, employees_df.hiring_date,
+                                         terminated_employees_df.hiring_date, terminated_employees_df.termination_date]),
+               n_gram, n_matches, dict(tables, vendors=vmf_df[['id', 'name']],
+                                       active_employees=employees_df[['employee_id', 'employee_name']],
+                                       terminated_employees=terminated_employees_df[['employee_id', 'employee_name']]))
 
-# remove records of employees having no po issued in thier name
-temp_df = employee_vs_po_list.groupby(['employee_id', 'employee_name', 'vendor_name', 'vendor_id', 'similarity', 'vendor_status',
-                                      'employee_status', 'termination_date', 'po_date', 'po_number', 'po_status', 'po_total', 'currency'])['po_number'].count().to_frame()
+    return True
 
-employee_vs_po_list = temp_df.index.to_frame()
 
-employee_vs_po_list.reset_index(drop=True, inplace=True)
+def non_english_vendor_names(vmf_df):
+    '''lang_filter'''
+    return vmf_df[~vmf_df['name'].apply(non_english_names)]
 
-r5 = employee_vs_po_list.sort_values(by='similarity', ascending=False)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+def employee_close_matches(r2, r3, employee_index):
+    '''close name matches of active and terminated employees with their termination date'''
+    # building the dataframe
+    # filtering close matches, according to difflib official documentation
+    # value over 0.6 means the sequences are close matches
+    fltrd_active_temp_df = r2[r2.similarity >= .6].copy()
 
-print('\nIdentifying unauthorized record manipulation...\n')
-start_time = time.time()
-# access rights review
-# identify any unauthorized record manipulation
-# by comparing edit history to approved access rights and employee records
+    fltrd_active_temp_df['employee_status'] = 'Active'
 
-# building the dataframe
-creation_temp_df = vmf_df[~vmf_df.creation_user_id.isin(
-    access_rights_df.creation_user_id)]
+    fltrd_term_temp_df = r3[r3.similarity >= .6].copy()
 
-modification_temp_df = vmf_df[~vmf_df.modification_user_id.isin(
-    access_rights_df.modification_user_id)]
+    fltrd_term_temp_df['employee_status'] = 'Terminated'
 
-access_rights_review_df = creation_temp_df.append(modification_temp_df)
+    employee_vs_po_list = pd.concat(
+        [fltrd_active_temp_df, fltrd_term_temp_df], ignore_index=True)
 
-access_rights_review_df.reset_index(drop=True, inplace=True)
+    # mapping termination date to terminated employees, active employees have none
+    termination_date = lookup_employees(employee_index, employee_vs_po_list.employee_id, ['termination_date'],
+                                        status='Terminated').termination_date
 
-employees_df['employee_status'] = 'Active'
+    employee_vs_po_list['termination_date'] = termination_date.where(
+        (employee_vs_po_list.employee_status == 'Terminated').to_numpy()).to_numpy()
 
-terminated_employees_df['employee_status'] = 'Terminated'
+    return employee_vs_po_list
 
-# adjusting column length to exact match in both dataframes
-fltrt_term_df = terminated_employees_df[employees_df.columns]
 
-temp_employee_df = employees_df.append(fltrt_term_df)
+def employee_po_records(employee_vs_po_list, po_df, po_codes, key_codes):
+    '''linking employee close matches to the POs issued to the matched vendors,
+    po_codes are the vendor name codes of the PO list (see vmf_keys)'''
+    # joining on vendor name codes, every PO is listed for each vendor record sharing its vendor name
+    match_pos, po_pos = join_positions(
+        encode(key_codes['vocabularies']['vendor_name'], employee_vs_po_list.vendor_name), po_codes)
 
-# collecting all active/terminated employee details and sorting data for better view and comparison
-access_rights_review_df.index = access_rights_review_df.creation_user_id
+    employee_vs_po_list = pd.concat([employee_vs_po_list.take(match_pos).reset_index(drop=True), po_df[[
+        'po_number', 'po_date', 'po_status', 'po_total', 'currency']].take(po_pos).reset_index(drop=True)], axis=1)
 
-temp_employee_df.index = temp_employee_df.employee_id
+    # remove records of employees having no po issued in thier name, each record is listed once
+    employee_vs_po_list = employee_vs_po_list.loc[employee_vs_po_list.po_number.notna(), [
+        'employee_id', 'employee_name', 'vendor_name', 'vendor_id', 'similarity', 'vendor_status', 'employee_status',
+        'termination_date', 'po_date', 'po_number', 'po_status', 'po_total', 'currency']].drop_duplicates()
 
-access_rights_review_df = pd.merge(access_rights_review_df, temp_employee_df[[
-                                   'departement', 'employee_status', 'employee_name']], left_index=True, right_index=True, how='left')
+    employee_vs_po_list.reset_index(drop=True, inplace=True)
 
-access_rights_review_df.rename(columns={'departement': 'creation_user_departement',
-                               'employee_status': 'creation_user_status', 'employee_name': 'creation_user_name'}, inplace=True)
+    return employee_vs_po_list
 
-access_rights_review_df.index = access_rights_review_df.modification_user_id
 
-access_rights_review_df = pd.merge(access_rights_review_df, temp_employee_df[[
-                                   'departement', 'employee_status', 'employee_name']], left_index=True, right_index=True, how='left')
+def pos_issued_to_employees(r2, r3, employee_index, po_df, key_codes):
+    '''POs issued to employees'''
+    # identify all POs issued in the name of employees either active or terminated,
+    # using the r3/r4 and linking to po list
+    # both exact and fuzzy name matches are considered
+    employee_vs_po_list = employee_close_matches(
+        r2, r3, employee_index)
 
-access_rights_review_df.rename(columns={'departement': 'modification_user_departement', 'employee_status': 'modification_user_status',
-                               'employee_name': 'modification_user_name', 'id': 'vendor_id', 'name': 'vendor_name'}, inplace=True)
+    return employee_po_records(employee_vs_po_list, po_df, key_codes['codes'][('po', 'vendor_name')],
+                               key_codes).sort_values(by='similarity', ascending=False)
 
-# mapping termination date to terminated employees
-for i in access_rights_review_df.creation_user_id.unique():
-    term_date_dict = terminated_employees_df.set_index(
-        'employee_id').to_dict()['termination_date']
 
-    if i in terminated_employees_df.employee_id.values:
-        access_rights_review_df['termination_date'] = access_rights_review_df.creation_user_id.map(
-            term_date_dict)
+def unauthorized_access(vmf_df, access_rights_df, employee_index, key_codes):
+    '''access rights review'''
+    # identify any unauthorized record manipulation
+    # by comparing edit history to approved access rights and employee records
+    codes = key_codes['codes']
+
+    # building the dataframe, user ids are compared on their codes
+    creation_temp_df = vmf_df[~np.isin(codes[('vendors', 'creation_user_id')],
+                                       codes[('access_rights', 'creation_user_id')])]
+
+    modification_temp_df = vmf_df[~np.isin(codes[('vendors', 'modification_user_id')],
+                                           codes[('access_rights', 'modification_user_id')])]
+
+    access_rights_review_df = pd.concat([creation_temp_df, modification_temp_df])
+
+    access_rights_review_df.reset_index(drop=True, inplace=True)
+
+    # collecting all active/terminated employee details of the creation and modification users
+    for user_id, label in [('creation_user_id', 'creation_user'), ('modification_user_id', 'modification_user')]:
+        user_df = lookup_employees(employee_index, access_rights_review_df[user_id], [
+                                   'departement', 'employee_status', 'employee_name'])
+
+        for column, detail in [('departement', 'departement'), ('employee_status', 'status'), ('employee_name', 'name')]:
+            access_rights_review_df[f'{label}_{detail}'] = user_df[column].to_numpy()
+
+    access_rights_review_df.rename(
+        columns={'id': 'vendor_id', 'name': 'vendor_name'}, inplace=True)
+
+    # mapping termination date to terminated employees,
+    # that of the creation user when terminated, of the modification user otherwise
+    creation_termination, modification_termination = [
+        lookup_employees(employee_index, access_rights_review_df[user_id], ['termination_date'],
+                         status='Terminated').termination_date
+        for user_id in ('creation_user_id', 'modification_user_id')]
+
+    access_rights_review_df['termination_date'] = creation_termination.combine_first(
+        modification_termination).to_numpy()
+
+    access_rights_review_df.drop_duplicates(subset='vendor_id', inplace=True)
+
+    access_rights_review_df.reset_index(drop=True, inplace=True)
+
+    result_columns = access_rights_review_df.columns.tolist()
+
+    columns_sort = result_columns[0:3]+result_columns[9:10]+result_columns[11:12]+result_columns[14:15]+result_columns[17:18] \
+        + result_columns[19:]+result_columns[10:11]+result_columns[13:14]+result_columns[15:16]+result_columns[12:13] \
+        + result_columns[16:17]+result_columns[18:19]
+
+    return access_rights_review_df[columns_sort].copy()
+
+
+def employees_editing_own_records(r6):
+    '''Employees editing their own vendor records'''
+    # both exact and fuzzy name matches are considered
+    # results are filtered to the nearest match
+    # names are scored on their canonical forms like the name matching tests (see vmf_names),
+    # missing names score 0
+    access_rights_review_df = r6.copy()
+
+    vendor_names = canonical_names(access_rights_review_df.vendor_name)
+
+    for label in ('creation', 'modification'):
+        user_names = canonical_names(access_rights_review_df[f'{label}_user_name'])
+
+        access_rights_review_df[f'similarity_{label}'] = np.where(
+            (vendor_names != '') & (user_names != ''), similar_names(vendor_names, user_names), 0)
+
+    return access_rights_review_df[(access_rights_review_df.similarity_creation >= .6) | (
+        access_rights_review_df.similarity_modification >= .6)]
+
+
+def weekend_and_abnormal_hours_modifications(vmf_df, weekends, abnormal_working_hours):
+    '''Weekends modifications and at abnormal working hours,
+    also returns all records created or modified at abnormal working hours for their summary'''
+    temp_vmf_df = vmf_df.copy()
+
+    temp_vmf_df['creation_hour'] = temp_vmf_df['creation_date'].dt.hour
+
+    temp_vmf_df['modification_hour'] = temp_vmf_df['modification_date'].dt.hour
+
+    temp_vmf_df['creation_day'] = temp_vmf_df.creation_date.apply(
+        weekday_or_weekend)
+
+    temp_vmf_df['modification_day'] = temp_vmf_df.modification_date.apply(
+        weekday_or_weekend)
+
+    # modifications on weekends
+
+    r8 = temp_vmf_df[(temp_vmf_df.creation_day.isin(weekends)) |
+                     (temp_vmf_df.modification_day.isin(weekends))]
+
+    result_columns = r8.columns.tolist()
+
+    columns_sort = result_columns[0:3]+result_columns[9:]
+
+    r8 = r8[columns_sort]
+
+    # late modifications after normal working hours,
+    # excluding records already identified in weekend modification to avoid duplication
+
+    if len(abnormal_working_hours) > 1:
+        if abnormal_working_hours[0] in np.arange(12, 24):
+            temp_creation_df = temp_vmf_df[(temp_vmf_df.creation_hour >= abnormal_working_hours[0]) | (
+                temp_vmf_df.creation_hour <= abnormal_working_hours[1])]
+
+            temp_modification_df = temp_vmf_df[(temp_vmf_df.modification_hour >= abnormal_working_hours[0]) | (
+                temp_vmf_df.modification_hour <= abnormal_working_hours[1])]
+        else:
+            temp_creation_df = temp_vmf_df[(temp_vmf_df.creation_hour >= abnormal_working_hours[0]) & (
+                temp_vmf_df.creation_hour <= abnormal_working_hours[1])]
+
+            temp_modification_df = temp_vmf_df[(temp_vmf_df.modification_hour >= abnormal_working_hours[0]) & (
+                temp_vmf_df.modification_hour <= abnormal_working_hours[1])]
     else:
-        access_rights_review_df['termination_date'] = access_rights_review_df.modification_user_id.map(
-            term_date_dict)
+        temp_creation_df = temp_vmf_df[(
+            temp_vmf_df.creation_hour == abnormal_working_hours[0])]
+
+        temp_modification_df = temp_vmf_df[(
+            temp_vmf_df.modification_hour == abnormal_working_hours[0])]
+
+    # filter out records already identified as abnormal creation hour
+    temp_modification_df = temp_modification_df[~temp_modification_df.id.isin(
+        temp_creation_df.id)]
+
+    r9 = pd.concat([temp_creation_df, temp_modification_df])
+
+    r9.reset_index(drop=True, inplace=True)
+
+    result_columns = r9.columns.tolist()
+
+    columns_sort = result_columns[0:3]+result_columns[9:]
+
+    r9 = r9[columns_sort]
+
+    # filter out records already identified as weekend modification
+    r9 = r9[~r9.id.isin(r8.id)]
+
+    return r8, r9, temp_creation_df, temp_modification_df
+
+
+def vendor_status_by_name(vmf_df, key_codes):
+    '''status of every vendor name code, that of the last vendor record holding the name'''
+    return last_by_code(key_codes['codes'][('vendors', 'name')], vmf_df.vendor_status,
+                        len(key_codes['vocabularies']['vendor_name']), 'vendor status')
+
+
+def pos_for_inactive_vendors(vmf_df, po_df, key_codes):
+    '''PO issued to inactive vendors'''
+    # mapping vendor status to po list through vendor name codes
+    vendor_status = lookup_codes(vendor_status_by_name(vmf_df, key_codes), key_codes['codes'][('po', 'vendor_name')])
+
+    # only POs of inactive vendors are copied
+    return po_df[vendor_status == 'In-Active'].assign(
+        vendor_status='In-Active').sort_values(by='po_total', ascending=False)
+
+
+def vendor_id_gaps(vmf_df):
+    '''Gaps in vendor id sequential order and duplicate records'''
+
+    # building dataframe: vendor records
+
+    vendor_gaps_df = vmf_df.sort_values(by='id')
+
+    vendor_gaps_df['start'] = vendor_gaps_df['id']
+
+    vendor_gaps_df['end'] = vendor_gaps_df['id'].shift(-1)
 
-access_rights_review_df.drop_duplicates(subset = 'vendor_id', inplace =True)
-        
-access_rights_review_df.reset_index(drop=True, inplace=True)
+    vendor_gaps_df['gap'] = vendor_gaps_df['id'].shift(-1) - vendor_gaps_df['id']
 
-temp_employee_df.reset_index(drop=True, inplace=True)
+    # vendor id gaps
+    r11 = vendor_gaps_df[(vendor_gaps_df['gap'] > 0) &
+                         (vendor_gaps_df['gap'] != 1)]
 
-result_columns = access_rights_review_df.columns.tolist()
+    # vendor id duplicates
+    r12 = vendor_gaps_df[(vendor_gaps_df['gap'] == 0)].dropna()
 
-columns_sort = result_columns[0:3]+result_columns[9:10]+result_columns[11:12]+result_columns[14:15]+result_columns[17:18] \
-    + result_columns[19:]+result_columns[10:11]+result_columns[13:14]+result_columns[15:16]+result_columns[12:13] \
-    + result_columns[16:17]+result_columns[18:19]
+    return r11, r12
 
-access_rights_review_df = access_rights_review_df[columns_sort]
 
-r6 = access_rights_review_df.copy()
+def po_number_gaps(po_df):
+    '''Gaps in po number sequential order and duplicate records'''
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    # building dataframe: po records
 
-print('\nIdentifying employees editing their own vendor records...\n')
-start_time = time.time()
-# Employees editing their own vendor records
-# both exact and fuzzy name matches are considered
-# results are filtered to the nearest match
+    # stable sort so duplicates keep the order they're listed in, same as the streaming version
+    po_gaps_df = po_df.sort_values(by='po_number', kind='stable')
 
-access_rights_review_df['similarity_creation'] = access_rights_review_df.apply(
-    similar, args=('vendor_name', 'creation_user_name'), axis=1)
+    po_gaps_df['start'] = po_gaps_df['po_number']
 
-access_rights_review_df['similarity_modification'] = access_rights_review_df.apply(
-    similar, args=('vendor_name', 'modification_user_name'), axis=1)
+    po_gaps_df['end'] = po_gaps_df['po_number'].shift(-1)
 
-r7 = access_rights_review_df[(access_rights_review_df.similarity_creation >= .6) | (
-    access_rights_review_df.similarity_modification >= .6)]
+    po_gaps_df['gap'] = po_gaps_df['po_number'].shift(-1) - po_gaps_df['po_number']
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    # po number gaps
+    r13 = po_gaps_df[(po_gaps_df['gap'] > 0) & (po_gaps_df['gap'] != 1)]
 
-print('\nIdentifying vendor records manipulation on weekend and/or at abnormal working hours...\n')
-start_time = time.time()
-# Weekends modifications and at abnormal working hours
+    # po number duplicates
+    r14 = po_gaps_df[(po_gaps_df['gap'] == 0)].dropna()
 
-temp_vmf_df = vmf_df.copy()
+    return r13, r14
 
-temp_vmf_df['creation_hour'] = temp_vmf_df['creation_date'].dt.hour
 
-temp_vmf_df['modification_hour'] = temp_vmf_df['modification_date'].dt.hour
+def vendor_details_similarity(r1):
+    '''similarity across all vendor data,
+    considering only highest possible match'''
+    return details_similarity(r1)
 
-temp_vmf_df['creation_day'] = temp_vmf_df.creation_date.apply(
-    weekday_or_weekend)
 
-temp_vmf_df['modification_day'] = temp_vmf_df.modification_date.apply(
-    weekday_or_weekend)
+def active_employee_details_similarity(r2):
+    '''similarity across all active employee vs. vendor data,
+    considering only highest possible match'''
+    return details_similarity(r2)
 
-# modifications on weekends
 
-r8 = temp_vmf_df[(temp_vmf_df.creation_day.isin(weekends)) |
-                 (temp_vmf_df.modification_day.isin(weekends))]
+def terminated_employee_details_similarity(r3):
+    '''similarity across all terminated employee vs. vendor data,
+    considering only highest possible match'''
+    return details_similarity(r3)
 
-result_columns = r8.columns.tolist()
 
-columns_sort = result_columns[0:3]+result_columns[9:]
+def pos_after_termination(r5):
+    '''terminated employees with highest number of POs placed after termination date,
+    exact matches are only considered'''
+    r18 = r5[(r5.termination_date) < (r5.po_date)]
 
-r8 = r8[columns_sort]
+    # filter for exact matches only
 
-# late modifications after normal working hours,
-# excluding records already identified in weekend modification to avoid duplication
+    fltrd_r18 = r18[r18.similarity == 1]
 
-if len(abnormal_working_hours) > 1:
-    if abnormal_working_hours[0] in np.arange(12, 24):
-        temp_creation_df = temp_vmf_df[(temp_vmf_df.creation_hour >= abnormal_working_hours[0]) | (
-            temp_vmf_df.creation_hour <= abnormal_working_hours[1])]
+    earliest_po_date = fltrd_r18.groupby(
+        ['employee_id', 'employee_name', 'termination_date'])['po_date'].min().to_frame()
 
-        temp_modification_df = temp_vmf_df[(temp_vmf_df.modification_hour >= abnormal_working_hours[0]) | (
-            temp_vmf_df.modification_hour <= abnormal_working_hours[1])]
+    po_count_df = fltrd_r18.groupby(['employee_id', 'employee_name', 'termination_date'])[
+        'po_number'].count().to_frame()
+
+    po_value_df = fltrd_r18.groupby(['employee_id', 'employee_name', 'termination_date'])[
+        'po_total'].sum().to_frame()
+
+    df_list = [earliest_po_date, po_count_df,
+               po_value_df, earliest_po_date.index.to_frame()]
+
+    r18_summary = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True, how='outer'), df_list).rename(
+        columns={'po_date': 'earliest_po_date', 'po_number': 'po_count', 'po_total': 'sum_po_values'})
+
+    result_columns = r18_summary.columns.tolist()
+
+    columns_sort = result_columns[3:]+result_columns[0:1]+result_columns[1:3]
+
+    r18_summary = r18_summary[columns_sort].sort_values(
+        by='sum_po_values', ascending=False)
+
+    r18_summary.reset_index(drop=True, inplace=True)
+
+    return r18, r18_summary
+
+
+def missing_vendor_details(vmf_df):
+    '''missing vendor details'''
+    missing_details_count = vmf_df.isna().sum()
+
+    r19 = missing_details_count[missing_details_count > 0].to_frame()
+
+    r19 = pd.merge(r19.index.to_frame(), r19, left_index=True, right_index=True, how='left').rename(
+        columns={'0_x': 'missing_records', '0_y': 'missing_records_count'})
+
+    r19.reset_index(drop=True, inplace=True)
+
+    return r19
+
+
+def inactive_vendor_po_summary(r10):
+    '''summary of po details for inactive vendors'''
+    po_count = r10.groupby('vendor_name')['po_number'].count()
+
+    po_value = r10.groupby(['vendor_name', 'currency'], observed=True)[
+        'po_total'].sum()
+
+    return po_totals_summary(po_count, po_value)
+
+
+def po_totals_summary(po_count, po_value):
+    '''po count per vendor and po values per vendor and currency laid out for the summary'''
+    po_count = po_count.to_frame()
+
+    po_value = po_value.to_frame()
+
+    df_list = [po_value, po_count, po_count.index.to_frame()]
+
+    r20 = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True,
+                 how='outer'), df_list).rename(columns={'po_number': 'po_count', 'po_total': 'sum_po_values'})
+
+    r20.reset_index(drop=True, inplace=True)
+
+    result_columns = r20.columns.tolist()
+
+    columns_sort = result_columns[2:]+result_columns[1:2]+result_columns[0:1]
+
+    return r20[columns_sort].sort_values(by='sum_po_values', ascending=False)
+
+
+def weekend_modifications_summary(r8, access_rights_df, weekends):
+    '''summary of weekends modification'''
+    if len(weekends) > 1:
+        temp_days_creation = r8[(r8.creation_day == weekends[0]) | (
+            r8.creation_day == weekends[1])]
+
+        temp_days_modification = r8[(r8.modification_day == weekends[0]) | (
+            r8.modification_day == weekends[1])]
     else:
-        temp_creation_df = temp_vmf_df[(temp_vmf_df.creation_hour >= abnormal_working_hours[0]) & (
-            temp_vmf_df.creation_hour <= abnormal_working_hours[1])]
+        temp_days_creation = r8[(r8.creation_day == weekends[0])]
 
-        temp_modification_df = temp_vmf_df[(temp_vmf_df.modification_hour >= abnormal_working_hours[0]) & (
-            temp_vmf_df.modification_hour <= abnormal_working_hours[1])]
-else:
-    temp_creation_df = temp_vmf_df[(
-        temp_vmf_df.creation_hour == abnormal_working_hours[0])]
+        temp_days_modification = r8[(r8.modification_day == weekends[0])]
 
-    temp_modification_df = temp_vmf_df[(
-        temp_vmf_df.modification_hour == abnormal_working_hours[0])]
+    weekends_creation = temp_days_creation.groupby(['creation_user_id'])[
+        'creation_day'].count().to_frame()
 
-# filter out records already identified as abnormal creation hour
-temp_modification_df = temp_modification_df[~temp_modification_df.id.isin(
-    temp_creation_df.id)]
+    weekends_modification = temp_days_modification.groupby(
+        ['modification_user_id'])['modification_day'].count().to_frame()
 
-r9 = temp_creation_df.append(temp_modification_df)
+    r21 = pd.merge(weekends_creation, weekends_creation.index.to_frame(), left_index=True,
+                   right_index=True, how='left').rename(columns={'creation_day': 'created_records_count'})
 
-r9.reset_index(drop=True, inplace=True)
+    r22 = pd.merge(weekends_modification, weekends_modification.index.to_frame(), left_index=True,
+                   right_index=True, how='left').rename(columns={'modification_day': 'modified_records_count'})
 
-result_columns = r9.columns.tolist()
+    r21['user_authorized'] = r21.creation_user_id.isin(
+        access_rights_df.creation_user_id)
 
-columns_sort = result_columns[0:3]+result_columns[9:]
+    r22['user_authorized'] = r22.modification_user_id.isin(
+        access_rights_df.modification_user_id)
 
-r9 = r9[columns_sort]
+    result_columns = r21.columns.tolist()
 
-# filter out records already identified as weekend modification
-r9 = r9[~r9.id.isin(r8.id)]
+    columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    r21 = r21[columns_sort].sort_values(
+        by='created_records_count', ascending=False)
 
-print('\nIdentifying POs issued to inactive vendors...\n')
-start_time = time.time()
-# PO issued to inactive vendors
-temp_po_df = po_df.copy()
+    result_columns = r22.columns.tolist()
 
-# mapping vendor status to po list
-vendor_status_dict = vmf_df.set_index('name').to_dict()['vendor_status']
+    columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
 
-temp_po_df['vendor_status'] = temp_po_df.vendor_name.map(vendor_status_dict)
+    r22 = r22[columns_sort].sort_values(
+        by='modified_records_count', ascending=False)
 
-vmf_df.reset_index(drop=True, inplace=True)
+    r21.reset_index(drop=True, inplace=True)
+    r22.reset_index(drop=True, inplace=True)
 
-r10 = temp_po_df[temp_po_df.vendor_status ==
-                 'In-Active'].sort_values(by='po_total', ascending=False)
+    return pd.merge(r21, r22, left_index=True, right_index=True, how='outer').rename(columns={
+        'user_authorized_x': 'creation_user_authorized', 'user_authorized_y': 'modification_user_authorized'})
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
 
-print('\nIdentifying gaps in vendor ID and PO numbers...\n')
-start_time = time.time()
-# Gaps in vendor id/po number sequential order and duplicate records
+def abnormal_hours_modifications_summary(abnormal_creation_df, abnormal_modification_df, access_rights_df):
+    '''summary abnormal working hours modification'''
+    abnormal_creation = abnormal_creation_df.groupby(['creation_user_id'])[
+        'creation_hour'].count().to_frame()
+    abnormal_modification = abnormal_modification_df.groupby(['modification_user_id'])[
+        'modification_hour'].count().to_frame()
 
-# building dataframe: vendor records
+    r24 = pd.merge(abnormal_creation, abnormal_creation.index.to_frame(), left_index=True,
+                   right_index=True, how='left').rename(columns={'creation_hour': 'created_records_count'})
 
-vendor_gaps_df = vmf_df.copy().sort_values(by='id')
+    r25 = pd.merge(abnormal_modification, abnormal_modification.index.to_frame(), left_index=True,
+                   right_index=True, how='left').rename(columns={'modification_hour': 'modified_records_count'})
 
-vendor_gaps_df['start'] = vendor_gaps_df['id']
+    r24['user_authorized'] = r24.creation_user_id.isin(
+        access_rights_df.creation_user_id)
 
-vendor_gaps_df['end'] = vendor_gaps_df['id'].shift(-1)
+    r25['user_authorized'] = r25.modification_user_id.isin(
+        access_rights_df.modification_user_id)
 
-vendor_gaps_df['gap'] = vendor_gaps_df['id'].shift(-1) - vendor_gaps_df['id']
+    result_columns = r24.columns.tolist()
 
-# building dataframe: po records
+    columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
 
-po_gaps_df = po_df.copy().sort_values(by='po_number')
+    r24 = r24[columns_sort].sort_values(
+        by='created_records_count', ascending=False)
 
-po_gaps_df['start'] = po_gaps_df['po_number']
+    result_columns = r25.columns.tolist()
 
-po_gaps_df['end'] = po_gaps_df['po_number'].shift(-1)
+    columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
 
-po_gaps_df['gap'] = po_gaps_df['po_number'].shift(-1) - po_gaps_df['po_number']
+    r25 = r25[columns_sort].sort_values(
+        by='modified_records_count', ascending=False)
 
-# vendor id gaps
-r11 = vendor_gaps_df[(vendor_gaps_df['gap'] > 0) &
-                     (vendor_gaps_df['gap'] != 1)]
+    r24.reset_index(drop=True, inplace=True)
+    r25.reset_index(drop=True, inplace=True)
 
-# vendor id duplicates
-r12 = vendor_gaps_df[(vendor_gaps_df['gap'] == 0)].dropna()
+    return pd.merge(r24, r25, left_index=True, right_index=True, how='outer').rename(columns={
+        'user_authorized_x': 'creation_user_authorized', 'user_authorized_y': 'modification_user_authorized'})
 
-# po number gaps
-r13 = po_gaps_df[(po_gaps_df['gap'] > 0) & (po_gaps_df['gap'] != 1)]
 
-# po number duplicates
-r14 = po_gaps_df[(po_gaps_df['gap'] == 0)].dropna()
+def modifications_by_period(vmf_df):
+    '''summary of modification by period'''
+    # yearly periods ending on december 31st, the offset is spelled the same in every pandas version
+    creation = vmf_df.groupby(['creation_date'])[
+        'creation_date'].count().resample(pd.offsets.YearEnd()).sum().to_frame()
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    modification = vmf_df.groupby(['modification_date'])[
+        'modification_date'].count().resample(pd.offsets.YearEnd()).sum().to_frame()
 
-print('\nIdentifying similarities across all vendor data...\n')
-start_time = time.time()
-# similarity across all vendor data
-# considering only highest possible match
-temp_vn_df = r1.copy()
+    creation = creation[creation.creation_date > 0]
 
-temp_vn_df = temp_vn_df[temp_vn_df.similarity >= .6]
+    modification = modification[modification.modification_date > 0]
 
-for i, e in zip(*[iter(temp_vn_df.columns[6:])] * 2):
-    print('matching' + ' ' + i + ' ' + 'with' + ' ' + e)
-    result = temp_vn_df.apply(similar_with_nan, args=(i, e), axis=1)
-    temp_vn_df[i] = result
-    temp_vn_df.drop(columns=e, inplace=True)
+    r27 = pd.merge(creation, modification, left_index=True,
+                   right_index=True, how='outer')
 
-temp_vn_df['total_similarity_score'] = temp_vn_df['similarity'] + \
-    temp_vn_df.iloc[:, -5:-1].sum(axis=1)
+    # the merged index is named after either date depending on the pandas version, periods are named explicitly
+    r27 = r27.rename_axis('period').reset_index()
 
-r15 = temp_vn_df.copy().sort_values(by='total_similarity_score', ascending=False)
+    r27.rename(columns={'creation_date': 'created_records_count',
+               'modification_date': 'modified_records_count'}, inplace=True)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    return r27[(r27.created_records_count >= 0) | (r27.modified_records_count >= 0)]
 
-print('\nIdentifying similarities across all active employees vs. vendor data...\n')
-start_time = time.time()
-# similarity across all active employee vs. vendor data
-# considering only highest possible match
-temp_emp_df = r2.copy()
 
-temp_emp_df = temp_emp_df[temp_emp_df.similarity >= .6]
+def vendor_similarity_summary(r15):
+    '''summary of similarity across all vendor data,
+    only exact and highest total similarities are considered,
+    score of 2 and above provided best result filter.'''
+    r28 = r15[r15.total_similarity_score >= 2]
 
-for i, e in zip(*[iter(temp_emp_df.columns[6:])] * 2):
-    print('matching' + ' ' + i + ' ' + 'with' + ' ' + e)
-    result = temp_emp_df.apply(similar_with_nan, args=(i, e), axis=1)
-    temp_emp_df[i] = result
-    temp_emp_df.drop(columns=e, inplace=True)
+    r28 = r28[r28.columns[0:4]]
 
-temp_emp_df['total_similarity_score'] = temp_emp_df['similarity'] + \
-    temp_emp_df.iloc[:, -5:-1].sum(axis=1)
+    return r28.reset_index(drop=True)
 
-r16 = temp_emp_df.copy().sort_values(by='total_similarity_score', ascending=False)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+def active_employee_similarity_summary(r16):
+    '''summary of similarity across all active employee vs vendor data,
+    only exact and highest total similarities are considered,
+    score of 1.5 and above provided best result filter.'''
+    r29 = r16[(r16.similarity == 1) | (r16.total_similarity_score >= 1.5)]
 
-print('\nIdentifying similarities across all terminated employees vs. vendor data...\n')
-start_time = time.time()
-# similarity across all terminated employee vs. vendor data
-# considering only highest possible match
-temp_termin_df = r3.copy()
+    r29 = r29[r29.columns[0:4]]
 
-temp_termin_df = temp_termin_df[temp_termin_df.similarity >= .6]
+    return r29.reset_index(drop=True)
 
-for i, e in zip(*[iter(temp_termin_df.columns[6:])] * 2):
-    print('matching' + ' ' + i + ' ' + 'with' + ' ' + e)
-    result = temp_termin_df.apply(similar_with_nan, args=(i, e), axis=1)
-    temp_termin_df[i] = result
-    temp_termin_df.drop(columns=e, inplace=True)
 
-temp_termin_df['total_similarity_score'] = temp_termin_df['similarity'] + \
-    temp_termin_df.iloc[:, -5:-1].sum(axis=1)
+def terminated_employee_similarity_summary(r17):
+    '''summary of similarity across all terminated employee vs vendor data,
+    only exact and highest total similarities are considered,
+    score of 1.5 and above provided best result filter.'''
+    r30 = r17[(r17.similarity == 1) | (r17.total_similarity_score >= 1.5)]
 
-r17 = temp_termin_df.copy().sort_values(
-    by='total_similarity_score', ascending=False)
+    r30 = r30[r30.columns[0:4]]
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    return r30.reset_index(drop=True)
 
-print('\nIdentifying POs issued to terminated employees...\n')
-start_time = time.time()
-# terminated employees with highest number of POs placed after termination date
-# exact matches are only considered
-temp_term_df = r5.copy()
 
-r18 = temp_term_df[(temp_term_df.termination_date) < (temp_term_df.po_date)]
+def po_totals_by_vendor_name(po_df, key_codes):
+    '''po count and po values per currency of every vendor name code (see vmf_keys),
+    POs of vendor names missing from the vendor list are left out'''
+    return vendor_name_po_totals(key_codes['codes'][('po', 'vendor_name')], po_df)
 
-# filter for exact matches only
 
-fltrd_r18 = r18[r18.similarity == 1].copy()
+def vendor_name_po_totals(codes, po_df):
+    '''po count and po value per currency (po_value_<currency> columns) by vendor name code'''
+    po = pd.DataFrame({'code': codes, 'currency': po_df.currency.astype(str).to_numpy(),
+                       'po_total': po_df.po_total.to_numpy()})
 
-earliest_po_date = fltrd_r18.groupby(
-    ['employee_id', 'employee_name', 'termination_date'])['po_date'].min().to_frame()
+    po = po[po.code >= 0]
 
-po_count_df = fltrd_r18.groupby(['employee_id', 'employee_name', 'termination_date'])[
-    'po_number'].count().to_frame()
+    po_value = po.groupby(['code', 'currency'])['po_total'].sum().unstack(fill_value=0)
 
-po_value_df = fltrd_r18.groupby(['employee_id', 'employee_name', 'termination_date'])[
-    'po_total'].sum().to_frame()
+    po_value.columns = ['po_value_' + currency for currency in po_value.columns]
 
-df_list = [earliest_po_date, po_count_df,
-           po_value_df, earliest_po_date.index.to_frame()]
+    return pd.concat([po.groupby('code')['po_total'].count().rename('po_count'), po_value], axis=1)
 
-r18_summary = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True, how='outer'), df_list).rename(
-    columns={'po_date': 'earliest_po_date', 'po_number': 'po_count', 'po_total': 'sum_po_values'})
 
-result_columns = r18_summary.columns.tolist()
+def duplicate_vendor_clusters(vmf_df, r15, key_codes, vendor_po_totals):
+    '''duplicate vendor clusters, connected components of the vendor pairs of close names (similarity of
+    CLUSTER_SIMILARITY and above) with a total similarity score of CLUSTER_SCORE and above (see vmf_clusters).
+    returns the clustered vendors and the summary of every cluster, the biggest clusters first'''
+    vendor_ids, unique_ids = pd.factorize(vmf_df.id)
 
-columns_sort = result_columns[3:]+result_columns[0:1]+result_columns[1:3]
+    # a single node per vendor id, described by its first record
+    first = pd.Series(np.arange(len(vendor_ids))).groupby(vendor_ids).first().to_numpy()
 
-r18_summary = r18_summary[columns_sort].sort_values(
-    by='sum_po_values', ascending=False)
+    pairs = r15[(r15.similarity >= CLUSTER_SIMILARITY) & (r15.total_similarity_score >= CLUSTER_SCORE)]
 
-r18_summary.reset_index(drop=True, inplace=True)
+    left = pd.Index(unique_ids).get_indexer(pairs.vendor_id)
+    right = pd.Index(unique_ids).get_indexer(pairs.match_vendor_id)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    # records sharing a vendor id are the same vendor, their pairs don't link two vendors
+    known = (left >= 0) & (right >= 0) & (left != right)
 
-print('\nSummarizing missing vendor details...\n')
-start_time = time.time()
-# missing vendor details
-missing_details_count = vmf_df.isna().sum()
+    pairs, left, right = pairs[known], left[known], right[known]
 
-r19 = missing_details_count[missing_details_count > 0].to_frame()
+    labels = cluster_labels(left, right, len(unique_ids))
 
-r19 = pd.merge(r19.index.to_frame(), r19, left_index=True, right_index=True, how='left').rename(
-    columns={'0_x': 'missing_records', '0_y': 'missing_records_count'})
+    clustered = np.flatnonzero(labels >= 0)
 
-r19.reset_index(drop=True, inplace=True)
+    # best pair of every vendor and number of pairs it's part of
+    node_pairs = pd.DataFrame({'node': np.concatenate([left, right]), 'similarity': np.tile(
+        pairs.similarity.to_numpy(), 2), 'score': np.tile(pairs.total_similarity_score.to_numpy(), 2)})
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    node_stats = node_pairs.groupby('node').agg(pairs=('score', 'size'), max_similarity=('similarity', 'max'),
+                                                 max_total_similarity_score=('score', 'max'))
 
-print('\nSummarizing details of POs issued to inactive vendors ...\n')
-start_time = time.time()
-# summary of po details for inactive vendors
-temp_po_df = r10.copy()
+    records = vmf_df[['id', 'name', 'vendor_status']].take(first[clustered]).reset_index(drop=True)
 
-po_count = temp_po_df.groupby('vendor_name')['po_number'].count().to_frame()
+    r31 = pd.DataFrame({'cluster': labels[clustered], 'vendor_id': records.id, 'vendor_name': records.name,
+                        'vendor_status': records.vendor_status.astype(str).to_numpy()})
 
-po_value = temp_po_df.groupby(['vendor_name', 'currency'])[
-    'po_total'].sum().to_frame()
+    r31 = r31.join(node_stats.reindex(clustered).reset_index(drop=True))
 
-df_list = [po_value, po_count, po_count.index.to_frame()]
+    r31['name_code'] = key_codes['codes'][('vendors', 'name')][first[clustered]]
 
-r20 = reduce(lambda left, right: pd.merge(left, right, left_index=True, right_index=True,
-             how='outer'), df_list).rename(columns={'po_number': 'po_count', 'po_total': 'sum_po_values'})
+    r32 = r31.groupby('cluster').agg(vendors=('vendor_id', 'size'), pairs=('pairs', 'sum'),
+                                     max_similarity=('max_similarity', 'max'),
+                                     max_total_similarity_score=('max_total_similarity_score', 'max'),
+                                     active_vendors=('vendor_status', lambda x: int((x == 'Active').sum())),
+                                     inactive_vendors=('vendor_status', lambda x: int((x == 'In-Active').sum())),
+                                     vendor_names=('vendor_name', lambda x: '; '.join(pd.unique(x))))
 
-r20.reset_index(drop=True, inplace=True)
+    # every pair was counted by both its vendors
+    r32['pairs'] //= 2
 
-result_columns = r20.columns.tolist()
+    # POs of every vendor name of a cluster, counted once per name
+    cluster_names = r31[['cluster', 'name_code']].drop_duplicates()
 
-columns_sort = result_columns[2:]+result_columns[1:2]+result_columns[0:1]
+    po_totals = vendor_po_totals.reindex(cluster_names.name_code.to_numpy()).fillna(0)
 
-r20 = r20[columns_sort].sort_values(by='sum_po_values', ascending=False)
+    po_totals.index = cluster_names.cluster.to_numpy()
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    r32 = r32.join(po_totals.groupby(level=0).sum().astype('int64'))
 
-print('\nSummarizing weekend manipulations...\n')
-start_time = time.time()
-# summary of weekend and abnormal working hours modifications
+    # clusters numbered from 1, the biggest and most similar first
+    r32 = r32.sort_values(by=['vendors', 'max_total_similarity_score'], ascending=False, kind='stable')
 
-# weekends modification
-if len(weekends) > 1:
-    temp_days_creation = r8[(r8.creation_day == weekends[0]) | (
-        r8.creation_day == weekends[1])]
+    cluster_ids = pd.Series(np.arange(1, len(r32) + 1), index=r32.index)
 
-    temp_days_modification = r8[(r8.modification_day == weekends[0]) | (
-        r8.modification_day == weekends[1])]
-else:
-    temp_days_creation = r8[(r8.creation_day == weekends[0])]
+    r32.insert(0, 'cluster_id', cluster_ids.to_numpy())
 
-    temp_days_modification = r8[(r8.modification_day == weekends[0])]
+    r31.insert(0, 'cluster_id', cluster_ids.reindex(r31.cluster).to_numpy())
 
-weekends_creation = temp_days_creation.groupby(['creation_user_id'])[
-    'creation_day'].count().to_frame()
+    r31 = r31.drop(columns=['cluster', 'name_code']).sort_values(
+        by=['cluster_id', 'max_total_similarity_score'], ascending=[True, False], kind='stable')
 
-weekends_modification = temp_days_modification.groupby(
-    ['modification_user_id'])['modification_day'].count().to_frame()
+    return r31.reset_index(drop=True), r32.reset_index(drop=True)
 
-r21 = pd.merge(weekends_creation, weekends_creation.index.to_frame(), left_index=True,
-               right_index=True, how='left').rename(columns={'creation_day': 'created_records_count'})
 
-r22 = pd.merge(weekends_modification, weekends_modification.index.to_frame(), left_index=True,
-               right_index=True, how='left').rename(columns={'modification_day': 'modified_records_count'})
+# Streaming PO tests
+# same results as the PO tests above, the PO list is read in chunks by po_chunks()
+# and every chunk is reduced to a small partial result merged across chunks,
+# so memory is bounded by the chunk size rather than by the PO list.
 
-r21['user_authorized'] = r21.creation_user_id.isin(
-    access_rights_df.creation_user_id)
 
-r22['user_authorized'] = r22.modification_user_id.isin(
-    access_rights_df.modification_user_id)
+def streamed_pos_for_inactive_vendors(vmf_df, key_codes, po_chunks):
+    '''streaming version of pos_for_inactive_vendors and inactive_vendor_po_summary,
+    only POs of inactive vendors are kept from every chunk and the summary counts and values
+    are added up chunk by chunk'''
+    # mapping vendor status to po list through vendor name codes, every chunk is encoded once
+    vendor_status = vendor_status_by_name(vmf_df, key_codes)
 
-result_columns = r21.columns.tolist()
+    inactive_pos = []
 
-columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
+    po_count, po_value = None, None
 
-r21 = r21[columns_sort].sort_values(
-    by='created_records_count', ascending=False)
+    for chunk in po_chunks():
+        chunk['vendor_status'] = lookup_codes(vendor_status, encode(
+            key_codes['vocabularies']['vendor_name'], chunk.vendor_name))
 
-result_columns = r22.columns.tolist()
+        inactive = chunk[chunk.vendor_status == 'In-Active']
 
-columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
+        inactive_pos.append(inactive)
 
-r22 = r22[columns_sort].sort_values(
-    by='modified_records_count', ascending=False)
+        chunk_count = inactive.groupby('vendor_name')['po_number'].count()
 
-r21.reset_index(drop=True, inplace=True)
-r22.reset_index(drop=True, inplace=True)
+        chunk_value = inactive.groupby(['vendor_name', 'currency'], observed=True)[
+            'po_total'].sum()
 
-r23 = pd.merge(r21, r22, left_index=True, right_index=True, how='outer').rename(columns={
-    'user_authorized_x': 'creation_user_authorized', 'user_authorized_y': 'modification_user_authorized'})
+        po_count = chunk_count if po_count is None else po_count.add(
+            chunk_count, fill_value=0)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+        po_value = chunk_value if po_value is None else po_value.add(
+            chunk_value, fill_value=0)
 
-print('\nSummarizing abnormal working hours manipulations...\n')
-start_time = time.time()
-# summary abnormal working hours modification
-abnormal_creation = temp_creation_df.groupby(['creation_user_id'])[
-    'creation_hour'].count().to_frame()
-abnormal_modification = temp_modification_df.groupby(['modification_user_id'])[
-    'modification_hour'].count().to_frame()
+    r10 = pd.concat(inactive_pos, ignore_index=True).sort_values(
+        by='po_total', ascending=False)
 
-r24 = pd.merge(abnormal_creation, abnormal_creation.index.to_frame(), left_index=True,
-               right_index=True, how='left').rename(columns={'creation_hour': 'created_records_count'})
+    r20 = po_totals_summary(po_count.astype('int64'), po_value.astype('int64'))
 
-r25 = pd.merge(abnormal_modification, abnormal_modification.index.to_frame(), left_index=True,
-               right_index=True, how='left').rename(columns={'modification_hour': 'modified_records_count'})
+    return r10, r20
 
-r24['user_authorized'] = r24.creation_user_id.isin(
-    access_rights_df.creation_user_id)
 
-r25['user_authorized'] = r25.modification_user_id.isin(
-    access_rights_df.modification_user_id)
+def streamed_po_totals_by_vendor_name(key_codes, po_chunks):
+    '''streaming version of po_totals_by_vendor_name, totals are added up chunk by chunk'''
+    vocabulary = key_codes['vocabularies']['vendor_name']
 
-result_columns = r24.columns.tolist()
+    totals = None
 
-columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
+    for chunk in po_chunks():
+        chunk_totals = vendor_name_po_totals(encode(vocabulary, chunk.vendor_name), chunk)
 
-r24 = r24[columns_sort].sort_values(
-    by='created_records_count', ascending=False)
+        totals = chunk_totals if totals is None else totals.add(chunk_totals, fill_value=0)
 
-result_columns = r25.columns.tolist()
+    return totals.fillna(0).astype('int64')
 
-columns_sort = result_columns[1:2]+result_columns[0:1]+result_columns[2:]
 
-r25 = r25[columns_sort].sort_values(
-    by='modified_records_count', ascending=False)
+def streamed_po_number_gaps(po_chunks):
+    '''streaming version of po_number_gaps, a first pass keeps only po numbers to find gaps
+    and duplicates, a second pass collects the full records of these po numbers'''
+    po_numbers = pd.concat([chunk.po_number for chunk in po_chunks()], ignore_index=True)
 
-r24.reset_index(drop=True, inplace=True)
-r25.reset_index(drop=True, inplace=True)
+    # stable sort so duplicates keep the order they're listed in
+    po_gaps_df = po_numbers.to_frame().sort_values(by='po_number', kind='stable')
 
-r26 = pd.merge(r24, r25, left_index=True, right_index=True, how='outer').rename(columns={
-    'user_authorized_x': 'creation_user_authorized', 'user_authorized_y': 'modification_user_authorized'})
+    po_gaps_df['start'] = po_gaps_df['po_number']
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    po_gaps_df['end'] = po_gaps_df['po_number'].shift(-1)
 
-print('\nSummarizing vendor records manipulations by period...\n')
-start_time = time.time()
-# summary of modification by period
-temp_period_df = vmf_df.copy()
+    po_gaps_df['gap'] = po_gaps_df['po_number'].shift(-1) - po_gaps_df['po_number']
 
-creation = temp_period_df.groupby(['creation_date'])[
-    'creation_date'].count().resample('1y').sum().to_frame()
+    po_gaps_df = po_gaps_df[((po_gaps_df['gap'] > 0) & (po_gaps_df['gap'] != 1)) | (po_gaps_df['gap'] == 0)]
 
-modification = temp_period_df.groupby(['modification_date'])[
-    'modification_date'].count().resample('1y').sum().to_frame()
+    # collecting the records of flagged po numbers by their position in the PO list
+    positions = np.sort(po_gaps_df.index.to_numpy())
 
-creation = creation[creation.creation_date > 0]
+    records = []
 
-modification = modification[modification.modification_date > 0]
+    offset = 0
 
-r27 = pd.merge(creation, modification, left_index=True,
-               right_index=True, how='outer')
+    for chunk in po_chunks():
+        in_chunk = positions[(positions >= offset) &
+                             (positions < offset + len(chunk))]
 
-r27 = pd.merge(r27.index.to_frame(), r27, left_index=True,
-               right_index=True, how='outer')
+        records.append(chunk.iloc[in_chunk - offset].set_axis(in_chunk))
 
-r27.rename(columns={0: 'period', 'creation_date': 'created_records_count',
-           'modification_date': 'modified_records_count'}, inplace=True)
+        offset += len(chunk)
 
-r27.reset_index(drop=True, inplace=True)
+    po_gaps_df = pd.concat(records).join(
+        po_gaps_df[['start', 'end', 'gap']]).loc[po_gaps_df.index]
 
-r27 = r27[(r27.created_records_count >= 0) | (r27.modified_records_count >= 0)]
+    # po number gaps
+    r13 = po_gaps_df[(po_gaps_df['gap'] > 0) & (po_gaps_df['gap'] != 1)]
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    # po number duplicates
+    r14 = po_gaps_df[(po_gaps_df['gap'] == 0)].dropna()
 
-print('\nSummarizing similarities across all vendor data...\n')
-start_time = time.time()
-# summary of similarity across all vendor data,
-# only exact and highest total similarities are considered,
-# score of 2 and above provided best result filter.
-r28 = r15[r15.total_similarity_score >= 2]
+    return r13, r14
+
+
+def streamed_pos_issued_to_employees(r2, r3, employee_index, key_codes, po_chunks):
+    '''streaming version of pos_issued_to_employees,
+    only POs issued to vendors matching an employee are kept from every chunk'''
+    employee_vs_po_list = employee_close_matches(
+        r2, r3, employee_index)
+
+    vocabulary = key_codes['vocabularies']['vendor_name']
+
+    matched_vendors = encode(vocabulary, employee_vs_po_list.vendor_name.unique())
+
+    employee_pos, po_codes = [], []
+
+    for chunk in po_chunks():
+        codes = encode(vocabulary, chunk.vendor_name)
+        matched = np.isin(codes, matched_vendors[matched_vendors >= 0])
+
+        employee_pos.append(chunk[matched])
+        po_codes.append(codes[matched])
+
+    return employee_po_records(employee_vs_po_list, pd.concat(employee_pos, ignore_index=True),
+                               np.concatenate(po_codes), key_codes).sort_values(by='similarity', ascending=False)
+
+
+# input lists by the names the tests read them under
+INPUT_FRAMES = {'vmf_df': 'vendors', 'access_rights_df': 'access_rights', 'employees_df': 'employees',
+                'terminated_employees_df': 'terminated_employees', 'po_df': 'po'}
+
+# dependency graph of the tests, the scheduler starts every test as soon as
+# the results it reads are available, tests are listed in the order they used to run.
+# tests reading the employee lists declare the columns they read so the unused ones aren't loaded,
+# the vendor and PO lists are listed whole by some tests and always loaded whole
+STAGES = [
+    Stage('Encoding join keys', encode_keys,
+          ['key_codes'],
+          columns={frame: [col for cols in KEYS.values() for col in cols.get(name, [])]
+                   for frame, name in INPUT_FRAMES.items()}),
+    Stage('Normalizing vendor and employee names', normalize_names,
+          ['vendor_names', 'employee_names', 'terminated_names', 'acronym_index'],
+          columns={'vmf_df': ['name'], 'employees_df': ['employee_name'], 'terminated_employees_df': ['employee_name']}),
+    Stage('Pairing equal vendor and employee names', exact_name_matching,
+          ['exact_matches']),
+    Stage('Vectorizing vendor names', fit_vendor_name_index,
+          ['vendor_name_index']),
+    Stage('Blocking vendor and employee records', block_records,
+          ['candidates', 'blocking_report'],
+          columns={'vmf_df': ['postal_code'], 'employees_df': ['postal_code'],
+                   'terminated_employees_df': ['postal_code']}),
+    Stage('Vendor records exact and fuzzy name matching', vendor_name_matching,
+          ['r1', 'vendor_delta', 'vendor_matches']),
+    Stage('Active employees vs. vendor records exact and fuzzy name matching', active_employee_matching,
+          ['r2', 'active_matches'],
+          columns={'vmf_df': VENDOR_DETAIL_COLUMNS, 'employees_df': EMPLOYEE_DETAIL_COLUMNS + ['hiring_date']}),
+    Stage('Terminated employees vs. vendor records exact and fuzzy name matching', terminated_employee_matching,
+          ['r3', 'terminated_matches'],
+          columns={'vmf_df': VENDOR_DETAIL_COLUMNS,
+                   'terminated_employees_df': EMPLOYEE_DETAIL_COLUMNS + ['hiring_date', 'termination_date']}),
+    Stage('Saving matched pairs for the next delta run', save_delta_state,
+          ['delta_state_saved'],
+          columns={'vmf_df': ['id', 'name', 'creation_date', 'modification_date'],
+                   'employees_df': ['employee_id', 'employee_name', 'hiring_date'],
+                   'terminated_employees_df': ['employee_id', 'employee_name', 'hiring_date', 'termination_date']}),
+    Stage('Indexing active and terminated employee records', build_employee_index,
+          ['employee_index'],
+          columns={'employees_df': EMPLOYEE_COLUMNS, 'terminated_employees_df': EMPLOYEE_COLUMNS}),
+    Stage('Filtering out non-English names', non_english_vendor_names,
+          ['r4']),
+    Stage('Identifying all POs issued to employees', pos_issued_to_employees,
+          ['r5']),
+    Stage('Identifying unauthorized record manipulation', unauthorized_access,
+          ['r6']),
+    Stage('Identifying employees editing their own vendor records', employees_editing_own_records,
+          ['r7']),
+    Stage('Identifying vendor records manipulation on weekend and/or at abnormal working hours',
+          weekend_and_abnormal_hours_modifications,
+          ['r8', 'r9', 'abnormal_creation_df', 'abnormal_modification_df']),
+    Stage('Identifying POs issued to inactive vendors', pos_for_inactive_vendors,
+          ['r10']),
+    Stage('Identifying gaps in vendor ID', vendor_id_gaps,
+          ['r11', 'r12']),
+    Stage('Identifying gaps in PO numbers', po_number_gaps,
+          ['r13', 'r14']),
+    Stage('Identifying similarities across all vendor data', vendor_details_similarity,
+          ['r15']),
+    Stage('Identifying similarities across all active employees vs. vendor data', active_employee_details_similarity,
+          ['r16']),
+    Stage('Identifying similarities across all terminated employees vs. vendor data',
+          terminated_employee_details_similarity,
+          ['r17']),
+    Stage('Identifying POs issued to terminated employees', pos_after_termination,
+          ['r18', 'r18_summary']),
+    Stage('Summarizing missing vendor details', missing_vendor_details,
+          ['r19']),
+    Stage('Summarizing details of POs issued to inactive vendors', inactive_vendor_po_summary,
+          ['r20']),
+    Stage('Summarizing weekend manipulations', weekend_modifications_summary,
+          ['r23']),
+    Stage('Summarizing abnormal working hours manipulations', abnormal_hours_modifications_summary,
+          ['r26']),
+    Stage('Summarizing vendor records manipulations by period', modifications_by_period,
+          ['r27']),
+    Stage('Summarizing similarities across all vendor data', vendor_similarity_summary,
+          ['r28']),
+    Stage('Summarizing similarities across all active employees vs. vendor data', active_employee_similarity_summary,
+          ['r29']),
+    Stage('Summarizing similarities across all terminated employees vs. vendor data',
+          terminated_employee_similarity_summary,
+          ['r30']),
+    Stage('Totaling POs by vendor name', po_totals_by_vendor_name,
+          ['vendor_po_totals']),
+    Stage('Clustering duplicate vendors', duplicate_vendor_clusters,
+          ['r31', 'r32']),
+]
+
+
+# tests replaced by the streaming PO tests when the PO list is read in chunks
+STREAMED_PO_STAGES = [
+    Stage('Identifying POs issued to inactive vendors (streaming)', streamed_pos_for_inactive_vendors,
+          ['r10', 'r20']),
+    Stage('Identifying gaps in PO numbers (streaming)', streamed_po_number_gaps,
+          ['r13', 'r14']),
+    Stage('Identifying all POs issued to employees (streaming)', streamed_pos_issued_to_employees,
+          ['r5']),
+    Stage('Totaling POs by vendor name (streaming)', streamed_po_totals_by_vendor_name,
+          ['vendor_po_totals']),
+]
+
+
+def load_columns(stages):
+    '''columns of every input list read by the stages, in the order of their schema (see vmf_io),
+    None for lists read whole'''
+    return {name: None if columns is None else [col for col in INPUTS[name]['columns'] if col in columns]
+            for name, columns in input_columns(stages, INPUT_FRAMES).items()}
+
+
+def test_stages(po_chunksize=None):
+    '''stages of all tests, PO tests are streamed when a po_chunksize is given'''
+    if po_chunksize is None:
+        return STAGES
+
+    streamed = [pos_for_inactive_vendors, inactive_vendor_po_summary,
+                po_number_gaps, pos_issued_to_employees, po_totals_by_vendor_name]
+
+    return [stage for stage in STAGES if stage.func not in streamed] + STREAMED_PO_STAGES
+
+
+# sheets of the detail tables in the workbook, also the file names of their full copies
+DETAIL_SHEETS = [('r1', 'vendor_name_match'), ('r2', 'active_emp_vs_ven_name_match'), ('r3', 'term_emp_vs_ven_name_match'),
+                 ('r4', 'non_english_ven_names'), ('r5', 'po_to_employees'), ('r6', 'unauthorized_access'),
+                 ('r7', 'employees_editing_own_records'), ('r8', 'weekend_modifications'),
+                 ('r9', 'abnormal_hours_modifications'), ('r10', 'po_for_inactive_vendors'), ('r11', 'gabs_vendor_id'),
+                 ('r12', 'duplicate_vendor_id'), ('r13', 'gabs_po_number'), ('r14', 'duplicate_po_number'),
+                 ('r15', 'similarity_all_vendor_details'), ('r16', 'similarity_all_emp_ven_details'),
+                 ('r17', 'similarity_all_term_ven_details'), ('r18', 'po_date_after_emp_term_date'),
+                 ('r31', 'duplicate_vendor_clusters')]
+
+
+def save_results(results, path, detail_format=None, excel_rows=None, run_report=None):
+    '''Saving Results, the workbook holds the summary tables with the missing details chart
+    followed by the detail tables. detail_format also saves every detail table in full
+    as Parquet or gzipped CSV in Results/VMF_Analysed, excel_rows then limits
+    the detail tables of the workbook to their first rows. the blocking report and run_report
+    are added as last sheets when given'''
+    r19 = results['r19']
+
+    # summary tables in the order they're laid out, each under its title
+    summary_tables = [('Missing_vendor details', r19),
+                      ('summary of vendors having highest similarities across all records', results['r28']),
+                      ('Duplicate vendor clusters, vendors linked by close names and a total similarity of 2 and above',
+                       results['r32']),
+                      ('summary of active employees and vendors having highest similarities across all records',
+                       results['r29']),
+                      ('summary of terminated employees and vendors having highest similarities across all records',
+                       results['r30']),
+                      ('Issued POs after employee termination date, only exact name matches are considered',
+                       results['r18_summary']),
+                      ('Issued POs for inactive vendor', results['r20']),
+                      ('Vendor records creation/modification on weekends', results['r23']),
+                      ('Vendor records creation/modification at abnormal working hours', results['r26']),
+                      ('Summary of vendor records creation/modification by period', results['r27'])]
+
+    # Make saving directory if it doesn't already exist:
+    saving_folder = os.path.join(path, r'Results')
+    if not os.path.exists(saving_folder):
+        os.makedirs(saving_folder)
+
+    workbook, formats = open_workbook(
+        os.path.join(saving_folder, 'VMF_Analysed.xlsx'))
 
-r28 = r28[r28.columns[0:4]]
+    worksheet = workbook.add_worksheet('summary_tables')
 
-r28.reset_index(drop=True, inplace=True)
+    worksheet.hide_gridlines(2)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    form = workbook.add_format()
 
-print('\nSummarizing similarities across all active employees vs. vendor data...\n')
-start_time = time.time()
-# summary of similarity across all active employee vs vendor data,
-# only exact and highest total similarities are considered,
-# score of 1.5 and above provided best result filter.
-r29 = r16[(r16.similarity == 1) | (r16.total_similarity_score >= 1.5)]
+    form.set_align('center')
 
-r29 = r29[r29.columns[0:4]]
+    form.set_align('vcenter')
 
-r29.reset_index(drop=True, inplace=True)
+    worksheet.set_column('A:G', 30, form)
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    chart = workbook.add_chart({'type': 'column'})
 
-print('\nSummarizing similarities across all terminated employees vs. vendor data...\n')
-start_time = time.time()
-# summary of similarity across all terminated employee vs vendor data,
-# only exact and highest total similarities are considered,
-# score of 1.5 and above provided best result filter.
-r30 = r17[(r17.similarity == 1) | (r17.total_similarity_score >= 1.5)]
+    # Configure the series of the chart from the missing details table (rows 3 onwards)
+    chart.add_series({'categories': f'=summary_tables!$A$3:$A${max(len(r19), 1) + 2}',
+                      'values': f'=summary_tables!$B$3:$B${max(len(r19), 1) + 2}',
+                      'fill': {'color': 'brown'}, 'line': {'color': 'black'}})
 
-r30 = r30[r30.columns[0:4]]
+    # Insert chart into the worksheet
+    worksheet.insert_chart(
+        'C1', chart, {'x_scale': 1, 'y_scale': .5, 'x_offset': 25, 'y_offset': 10})
 
-r30.reset_index(drop=True, inplace=True)
+    chart.set_legend({'position': 'none'})
 
-print(
-    colored(f"\nSuccess! this took {time.time() - start_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
+    # Configure chart axes
+    chart.set_x_axis({'name': 'Missing Data'})
+    chart.set_y_axis({'name': 'Count', 'major_gridlines': {'visible': False}})
 
-print('\nSaving results...\n')
-start_time = time.time()
-# Saving Results
+    # every title is followed by its table, an empty row separates each table from the next title
+    row = 0
 
-# Make saving directory if it doesn't already exist:
-saving_folder = os.path.join(path, r'Results')
-if not os.path.exists(saving_folder):
-    os.makedirs(saving_folder)
+    for title, table in summary_tables:
+        worksheet.write(row, 0, title)
 
-writer = pd.ExcelWriter(
-    (os.path.join(saving_folder, 'VMF_Analysed.xlsx')), engine='xlsxwriter')
+        row = write_table(worksheet, table, row + 1, formats) + 1
 
-workbook = writer.book
+    for name, sheet in DETAIL_SHEETS:
+        write_detail_sheets(workbook, sheet, results[name], formats,
+                            max_rows=excel_rows if detail_format is not None else None)
 
-worksheet = workbook.add_worksheet('summary_tables')
+    if results.get('blocking_report') is not None:
+        write_detail_sheets(workbook, 'blocking_report', results['blocking_report'], formats)
 
-writer.sheets['summary_tables'] = worksheet
+    if run_report is not None:
+        write_detail_sheets(workbook, 'run_report', run_report, formats)
 
-worksheet.hide_gridlines(2)
+    workbook.close()
 
-form = workbook.add_format()
+    if detail_format is not None:
+        detail_folder = os.path.join(saving_folder, 'VMF_Analysed')
 
-form.set_align('center')
+        for name, sheet in DETAIL_SHEETS:
+            save_detail_table(results[name], detail_folder, sheet, detail_format)
 
-form.set_align('vcenter')
 
-worksheet.set_column('A:G', 30, form)
+def main():
+    global similarity_metric
 
-chart = workbook.add_chart({'type': 'column'})
+    init()
 
-# Configure the series of the chart from the dataframe data.
-chart.add_series({'categories': '=summary_tables!$A$3:$A$7', 'values': '=summary_tables!$B$3:$B$7', 'fill': {
-                 'color': 'brown'}, 'line': {'color': 'black'}})
+    settings = parse_settings()
 
-# Insert chart into the worksheet
-worksheet.insert_chart(
-    'C1', chart, {'x_scale': 1, 'y_scale': .5, 'x_offset': 25, 'y_offset': 10})
+    elapsed_time = time.time()
 
-chart.set_legend({'position': 'none'})
+    print(colored("#" * 130, 'magenta'))
 
-# Configure chart axes
-chart.set_x_axis({'name': 'Missing Data'})
-chart.set_y_axis({'name': 'Count', 'major_gridlines': {'visible': False}})
+    print(colored('''
+Hi there! Let\'s have a quick introduction to this script; it's designed to highlight irregularities in the underlying dataset
+to facilitate sampling and guide further analysis of these irregularities. Among the several tests performed by this script is
+the identification of similarities among different unrelated records using n_gram and tf-idf statistical measure, you'll be
+prompted to specify two parameters being n_gram and n_matches to be used in analysing the data and producing related results.
+It's advisable to use the default parameters being 3 and 10 for n_gram and n_match respectively, as they produce the best match
+results. However, feel free to tinker based on how your data is structured.
 
-worksheet.write(0, 0, 'Missing_vendor details')
+What's an n_gram? For sake of simplicity, it's a sequence of N words. Example: for the word (McDonald's) an n_gram of 1 would be
+'m', 'c', 'd'. n_gram of 2 would be 'mc', 'cd', 'do'. n_gram of 3 would be 'mcd', 'cdo', 'don' and so on. Comparing (McDonald's) and
+(McDnld's) using this script will first generate an n_gram for each word then compute how closely they match.
 
-r19.to_excel(writer, sheet_name='summary_tables',
-             startrow=1, startcol=0, index=False)
+What about n_match? It's the number of possible matches you desire for a single word/record. You may be looking for only the first
+highest match or more than one possible matches, so adjust the number accordingly.
+''', 'cyan'))
 
-worksheet.write(
-    r19.shape[0] + 3, 0, 'summary of vendors having highest similarities across all records')
+    print(colored("#" * 130, 'magenta'))
 
-r28.to_excel(writer, sheet_name='summary_tables',
-             startrow=r19.shape[0] + 4, startcol=0, index=False)
+    # path of current folder to load and save data
+    path = os.path.dirname(os.path.abspath(__file__))
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3, 0,
-                'summary of active employees and vendors having highest similarities across all records')
+    # folder next to the input files keeping artifacts reused across runs
+    cache_folder = os.path.join(path, 'vmf_cache')
 
-r29.to_excel(writer, sheet_name='summary_tables',
-             startrow=r19.shape[0] + 3 + r28.shape[0] + 4, startcol=0, index=False)
+    # several n_gram or n_matches values run a parameter sweep over the name matching tests only
+    sweep = len(settings.get('n_gram', [])) > 1 or len(
+        settings.get('n_matches', [])) > 1
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3, 0,
-                'summary of terminated employees and vendors having highest similarities across all records')
+    # the PO list is streamed in chunks by the PO tests when a chunk size is given
+    po_chunksize = settings.get('po_chunksize')
 
-r30.to_excel(writer, sheet_name='summary_tables',
-             startrow=r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 4, startcol=0, index=False)
+    # the parameter sweep only reads names, the tests only the columns they declare
+    columns = {'vendors': ['name'], 'access_rights': [], 'employees': ['employee_name'],
+               'terminated_employees': ['employee_name'], 'po': []} if sweep else load_columns(test_stages(po_chunksize))
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 + r30.shape[0] + 3,
-                0, 'Issued POs after employee termination date, only exact name matches are considered')
+    low_memory = bool(settings.get('low_memory', False))
 
-r18_summary.to_excel(writer, sheet_name='summary_tables',
-                     startrow=r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 + r30.shape[0] + 4, startcol=0, index=False)
+    # inputs are read from the sheets of a workbook rather than from its CSV export when given,
+    # relative to the script folder like the CSV files
+    workbook = os.path.join(path, settings['workbook']) if settings.get('workbook') else None
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 +
-                r30.shape[0] + 3 + r18_summary.shape[0] + 3, 0, 'Issued POs for inactive vendor')
+    # time, memory and rows of loading, every test and saving, saved next to the results
+    report = RunReport(settings.get('profile'), os.path.join(path, 'Results', 'profile'))
 
-r20.to_excel(writer, sheet_name='summary_tables', startrow=r19.shape[0] + 3 + r28.shape[0] +
-             3 + r29.shape[0] + 3 + r30.shape[0] + 3 + r18_summary.shape[0] + 4, startcol=0, index=False)
+    (vmf_df, access_rights_df, employees_df, terminated_employees_df, po_df), _ = report.measure(
+        'load', 'Loading data', load_data, path, cache_folder, columns,
+        stream_po=sweep or po_chunksize is not None, low_memory=low_memory, workbook=workbook)
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 + r30.shape[0] + 3 +
-                r18_summary.shape[0] + 3 + r20.shape[0] + 3, 0, 'Vendor records creation/modification on weekends')
+    max_matches = max_n_matches(vmf_df, employees_df, terminated_employees_df)
 
-r23.to_excel(writer, sheet_name='summary_tables', startrow=r19.shape[0] + 3 + r28.shape[0] + 3 +
-             r29.shape[0] + 3 + r30.shape[0] + 3 + r18_summary.shape[0] + 3 + r20.shape[0] + 4, startcol=0, index=False)
+    check_settings(settings, max_matches)
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 + r30.shape[0] + 3 + r18_summary.shape[0] +
-                3 + r20.shape[0] + 3 + r23.shape[0] + 3, 0, 'Vendor records creation/modification at abnormal working hours')
+    if sweep:
+        print('\nRunning parameter sweep...\n')
 
-r26.to_excel(writer, sheet_name='summary_tables', startrow=r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] +
-             3 + r30.shape[0] + 3 + r18_summary.shape[0] + 3 + r20.shape[0] + 3 + r23.shape[0] + 4, startcol=0, index=False)
+        sweep_report = parameter_sweep(vmf_df, employees_df, terminated_employees_df,
+                                       settings.get('n_gram', [3]), settings.get('n_matches', [10]), cache_folder,
+                                       similarity_metric=settings.get('similarity_metric', 'ratio'))
 
-worksheet.write(r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 + r30.shape[0] + 3 + r18_summary.shape[0] + 3 +
-                r20.shape[0] + 3 + r23.shape[0] + 3 + r26.shape[0] + 3, 0, 'Summary of vendor records creation/modification by period')
+        saving_folder = os.path.join(path, r'Results')
+        if not os.path.exists(saving_folder):
+            os.makedirs(saving_folder)
 
-r27.to_excel(writer, sheet_name='summary_tables', startrow=r19.shape[0] + 3 + r28.shape[0] + 3 + r29.shape[0] + 3 +
-             r30.shape[0] + 3 + r18_summary.shape[0] + 3 + r20.shape[0] + 3 + r23.shape[0] + 3 + r26.shape[0] + 4, startcol=0, index=False)
+        sweep_report.to_csv(os.path.join(
+            saving_folder, 'VMF_parameter_sweep.csv'), index=False)
 
-r1.to_excel(writer, sheet_name='vendor_name_match', index=False)
+        print(sweep_report.to_string(index=False))
 
-r2.to_excel(writer, sheet_name='active_emp_vs_ven_name_match', index=False)
+        print(colored(
+            f"\nSuccess! total elapsed time is {time.time() - elapsed_time} seconds.", 'yellow'))
 
-r3.to_excel(writer, sheet_name='term_emp_vs_ven_name_match', index=False)
+        return
 
-r4.to_excel(writer, sheet_name='non_english_ven_names', index=False)
+    n_gram = settings['n_gram'][0] if 'n_gram' in settings else ask_n_gram()
 
-r5.to_excel(writer, sheet_name='po_to_employees', index=False)
+    n_matches = settings['n_matches'][0] if 'n_matches' in settings else ask_n_matches(
+        max_matches)
+
+    weekends = settings['weekends'] if 'weekends' in settings else ask_weekends()
+
+    abnormal_working_hours = settings['abnormal_working_hours'] if 'abnormal_working_hours' in settings \
+        else ask_abnormal_working_hours()
+
+    # solicit user input for delta matching, only offered when a previous run state exists
+    # that was produced with the same n_gram and n_matches
+    delta_folder = os.path.join(cache_folder, 'delta_state')
+
+    # delta matching keeps employee matches by vendor id, so vendor ids must be unique
+    delta_supported = vmf_df.id.is_unique
+
+    delta_state = load_state(
+        delta_folder, n_gram, n_matches) if delta_supported else None
+
+    # exact only runs don't hold the fuzzy pairs a delta run starts from, they neither use nor save any state
+    exact_only = bool(settings.get('exact_only', False))
+
+    if exact_only:
+        delta_supported, delta_state = False, None
+
+    delta_run = bool(settings.get('delta', False)) and delta_state is not None
+
+    while delta_state is not None and 'delta' not in settings:
+        delta_input = input(
+            f'Previous run found with data as of {delta_state["as_of"]}. Match only new or changed records? (y/n). Type \"d" for default (y) :').replace(" ", "").strip().lower()
+        if delta_input in ('y', 'd'):
+            delta_run = True
+            print(colored('Selected matching ---> ### new or changed records only ### \n', 'cyan'))
+            break
+        elif delta_input == 'n':
+            print(colored('Selected matching ---> ### all records ### \n', 'cyan'))
+            break
+        else:
+            print(colored('Oops! That\'s not a valid input; please type \"y" or \"n". Type \"d" for default (y)', 'yellow'))
+            continue
 
-r6.to_excel(writer, sheet_name='unauthorized_access', index=False)
+    similarity_metric = settings.get('similarity_metric', 'ratio')
 
-r7.to_excel(writer, sheet_name='employees_editing_own_records', index=False)
+    print(colored('-'*80, 'magenta'))
 
-r8.to_excel(writer, sheet_name='weekend_modifications', index=False)
+    # running all tests, independent tests run concurrently
+    context = {'vmf_df': vmf_df, 'access_rights_df': access_rights_df, 'employees_df': employees_df,
+               'terminated_employees_df': terminated_employees_df, 'po_df': po_df,
+               'cache_folder': cache_folder, 'n_gram': n_gram, 'n_matches': n_matches,
+               'weekends': weekends, 'abnormal_working_hours': abnormal_working_hours,
+               'delta_state': delta_state if delta_run else None,
+               'delta_folder': delta_folder, 'delta_supported': delta_supported,
+               'blocking': settings.get('blocking'), 'lsh': settings.get('lsh'),
+               'exact_only': exact_only}
 
-r9.to_excel(writer, sheet_name='abnormal_hours_modifications', index=False)
+    if po_chunksize is not None:
+        # every streaming test reads the PO list from the start, chunks are compacted like loaded inputs
+        context['po_chunks'] = lambda: (compact_frame(chunk, 'po') if low_memory else chunk for chunk in iter_input_chunks(
+            path, 'po', os.path.join(cache_folder, 'inputs'), po_chunksize, workbook))
 
-r10.to_excel(writer, sheet_name='po_for_inactive_vendors', index=False)
+    # results are handed over to later tests in memory, the ones asked for are also saved on the way
+    checkpoint_names = settings.get('checkpoint', [])
 
-r11.to_excel(writer, sheet_name='gabs_vendor_id', index=False)
+    checkpoint_folder = os.path.join(cache_folder, 'checkpoint')
 
-r12.to_excel(writer, sheet_name='duplicate_vendor_id', index=False)
+    def checkpoint(name, value):
+        if name in checkpoint_names:
+            save_frame(value, os.path.join(checkpoint_folder, name))
 
-r13.to_excel(writer, sheet_name='gabs_po_number', index=False)
+    results = run_stages(test_stages(po_chunksize), context,
+                         max_workers=settings.get('workers'), checkpoint=checkpoint, report=report)
 
-r14.to_excel(writer, sheet_name='duplicate_po_number', index=False)
+    print('\nSaving results...\n')
 
-r15.to_excel(writer, sheet_name='similarity_all_vendor_details', index=False)
+    _, record = report.measure('save', 'Saving results', save_results, results, path, settings.get('detail_format'),
+                               settings.get('excel_rows'), report.to_frame() if settings.get('report_sheet') else None)
 
-r16.to_excel(writer, sheet_name='similarity_all_emp_ven_details', index=False)
+    report.save(os.path.join(path, 'Results', 'VMF_run_report'))
 
-r17.to_excel(writer, sheet_name='similarity_all_term_ven_details', index=False)
+    print(
+        colored(f"\nSuccess! this took {record['wall_seconds']} seconds.", 'yellow'))
 
-r18.to_excel(writer, sheet_name='po_date_after_emp_term_date', index=False)
+    print(colored(
+        f"\nSuccess! total elapsed time is {time.time() - elapsed_time} seconds.", 'yellow'))
+    print(colored('-'*80, 'magenta'))
 
-writer.save()
+    # keeping the console open only for interactive runs
+    if not settings:
+        input('Press any key to close!')
 
-print(colored(
-    f"\nSuccess! total elapsed time is {time.time() - elapsed_time} seconds.", 'yellow'))
-print(colored('-'*80, 'magenta'))
 
-input('Press any key to close!')
+if __name__ == '__main__':
+    main()
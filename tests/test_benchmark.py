@@ -0,0 +1,74 @@
+import pandas as pd
+import VMF_Automated_Test_Procedures as vmf
+from vmf_benchmark import run_scale, find_regressions, unmeasured_stages
+from vmf_io import INPUTS
+from vmf_synthetic import generate_inputs
+
+# synthetic inputs are reproducible and hold what the tests look for, regressions are only flagged beyond noise
+
+
+def test_generated_inputs_follow_the_schema_and_the_seed():
+    inputs = generate_inputs(500, n_employees=120, seed=3)
+
+    for name, df in generate_inputs(500, n_employees=120, seed=3).items():
+        pd.testing.assert_frame_equal(inputs[name], df)
+        assert list(df.columns) == list(INPUTS[name]['columns'])
+
+    assert len(inputs['vendors']) == 500 and len(inputs['employees']) == 120
+    assert not inputs['vendors'].equals(generate_inputs(500, n_employees=120, seed=4)['vendors'])
+
+    # planted irregularities: gaps in vendor ids, repeated po numbers and users missing from the access rights
+    vendors, po = inputs['vendors'], inputs['po']
+
+    assert (vendors.id.diff().dropna() > 1).any()
+    assert po.po_number.duplicated().any()
+    assert (~vendors.creation_user_id.isin(inputs['access_rights'].creation_user_id)).any()
+
+
+def test_a_scale_reports_every_stage(tmp_path):
+    report = run_scale(150, str(tmp_path))
+
+    stages = [', '.join(stage.outputs) for stage in vmf.test_stages()]
+
+    assert report.name.tolist() == ['load'] + stages + ['save']
+    assert (report.scale == 150).all()
+    assert report.wall_seconds.notna().all()
+
+
+def _report(rows):
+    return pd.DataFrame(rows, columns=['scale', 'name', 'wall_seconds', 'peak_rss_mb', 'memory_scope'])
+
+
+def test_regressions_are_flagged_beyond_tolerance_and_noise():
+    baseline = _report([(1000, 'r1', 10., 500., 'step'), (1000, 'r2', .5, 100., 'step'),
+                        (1000, 'r3', 10., 500., 'step')])
+
+    report = _report([(1000, 'r1', 14., 500., 'step'), (1000, 'r2', .9, 140., 'step'),
+                      (1000, 'r3', 11., 700., 'step')])
+
+    # r1 slower, r2 slower and bigger but within the noise, r3 bigger
+    assert find_regressions(report, baseline).name.tolist() == ['r1', 'r3']
+    assert unmeasured_stages(report, baseline).empty
+
+
+def test_process_peaks_are_compared_per_run():
+    baseline = _report([(1000, 'r1', 1., 300., 'process'), (1000, 'r2', 1., 400., 'process')])
+
+    # a stage reaching a higher peak of the process isn't a stage regression, a higher peak of the run is
+    report = _report([(1000, 'r1', 1., 400., 'process'), (1000, 'r2', 1., 400., 'process')])
+    assert find_regressions(report, baseline).empty
+
+    report = _report([(1000, 'r1', 1., 300., 'process'), (1000, 'r2', 1., 600., 'process')])
+    assert find_regressions(report, baseline)[['scale', 'name']].values.tolist() == [[1000, 'run']]
+
+
+def test_memories_measured_differently_are_reported_unmeasured():
+    baseline = _report([(1000, 'r1', 1., 300., 'process'), (1000, 'r2', 1., None, 'step')])
+    report = _report([(1000, 'r1', 1., 900., 'step'), (1000, 'r2', 1., 100., 'step')])
+
+    assert find_regressions(report, baseline).empty
+    assert unmeasured_stages(report, baseline).name.tolist() == ['r1', 'r2']
+
+    # reports saved before the memory scope was recorded sampled every stage
+    assert find_regressions(report.drop(columns='memory_scope'),
+                            baseline.drop(columns='memory_scope').assign(peak_rss_mb=100.)).name.tolist() == ['r1']
@@ -0,0 +1,72 @@
+import numpy as np
+from vmf_blocking import soundex, record_blocks, candidate_pairs, blocked_top_k_pairs, blocked_self_top_k_pairs
+from vmf_matcher import fit_ngram_index, transform_names, top_k_pairs, self_top_k_pairs
+from vmf_names import canonical_names
+from vmf_synthetic import generate_inputs
+
+# blocking only prunes pairs: over all pairs as candidates the blocked matchers must rank like the full ones
+
+
+def _pairs(left, right):
+    return set(zip(left.tolist(), right.tolist()))
+
+
+def test_soundex_codes():
+    for word, code in [('Robert', 'R163'), ('Rupert', 'R163'), ('Ashcraft', 'A261'), ('Tymczak', 'T522'),
+                       ('Pfister', 'P236'), ('Honeyman', 'H555'), ('Lee', 'L000'), ('', '')]:
+        assert soundex(word) == code
+
+
+def test_candidates_share_a_block_under_any_key():
+    names = ['reinger group', 'rainger', 'acme supplies', 'acme', 'zeta']
+    postal = ['12345', None, '1234-5', None, '12345']
+
+    blocks = record_blocks(names, postal, ['soundex', 'postal'])
+
+    left, right, skipped = candidate_pairs(blocks, blocks, len(names), len(names), self_match=True)
+
+    # reinger ~ rainger by sound, acme by word, 12345 by postal code
+    assert _pairs(left, right) == {(0, 1), (2, 3), (0, 2), (0, 4), (2, 4)}
+    assert skipped == 0
+
+    # the prefix key alone
+    blocks = record_blocks(names, postal, ['prefix'])
+    assert _pairs(*candidate_pairs(blocks, blocks, 5, 5, self_match=True)[:2]) == {(2, 3)}
+
+
+def test_oversized_blocks_are_skipped():
+    names = ['acme'] * 5 + ['zeta one', 'zeta two']
+
+    blocks = record_blocks(names, [None] * 7, ['soundex'])
+
+    left, right, skipped = candidate_pairs(blocks, blocks, 7, 7, self_match=True, max_block_size=4)
+
+    assert _pairs(left, right) == {(5, 6)}
+    assert skipped == 1
+
+
+def test_blocked_matches_over_all_pairs_rank_like_the_full_matchers():
+    inputs = generate_inputs(400, seed=5)
+
+    vendor_names = list(canonical_names(inputs['vendors'].name.drop_duplicates()))
+    employee_names = list(canonical_names(inputs['employees'].employee_name.drop_duplicates()))
+
+    index = fit_ngram_index(vendor_names, 3)
+    employees = transform_names(index, employee_names)
+
+    n_vendors, n_employees = len(vendor_names), len(employee_names)
+
+    left, right = np.repeat(np.arange(n_employees), n_vendors), np.tile(np.arange(n_vendors), n_employees)
+
+    blocked = blocked_top_k_pairs(employees, index['matrix'], left, right, 5)
+    full = top_k_pairs(employees, index['matrix'], 5, n_jobs=1)
+
+    found = full[2] > 0
+    assert _pairs(blocked[0], blocked[1]) == _pairs(full[0][found], full[1][found])
+
+    left, right = np.triu_indices(n_vendors, 1)
+
+    blocked = blocked_self_top_k_pairs(index['matrix'], left.astype(np.int64), right.astype(np.int64), 5)
+    full = self_top_k_pairs(index['matrix'], 5, n_jobs=1)
+
+    assert _pairs(blocked[0], blocked[1]) == _pairs(full[0], full[1])
@@ -0,0 +1,70 @@
+import numpy as np
+from vmf_clusters import union_find, cluster_labels
+
+# clusters must be the connected components of the matched pairs, whatever the order of the pairs
+
+
+def _components(left, right, n_nodes):
+    '''connected components by a plain graph walk'''
+    neighbours = {node: set() for node in range(n_nodes)}
+
+    for a, b in zip(left, right):
+        neighbours[a].add(b)
+        neighbours[b].add(a)
+
+    seen, components = set(), []
+
+    for node in range(n_nodes):
+        if node in seen or not neighbours[node]:
+            continue
+
+        component, stack = set(), [node]
+
+        while stack:
+            current = stack.pop()
+
+            if current not in component:
+                component.add(current)
+                stack.extend(neighbours[current] - component)
+
+        seen |= component
+        components.append(frozenset(component))
+
+    return set(components)
+
+
+def _clusters(labels):
+    return {frozenset(np.flatnonzero(labels == label).tolist()) for label in set(labels.tolist()) - {-1}}
+
+
+def test_labels_are_the_connected_components_of_the_pairs():
+    rng = np.random.default_rng(0)
+
+    for n_nodes in [1, 10, 200]:
+        left = rng.integers(0, n_nodes, n_nodes // 2)
+        right = rng.integers(0, n_nodes, n_nodes // 2)
+
+        labels = cluster_labels(left, right, n_nodes)
+
+        assert _clusters(labels) == _components(left.tolist(), right.tolist(), n_nodes)
+
+        # nodes in no pair are left out, labels are dense
+        paired = np.isin(np.arange(n_nodes), np.concatenate([left, right]))
+        assert ((labels >= 0) == paired).all()
+        assert set(labels[paired].tolist()) == set(range(len(_clusters(labels))))
+
+
+def test_chains_and_reverse_pairs_form_one_cluster():
+    labels = cluster_labels([0, 1, 2, 3, 4, 6], [1, 2, 3, 4, 0, 5], 8)
+
+    assert labels.tolist() == [0, 0, 0, 0, 0, 1, 1, -1]
+
+    roots = union_find([0, 1, 2, 3, 4, 6], [1, 2, 3, 4, 0, 5], 8)
+
+    # every node points straight to its root
+    assert (roots[roots] == roots).all()
+    assert len(set(roots[:5].tolist())) == 1 and roots[7] == 7
+
+
+def test_no_pairs_leave_every_node_unclustered():
+    assert cluster_labels([], [], 3).tolist() == [-1, -1, -1]
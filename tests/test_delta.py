@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+from vmf_matcher import fit_ngram_index, transform_names, self_top_k_matches, top_k_pairs
+from vmf_delta import update_vendor_matches, update_employee_matches, save_state, load_state
+from vmf_names import canonical_names
+from vmf_synthetic import generate_inputs
+
+# a delta run must find the matches of a full run over the same data. the full run refits the n_gram weights
+# on the edited vendor list, which a delta run can't reproduce without scoring every name again,
+# so edited lists are vectorized here with the weights of both lists to compare the matching rules only.
+
+N_MATCHES = 5
+
+
+def _assert_same_frame(result, expected):
+    # text columns read back are pandas' string dtype from pandas 3 on
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def _first(names):
+    '''first record of every canonical name, as matched by the vendor self match'''
+    return np.flatnonzero(~pd.Series(names).duplicated().to_numpy() | (names == ''))
+
+
+def _edited_vendors():
+    '''vendor list before and after removing, renaming and adding vendors'''
+    vendors = generate_inputs(500, seed=4)['vendors'][['id', 'name']].reset_index(drop=True)
+
+    rng = np.random.default_rng(5)
+
+    edited = vendors.drop(index=rng.choice(len(vendors), 10, replace=False)).reset_index(drop=True)
+
+    renamed = rng.choice(len(edited), 10, replace=False)
+    edited.loc[renamed, 'name'] = [name[::-1].title() for name in edited.loc[renamed, 'name']]
+
+    added = generate_inputs(20, seed=6)['vendors'][['name']].assign(id=np.arange(20) + 10_000_000)
+
+    return vendors, pd.concat([edited, added[['id', 'name']]], ignore_index=True), renamed
+
+
+def _directed(left, right, names, lookup_names):
+    return set(zip(np.asarray(names, dtype=object)[left].tolist(), np.asarray(lookup_names, dtype=object)[right].tolist()))
+
+
+def test_vendor_delta_on_unchanged_names_equals_full_match():
+    vendors, _, _ = _edited_vendors()
+
+    names = canonical_names(vendors.name)
+    names = names[_first(names)]
+
+    matrix = fit_ngram_index(list(names), 3)['matrix']
+
+    left, right, _ = self_top_k_matches(matrix, N_MATCHES, n_jobs=1)
+
+    stored = pd.DataFrame({'name': names[left], 'match_name': names[right]})
+
+    delta_left, delta_right, _ = update_vendor_matches(stored, matrix, names, N_MATCHES)
+
+    assert _directed(delta_left, delta_right, names, names) == _directed(left, right, names, names)
+    assert len(delta_left) == len(left)
+
+
+def test_vendor_delta_on_edited_names_equals_full_match():
+    vendors, edited, _ = _edited_vendors()
+
+    names, edited_names = canonical_names(vendors.name), canonical_names(edited.name)
+    names, edited_names = names[_first(names)], edited_names[_first(edited_names)]
+
+    index = fit_ngram_index(list(names) + list(edited_names), 3)
+
+    matrix, edited_matrix = transform_names(index, list(names)), transform_names(index, list(edited_names))
+
+    left, right, _ = self_top_k_matches(matrix, N_MATCHES, n_jobs=1)
+
+    stored = pd.DataFrame({'name': names[left], 'match_name': names[right]})
+
+    full_left, full_right, _ = self_top_k_matches(edited_matrix, N_MATCHES, n_jobs=1)
+
+    delta_left, delta_right, _ = update_vendor_matches(stored, edited_matrix, edited_names, N_MATCHES)
+
+    assert _directed(delta_left, delta_right, edited_names, edited_names) == \
+        _directed(full_left, full_right, edited_names, edited_names)
+    assert len(delta_left) == len(full_left)
+
+
+def test_employee_delta_equals_full_match():
+    vendors, edited, renamed = _edited_vendors()
+
+    employees = generate_inputs(400, seed=7)['employees'].employee_name
+
+    employee_names = np.unique(canonical_names(employees))
+    edited_employee_names = np.unique(np.concatenate([employee_names[40:], canonical_names(
+        generate_inputs(30, seed=8)['employees'].employee_name)]))
+
+    index = fit_ngram_index(list(canonical_names(vendors.name)) + list(canonical_names(edited.name)), 3)
+
+    vendor_matrix = transform_names(index, list(canonical_names(vendors.name)))
+    edited_vendor_matrix = transform_names(index, list(canonical_names(edited.name)))
+
+    left, right, _ = top_k_pairs(transform_names(index, list(employee_names)), vendor_matrix, N_MATCHES, n_jobs=1)
+
+    stored = pd.DataFrame({'name': employee_names[left], 'vendor_id': vendors.id.to_numpy()[right]})
+
+    changed = ~edited.id.isin(vendors.id).to_numpy()
+    changed[renamed] = True
+
+    removed = vendors.id[~vendors.id.isin(edited.id)].to_numpy()
+
+    for query_names, vendor_matrix, vendor_ids, changed, removed in [
+            (employee_names, vendor_matrix, vendors.id.to_numpy(), np.zeros(len(vendors), dtype=bool), removed[:0]),
+            (edited_employee_names, edited_vendor_matrix, edited.id.to_numpy(), changed, removed)]:
+        query_matrix = transform_names(index, list(query_names))
+
+        full_left, full_right, _ = top_k_pairs(query_matrix, vendor_matrix, N_MATCHES, n_jobs=1)
+
+        delta_left, delta_right, _ = update_employee_matches(stored, query_matrix, query_names,
+                                                             np.zeros(len(query_names), dtype=bool), vendor_matrix,
+                                                             vendor_ids, changed, removed, N_MATCHES)
+
+        assert _directed(delta_left, delta_right, query_names, vendor_ids) == \
+            _directed(full_left, full_right, query_names, vendor_ids)
+        assert len(delta_left) == len(full_left)
+
+
+def test_changed_employee_names_are_matched_again():
+    vendors = generate_inputs(500, seed=4)['vendors']
+
+    employee_names = np.unique(canonical_names(generate_inputs(400, seed=7)['employees'].employee_name))
+
+    index = fit_ngram_index(list(canonical_names(vendors.name)), 3)
+
+    query_matrix = transform_names(index, list(employee_names))
+
+    left, right, _ = top_k_pairs(query_matrix, index['matrix'], N_MATCHES, n_jobs=1)
+
+    # the stored matches of the first name are stale, only its employee record flags it
+    stale = pd.DataFrame({'name': employee_names[left], 'vendor_id': vendors.id.to_numpy()[right]})
+    stale.loc[left == 0, 'vendor_id'] = vendors.id.to_numpy()[-N_MATCHES:]
+
+    changed = np.zeros(len(employee_names), dtype=bool)
+    changed[0] = True
+
+    delta_left, delta_right, _ = update_employee_matches(stale, query_matrix, employee_names, changed, index['matrix'],
+                                                         vendors.id.to_numpy(), np.zeros(len(vendors), dtype=bool),
+                                                         vendors.id[:0].to_numpy(), N_MATCHES)
+
+    vendor_ids = vendors.id.to_numpy()
+
+    assert _directed(delta_left, delta_right, employee_names, vendor_ids) == \
+        _directed(left, right, employee_names, vendor_ids)
+
+
+def test_saved_state_loads_without_pickles(tmp_path):
+    folder = str(tmp_path / 'delta_state')
+
+    tables = {'vendors': pd.DataFrame({'id': [1, 2], 'name': ['Acme Corp', 'Bolt Ltd']}),
+              'active_matches': pd.DataFrame({'name': ['john smith'], 'vendor_id': [2]})}
+
+    save_state(folder, pd.Timestamp('2024-01-31'), 3, N_MATCHES, tables)
+
+    state = load_state(folder, 3, N_MATCHES)
+
+    assert state['as_of'] == pd.Timestamp('2024-01-31')
+
+    for name, df in tables.items():
+        _assert_same_frame(state['tables'][name], df)
+
+    assert load_state(folder, 3, N_MATCHES + 1) is None
+
+
+def test_state_of_compacted_tables_loads_as_text(tmp_path):
+    folder = str(tmp_path / 'delta_state')
+
+    vendors = pd.DataFrame({'id': [1, 2], 'name': pd.Categorical(['Acme Corp', 'Bolt Ltd'])})
+
+    save_state(folder, pd.Timestamp('2024-01-31'), 3, N_MATCHES, {'vendors': vendors})
+
+    _assert_same_frame(load_state(folder, 3, N_MATCHES)['tables']['vendors'],
+                       vendors.astype({'name': object}))
+
+    # a table that could only be loaded by unpickling it makes the state unreadable
+    np.savez(f'{folder}/vendors.npz', name=np.array([{'a': 1}], dtype=object))
+
+    assert load_state(folder, 3, N_MATCHES) is None
@@ -0,0 +1,59 @@
+import pandas as pd
+from vmf_employees import build_employee_index, lookup_employees
+
+# one join over the employee index must return what the per employee mapping returned
+
+
+def _employee_lists():
+    active = pd.DataFrame({'employee_id': [1, 2, 3], 'employee_name': ['Jane  Doe', 'John Smith', 'Ann Lee'],
+                           'departement': ['IT', 'HR', 'IT'],
+                           'hiring_date': pd.to_datetime(['2019-01-01', '2020-01-01', '2021-01-01'])})
+
+    terminated = pd.DataFrame({'employee_id': [3, 4], 'employee_name': ['Ann Lee', 'Bob Ray'],
+                               'departement': ['Sales', 'Ops'],
+                               'hiring_date': pd.to_datetime(['2010-01-01', '2011-01-01']),
+                               'termination_date': pd.to_datetime(['2018-06-30', '2019-06-30'])})
+
+    return active, terminated
+
+
+def test_index_stacks_both_lists_with_their_status():
+    index = build_employee_index(*_employee_lists())
+
+    assert index.employee_status.tolist() == ['Active'] * 3 + ['Terminated'] * 2
+    assert index.name_key.tolist() == ['jane doe', 'john smith', 'ann lee', 'ann lee', 'bob ray']
+    assert index.termination_date.isna().tolist() == [True] * 3 + [False] * 2
+
+
+def test_index_without_terminated_employees_has_termination_dates():
+    active, terminated = _employee_lists()
+
+    index = build_employee_index(active, terminated.iloc[:0].drop(columns='termination_date'))
+
+    assert index.termination_date.isna().all()
+
+
+def test_lookups_by_id_resolve_to_active_records_first():
+    index = build_employee_index(*_employee_lists())
+
+    found = lookup_employees(index, [3, 9, 4, 1], ['employee_status', 'departement'])
+
+    assert found.employee_status[[0, 2, 3]].tolist() == ['Active', 'Terminated', 'Active']
+    assert found.departement[0] == 'IT'
+
+    # unknown ids are missing
+    assert found.iloc[1].isna().all()
+
+    # limited to terminated employees, the terminated record of an id listed twice is used
+    found = lookup_employees(index, [3, 1], ['departement', 'termination_date'], status='Terminated')
+
+    assert found.departement[0] == 'Sales' and pd.isna(found.departement[1])
+    assert found.termination_date[0] == pd.Timestamp('2018-06-30')
+
+
+def test_lookups_by_name_ignore_case_and_spacing():
+    index = build_employee_index(*_employee_lists())
+
+    found = lookup_employees(index, ['JANE DOE', ' bob  ray', 'nobody'], ['employee_id'], by='name_key')
+
+    assert found.employee_id.tolist()[:2] == [1, 4] and pd.isna(found.employee_id[2])
@@ -0,0 +1,47 @@
+from difflib import SequenceMatcher
+import numpy as np
+from vmf_fields import field_of, exact_similarity, prefix_similarity, token_cosine_similarity, compare_field
+
+# every details field is scored by its own comparator, pairs with a missing or empty side score 0
+
+
+def test_fields_are_named_after_their_column():
+    assert field_of('vendor_phone') == 'phone'
+    assert field_of('match_vendor_postal_code') == 'postal_code'
+    assert field_of('employee_ssn') == 'ssn'
+    assert field_of('vendor_name') == 'name'
+
+
+def test_identifiers_are_compared_without_separators_and_case():
+    scores = exact_similarity(['+1 (555) 010-2030', 'ab-12', None, '--', 5550102030],
+                              ['15550102030', 'AB12', 'AB12', '--', '555-010-2030'])
+
+    np.testing.assert_array_equal(scores, [1, 1, 0, 0, 1])
+
+
+def test_postal_codes_are_scored_by_their_common_prefix():
+    scores = prefix_similarity(['12345', '12345', 'SW1A 1AA', '12345', None],
+                               ['12399', '12345-6789', 'sw1a2aa', '98765', '12345'])
+
+    np.testing.assert_allclose(scores, [3 / 5, 5 / 9, 4 / 7, 0, 0])
+
+
+def test_addresses_are_scored_by_their_word_vectors():
+    left = ['12 Main Street', 'Main Street 12', '12 Main Street', None]
+    right = ['12 main street', '12 Main Street', '7 Harbour Road', '12 Main Street']
+
+    scores = token_cosine_similarity(left, right)
+
+    # the word order and the case don't count, addresses sharing no word score 0
+    np.testing.assert_allclose(scores, [1, 1, 0, 0], atol=1e-12)
+
+    partial = token_cosine_similarity(['12 Main Street'], ['14 Main Street'])[0]
+    assert 0 < partial < 1
+
+
+def test_fields_without_a_comparator_use_the_string_metric():
+    scores = compare_field('email', ['jane@acme.com'], ['jane@acme.co'])
+
+    assert scores[0] == SequenceMatcher(None, 'jane@acme.com', 'jane@acme.co').ratio()
+
+    assert compare_field('tin', ['12-345'], ['12345'])[0] == 1
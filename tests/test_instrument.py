@@ -0,0 +1,37 @@
+import vmf_instrument
+from vmf_instrument import RunReport, worker_usage
+
+# the cpu time of pool workers running blocks of a step is added to the step that submitted them
+
+
+def test_worker_cpu_time_is_added_to_the_measured_step():
+    report = RunReport()
+
+    report.measure('r1', 'matching', worker_usage, 1, 5., 0)
+
+    assert report.to_frame().cpu_seconds.iloc[0] >= 5.
+
+
+def test_worker_usage_outside_of_a_step_is_ignored():
+    report = RunReport()
+
+    worker_usage(1, 5., 0)
+
+    report.measure('r1', 'matching', lambda: None)
+
+    assert report.to_frame().cpu_seconds.iloc[0] < 5.
+
+
+def test_peak_memory_tells_how_it_was_measured(monkeypatch):
+    report = RunReport()
+
+    report.measure('r1', 'matching', lambda: None)
+
+    monkeypatch.setattr(vmf_instrument, 'psutil', None)
+
+    report.measure('r2', 'matching', lambda: None)
+
+    frame = report.to_frame().set_index('name')
+
+    assert frame.memory_scope['r1'] == 'step'
+    assert frame.memory_scope['r2'] == ('process' if vmf_instrument.resource is not None else None)
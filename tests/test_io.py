@@ -0,0 +1,271 @@
+import os
+import shutil
+import threading
+import pytest
+import pandas as pd
+import vmf_io
+from vmf_io import openpyxl
+from vmf_io import iter_input_chunks, iter_sheet_chunks, read_input, read_inputs, read_typed_csv, INPUTS
+from vmf_synthetic import generate_inputs, write_inputs
+
+# typed inputs must be the same whether they're read whole, streamed in chunks or loaded from the cache
+
+
+def _assert_same_frame(result, expected):
+    # text columns read back from Arrow or numpy are pandas' string dtype from pandas 3 on
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+@pytest.fixture
+def inputs_folder(tmp_path):
+    write_inputs(generate_inputs(300, seed=9), str(tmp_path))
+
+    return str(tmp_path)
+
+
+@pytest.mark.skipif(vmf_io.pa is None, reason='streamed inputs are cached with pyarrow only')
+def test_first_streamed_pass_writes_the_cache(inputs_folder, monkeypatch):
+    cache_folder = f'{inputs_folder}/cache'
+
+    expected = read_typed_csv(f'{inputs_folder}/{INPUTS["po"]["file"]}', INPUTS['po'])
+
+    streamed = pd.concat(iter_input_chunks(inputs_folder, 'po', cache_folder, 100), ignore_index=True)
+
+    _assert_same_frame(streamed, expected)
+
+    # later passes and loads read the cache rather than the CSV
+    monkeypatch.setattr(vmf_io, 'read_typed_csv', None)
+    monkeypatch.setattr(vmf_io.pd, 'read_csv', None)
+
+    _assert_same_frame(pd.concat(iter_input_chunks(inputs_folder, 'po', cache_folder, 100),
+                                         ignore_index=True), expected)
+    _assert_same_frame(read_input(inputs_folder, 'po', cache_folder), expected)
+
+
+@pytest.mark.skipif(vmf_io.pa is None, reason='streamed inputs are cached with pyarrow only')
+def test_concurrent_streamed_passes_decode_the_csv_once(inputs_folder, monkeypatch):
+    cache_folder = f'{inputs_folder}/cache'
+
+    decoded, read_csv = [], pd.read_csv
+
+    def counted_read_csv(*args, **kwargs):
+        if 'chunksize' in kwargs:
+            decoded.append(args[0])
+        return read_csv(*args, **kwargs)
+
+    monkeypatch.setattr(vmf_io.pd, 'read_csv', counted_read_csv)
+
+    results = [None] * 3
+
+    def stream(i):
+        results[i] = pd.concat(iter_input_chunks(inputs_folder, 'po', cache_folder, 100), ignore_index=True)
+
+    threads = [threading.Thread(target=stream, args=(i,)) for i in range(3)]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    assert len(decoded) == 1
+
+    for result in results[1:]:
+        _assert_same_frame(result, results[0])
+
+
+def test_interrupted_streamed_pass_leaves_no_cache(inputs_folder):
+    cache_folder = f'{inputs_folder}/cache'
+
+    chunks = iter_input_chunks(inputs_folder, 'po', cache_folder, 100)
+    next(chunks)
+    chunks.close()
+
+    _, meta_file = vmf_io._cache_files(cache_folder, 'po')
+
+    assert not vmf_io._cache_is_valid(f'{inputs_folder}/{INPUTS["po"]["file"]}', meta_file, INPUTS['po'])
+
+
+@pytest.mark.skipif(vmf_io.pa is None, reason='inputs are memory-mapped with pyarrow only')
+def test_cached_inputs_keep_numeric_columns_mapped(inputs_folder):
+    cache_folder = f'{inputs_folder}/cache'
+
+    read_input(inputs_folder, 'vendors', cache_folder)
+
+    vendors = read_input(inputs_folder, 'vendors', cache_folder, ['id', 'name'])
+
+    assert list(vendors.columns) == ['id', 'name']
+
+    # a view of the mapped file can't be written to
+    assert not vendors.id.to_numpy().flags.writeable
+
+
+def test_workbook_is_opened_once_to_check_headers_and_not_again_once_cached(tmp_path, monkeypatch):
+    workbook = str(tmp_path / 'VMF.xlsm')
+    shutil.copy(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'VMF.xlsm'), workbook)
+
+    opened, open_workbook = [], vmf_io._open_workbook
+
+    def counted_open_workbook(file_name):
+        opened.append(file_name)
+        return open_workbook(file_name)
+
+    monkeypatch.setattr(vmf_io, '_open_workbook', counted_open_workbook)
+
+    first = read_inputs(str(tmp_path), str(tmp_path / 'cache'), workbook=workbook)
+
+    # one opening checks every sheet header, then every sheet is read once
+    assert len(opened) == 1 + len(INPUTS)
+
+    opened.clear()
+
+    second = read_inputs(str(tmp_path), str(tmp_path / 'cache'), workbook=workbook)
+
+    assert opened == []
+
+    for name in INPUTS:
+        _assert_same_frame(second[name], first[name])
+
+
+def test_renamed_header_fails_the_load_before_any_input_is_parsed(inputs_folder, monkeypatch):
+    vendors_file = f'{inputs_folder}/{INPUTS["vendors"]["file"]}'
+
+    pd.read_csv(vendors_file, sep='\t', encoding='utf-16').rename(columns={'name': 'vendor_name'}).to_csv(
+        vendors_file, sep='\t', encoding='utf-16', index=False)
+
+    parsed = []
+    monkeypatch.setattr(vmf_io, 'read_typed_csv', lambda csv_file, spec: parsed.append(csv_file))
+
+    with pytest.raises(ValueError, match=r"VMF_vendor_list.csv misses the columns \['name'\]"):
+        read_inputs(inputs_folder)
+
+    assert parsed == []
+
+
+def test_inputs_are_read_in_schema_order_without_type_inference(tmp_path):
+    inputs = generate_inputs(300, seed=9)
+
+    # reordered columns, an extra one, and codes that would be read as numbers if inferred
+    inputs['employees'] = inputs['employees'].iloc[:, ::-1].assign(notes='n/a')
+    inputs['vendors'].loc[:, 'postal_code'] = '01234'
+
+    write_inputs(inputs, str(tmp_path))
+
+    loaded = read_inputs(str(tmp_path))
+
+    for name, spec in INPUTS.items():
+        assert list(loaded[name].columns) == list(spec['columns'])
+
+        _assert_same_frame(loaded[name], read_typed_csv(f'{tmp_path}/{spec["file"]}', spec))
+
+    assert (loaded['vendors'].postal_code == '01234').all()
+    assert loaded['employees'].employee_id.dtype == 'int64'
+    assert pd.api.types.is_datetime64_any_dtype(loaded['employees'].hiring_date)
+
+
+def test_cache_is_reused_until_its_source_or_schema_changes(inputs_folder, monkeypatch):
+    cache_folder = f'{inputs_folder}/cache'
+    vendors_file = f'{inputs_folder}/{INPUTS["vendors"]["file"]}'
+
+    first = read_input(inputs_folder, 'vendors', cache_folder)
+
+    parsed, read_typed = [], vmf_io.read_typed_csv
+
+    def counted_read_typed_csv(csv_file, spec):
+        parsed.append(csv_file)
+        return read_typed(csv_file, spec)
+
+    monkeypatch.setattr(vmf_io, 'read_typed_csv', counted_read_typed_csv)
+
+    # a touched or copied file of the same content keeps the cache
+    os.utime(vendors_file, ns=(0, 0))
+
+    _assert_same_frame(read_input(inputs_folder, 'vendors', cache_folder), first)
+    assert parsed == []
+
+    # a new content is read again
+    vendors = pd.read_csv(vendors_file, sep='\t', encoding='utf-16')
+    vendors.loc[0, 'name'] = 'Renamed Vendor'
+    vendors.to_csv(vendors_file, sep='\t', encoding='utf-16', index=False)
+
+    assert read_input(inputs_folder, 'vendors', cache_folder).name[0] == 'Renamed Vendor'
+    assert parsed == [vendors_file]
+
+    # so is an input whose schema changed since it was cached, or cached under older typing rules
+    spec = dict(INPUTS['vendors'], columns={col: kind for col, kind in INPUTS['vendors']['columns'].items()
+                                            if col != 'contact_name'})
+    monkeypatch.setitem(INPUTS, 'vendors', spec)
+
+    assert 'contact_name' not in read_input(inputs_folder, 'vendors', cache_folder).columns
+    assert len(parsed) == 2
+
+    monkeypatch.setattr(vmf_io, 'CACHE_VERSION', vmf_io.CACHE_VERSION + 1)
+
+    read_input(inputs_folder, 'vendors', cache_folder)
+    assert len(parsed) == 3
+
+    read_input(inputs_folder, 'vendors', cache_folder)
+    assert len(parsed) == 3
+
+
+def _write_workbook(inputs, file_name):
+    '''writing input lists to the sheets of a workbook as typed in VMF.xlsm: numbers, dates and empty cells'''
+    book = openpyxl.Workbook()
+    book.remove(book.active)
+
+    for name, df in inputs.items():
+        sheet = book.create_sheet(INPUTS[name]['sheet'])
+        sheet.append(list(df.columns))
+
+        for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+            sheet.append([value.to_pydatetime() if isinstance(value, pd.Timestamp) else value for value in row])
+
+    book.save(file_name)
+
+
+@pytest.mark.skipif(openpyxl is None, reason='workbooks are read with openpyxl only')
+def test_workbook_sheets_read_like_their_csv_export(tmp_path):
+    inputs = generate_inputs(300, seed=9)
+
+    write_inputs(inputs, str(tmp_path))
+
+    # postal codes typed as numbers (but those with a leading zero) and po totals with the decimals
+    # the export rounds away
+    codes = inputs['vendors'].postal_code.astype(object)
+    numbers = codes.notna() & ~codes.str.startswith('0', na=True)
+    codes[numbers] = codes[numbers].astype(int)
+    inputs['vendors'] = inputs['vendors'].assign(postal_code=codes)
+    inputs['po'] = inputs['po'].assign(po_total=inputs['po'].po_total + .4)
+
+    workbook = str(tmp_path / 'VMF.xlsx')
+    _write_workbook(inputs, workbook)
+
+    exported = read_inputs(str(tmp_path))
+    read = read_inputs(str(tmp_path), str(tmp_path / 'cache'), workbook=workbook)
+
+    for name in INPUTS:
+        _assert_same_frame(read[name], exported[name])
+
+    # chunks streamed from a sheet, and a cache written from the workbook isn't used for the CSV export
+    _assert_same_frame(pd.concat(iter_sheet_chunks(workbook, INPUTS['po'], 70), ignore_index=True), exported['po'])
+
+    assert not vmf_io._is_cached(f'{tmp_path}/{INPUTS["po"]["file"]}', str(tmp_path / 'cache'), 'po')
+    assert vmf_io._is_cached(workbook, str(tmp_path / 'cache'), 'po')
+
+
+@pytest.mark.skipif(openpyxl is None, reason='workbooks are read with openpyxl only')
+def test_workbook_missing_a_sheet_or_a_column_fails_the_load(tmp_path):
+    inputs = generate_inputs(50, seed=9)
+
+    workbook = str(tmp_path / 'VMF.xlsx')
+
+    _write_workbook({name: df for name, df in inputs.items() if name != 'access_rights'}, workbook)
+
+    with pytest.raises(ValueError, match="has no sheet 'access_rights'"):
+        read_inputs(str(tmp_path), workbook=workbook)
+
+    inputs['po'] = inputs['po'].drop(columns='currency')
+    _write_workbook(inputs, workbook)
+
+    with pytest.raises(ValueError, match=r"VMF.xlsx\[po_list\] misses the columns \['currency'\]"):
+        read_inputs(str(tmp_path), workbook=workbook)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+from vmf_keys import build_key_codes, encode, join_positions, last_by_code, lookup_codes
+
+# joins on integer codes must pair the rows a merge on the original values pairs, in the same order
+
+
+def test_key_codes_share_one_vocabulary_per_key():
+    inputs = {'vendors': pd.DataFrame({'name': ['Acme', 'Bolt', None],
+                                       'creation_user_id': ['u1', 'u2', 'u1'],
+                                       'modification_user_id': [None, 'u3', 'u1']}),
+              'po': None,
+              'employees': pd.DataFrame({'employee_id': ['u3', 'u4']})}
+
+    keys = build_key_codes(inputs)
+
+    # the streamed PO list and the inputs that aren't loaded hold no codes
+    assert set(keys['codes']) == {('vendors', 'name'), ('vendors', 'creation_user_id'),
+                                  ('vendors', 'modification_user_id'), ('employees', 'employee_id')}
+
+    assert list(keys['vocabularies']['vendor_name']) == ['Acme', 'Bolt']
+    assert keys['codes'][('vendors', 'name')].tolist() == [0, 1, -1]
+
+    users = keys['vocabularies']['user_id']
+
+    assert sorted(users) == ['u1', 'u2', 'u3', 'u4']
+
+    for (name, col), codes in keys['codes'].items():
+        if name != 'vendors' or col != 'name':
+            np.testing.assert_array_equal(users[codes[codes >= 0]], inputs[name][col].dropna())
+
+    # values read later, i.e. PO chunks, get -1 when the vocabulary doesn't hold them
+    assert encode(keys['vocabularies']['vendor_name'], ['Bolt', 'Zeta']).tolist() == [1, -1]
+
+
+def test_join_positions_match_a_merge():
+    left = np.array([2, 0, -1, 1, 2, 5])
+    right = np.array([1, 2, 2, -1, 0, 2])
+
+    rows, cols = join_positions(left, right)
+
+    merged = pd.DataFrame({'code': left, 'left': np.arange(len(left))}).merge(
+        pd.DataFrame({'code': right, 'right': np.arange(len(right))}), on='code')
+
+    merged = merged[merged.code >= 0].sort_values(['left', 'right'])
+
+    assert rows.tolist() == merged.left.tolist()
+    assert cols.tolist() == merged.right.tolist()
+
+    empty = join_positions([], right)
+    assert len(empty[0]) == 0 and len(empty[1]) == 0
+
+
+def test_last_by_code_keeps_the_last_row_and_reports_conflicts(capsys):
+    codes = [0, 2, 0, -1, 2]
+    values = ['a', 'c', 'b', 'x', 'c']
+
+    table = last_by_code(codes, values, 4, label='names')
+
+    assert table.tolist() == ['b', None, 'c', None]
+    assert '1 keys shared by records of different names' in capsys.readouterr().out
+
+    assert lookup_codes(table, [2, -1, 1, 0]).tolist() == ['c', None, None, 'b']
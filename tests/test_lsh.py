@@ -0,0 +1,63 @@
+import numpy as np
+from vmf_blocking import candidate_pairs
+from vmf_lsh import lsh_blocks
+from vmf_matcher import fit_ngram_index
+
+# names sharing their n_grams always fall in the same buckets, unrelated names hardly ever do
+
+
+def _candidates(names, bands, rows, seed=0):
+    index = fit_ngram_index(names, 3)
+
+    blocks = lsh_blocks(index['matrix'], bands=bands, rows=rows, seed=seed)
+
+    left, right, _ = candidate_pairs(blocks, blocks, len(names), len(names), self_match=True)
+
+    return blocks, set(zip(left.tolist(), right.tolist()))
+
+
+def test_every_name_gets_one_bucket_per_band():
+    names = ['acme supplies', 'acme supply', 'x', 'zeta holdings']
+
+    (positions, labels), _ = _candidates(names, 8, 2)
+
+    # 'x' has no n_gram and is left out
+    assert sorted(set(positions.tolist())) == [0, 1, 3]
+    assert len(positions) == 8 * 3
+
+    assert sorted(set((labels & np.uint64(255)).tolist())) == list(range(8))
+
+
+def test_identical_n_grams_are_always_candidates():
+    names = ['Acme Supplies', 'ACME SUPPLIES', 'acme, supplies.', 'Zeta Holdings']
+
+    _, pairs = _candidates(names, 20, 4)
+
+    assert {(0, 1), (0, 2), (1, 2)} <= pairs
+    assert not any(3 in pair for pair in pairs)
+
+
+def test_buckets_follow_the_seed():
+    names = ['acme supplies', 'acme supply', 'acme supplier', 'zeta holdings', 'zeta holding']
+
+    first, _ = _candidates(names, 10, 2, seed=3)
+    second, _ = _candidates(names, 10, 2, seed=3)
+
+    for expected, result in zip(first, second):
+        np.testing.assert_array_equal(expected, result)
+
+
+def test_close_names_are_found_and_distant_ones_pruned():
+    rng = np.random.default_rng(0)
+
+    words = [''.join(rng.choice(list('abcdefghijklmnopqrstuvwxyz'), 12)) for _ in range(100)]
+
+    # every word and the same word with its last letter changed
+    names = words + [word[:-1] + 'z' for word in words]
+
+    _, pairs = _candidates(names, 50, 2)
+
+    close = {(i, i + 100) for i in range(100)}
+
+    assert len(close & pairs) >= 95
+    assert len(pairs - close) < .05 * (200 * 199 // 2)
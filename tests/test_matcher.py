@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from vmf_matcher import fit_ngram_index, transform_names, top_k_matches, self_top_k_matches, self_top_k_pairs
+from vmf_synthetic import generate_inputs
+
+# matchers run in parallel threads by the pipeline (see vmf_pipeline) must each use their own matrices
+
+
+def _matchers():
+    inputs = generate_inputs(600, seed=1)
+
+    index = fit_ngram_index(list(inputs['vendors'].name), 3)
+
+    active = transform_names(index, list(inputs['employees'].employee_name))
+    terminated = transform_names(index, list(inputs['terminated_employees'].employee_name))
+
+    # small blocks and a single job, so every block runs in the calling thread
+    return [lambda: self_top_k_pairs(index['matrix'], 10, block_size=20, n_jobs=1),
+            lambda: top_k_matches(active, index['matrix'], 10, block_size=20, n_jobs=1),
+            lambda: top_k_matches(terminated, index['matrix'], 10, block_size=20, n_jobs=1)]
+
+
+def test_parallel_matchers_match_sequential_runs():
+    matchers = _matchers()
+
+    sequential = [match() for match in matchers]
+
+    for _ in range(3):
+        with ThreadPoolExecutor(max_workers=len(matchers)) as executor:
+            parallel = [future.result() for future in [executor.submit(match) for match in matchers]]
+
+        for expected, result in zip(sequential, parallel):
+            for expected_array, result_array in zip(expected, result):
+                np.testing.assert_array_equal(expected_array, result_array)
+
+
+def test_pool_matchers_in_parallel_threads_match_sequential_runs():
+    inputs = generate_inputs(600, seed=1)
+
+    index = fit_ngram_index(list(inputs['vendors'].name), 3)
+
+    active = transform_names(index, list(inputs['employees'].employee_name))
+
+    # pool workers load the matrices shared by their own call
+    matchers = [lambda: self_top_k_pairs(index['matrix'], 10, block_size=100, n_jobs=2),
+                lambda: top_k_matches(active, index['matrix'], 10, block_size=100, n_jobs=2)]
+
+    sequential = [self_top_k_pairs(index['matrix'], 10, n_jobs=1), top_k_matches(active, index['matrix'], 10, n_jobs=1)]
+
+    with ThreadPoolExecutor(max_workers=len(matchers)) as executor:
+        parallel = [future.result() for future in [executor.submit(match) for match in matchers]]
+
+    for expected, result in zip(sequential, parallel):
+        for expected_array, result_array in zip(expected, result):
+            np.testing.assert_array_equal(expected_array, result_array)
+
+
+def test_self_pairs_fold_the_top_matches_of_every_row():
+    index = fit_ngram_index(list(generate_inputs(600, seed=2)['vendors'].name.drop_duplicates()), 3)
+
+    left, right, _ = self_top_k_pairs(index['matrix'], 5, block_size=50, chunk_size=120, n_jobs=1)
+
+    # every row ranked against all rows, dropping itself, then (i, j) and (j, i) folded
+    indices, scores = top_k_matches(index['matrix'], index['matrix'], 6, n_jobs=1)
+
+    rows = np.repeat(np.arange(indices.shape[0]), indices.shape[1])
+    other = (scores.ravel() > 0) & (rows != indices.ravel())
+
+    rows, cols = rows[other], indices.ravel()[other]
+    rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+
+    expected = set(zip(np.minimum(rows, cols)[rank < 5].tolist(), np.maximum(rows, cols)[rank < 5].tolist()))
+
+    assert set(zip(left.tolist(), right.tolist())) == expected
+    assert len(left) == len(expected)
+
+
+def test_upper_triangle_self_match_ranks_like_all_rows():
+    index = fit_ngram_index(list(generate_inputs(600, seed=3)['vendors'].name), 3)
+
+    for block_size, chunk_size in [(50, 120), (37, 91), (500, 25_000)]:
+        # every pair scored once, against every row scored against all the others
+        upper = self_top_k_matches(index['matrix'], 5, block_size=block_size, chunk_size=chunk_size, n_jobs=1)
+        full = self_top_k_matches(index['matrix'], 5, rows=np.arange(index['matrix'].shape[0]),
+                                  block_size=block_size, chunk_size=chunk_size, n_jobs=1)
+
+        for expected, result in zip(full, upper):
+            np.testing.assert_array_equal(expected, result)
@@ -0,0 +1,56 @@
+import pandas as pd
+import vmf_memory
+from vmf_memory import compact_frame, compact_frames, frame_memory
+from vmf_synthetic import generate_inputs
+
+# compacting only changes how values are held, never the values themselves
+
+
+def _values(df):
+    '''values as python objects, missing values of any dtype as None'''
+    return df.astype(object).where(df.notna(), None)
+
+
+def test_compact_frames_keep_values_and_shrink_memory(capsys):
+    frames = generate_inputs(500, seed=6)
+    frames['po'] = None
+
+    loaded = {name: df for name, df in frames.items() if df is not None}
+    expected = {name: df.copy() for name, df in loaded.items()}
+
+    compact = compact_frames(frames)
+
+    assert compact['po'] is None
+    assert 'total' in capsys.readouterr().out
+
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(_values(compact[name]), _values(df))
+
+        # the loaded frames aren't modified
+        pd.testing.assert_frame_equal(loaded[name], df)
+
+        assert frame_memory(compact[name]) < frame_memory(df)
+
+    assert isinstance(compact['vendors'].vendor_status.dtype, pd.CategoricalDtype)
+
+
+def test_compact_frame_dtypes():
+    df = pd.DataFrame({'id': [1, 2, 300], 'creation_user_id': [1., 2., 3.5],
+                       'vendor_status': ['Active', 'Inactive', 'Active'], 'name': ['a', 'b', None]})
+
+    dtypes = df.dtypes.copy()
+
+    compact = compact_frame(df, 'vendors')
+
+    assert compact.id.dtype == 'int16'
+    assert compact.creation_user_id.dtype == 'float64'
+    assert isinstance(compact.vendor_status.dtype, pd.CategoricalDtype)
+
+    if vmf_memory.STRING_DTYPE is None:
+        assert compact.name.dtype == df.name.dtype
+    else:
+        assert compact.name.dtype == vmf_memory.STRING_DTYPE
+
+    # the input frame keeps its dtypes, columns the frame doesn't hold are skipped
+    assert df.dtypes.equals(dtypes)
+    assert list(compact.columns) == list(df.columns)
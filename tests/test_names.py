@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import VMF_Automated_Test_Procedures as vmf
+from vmf_names import canonical_names, cached_canonical_names, build_acronym_index, acronym_pairs, exact_pairs
+from vmf_synthetic import generate_inputs
+
+# names are matched on their canonical forms, abbreviations through the acronym index.
+# employees sharing a canonical name are matched once, their matches must still be reported for every one of them
+
+
+def test_employees_sharing_a_canonical_name_all_get_the_fuzzy_matches():
+    inputs = generate_inputs(300, seed=7)
+
+    vendors, employees = inputs['vendors'].reset_index(drop=True), inputs['employees'].reset_index(drop=True)
+
+    employees.loc[[3, 8], 'employee_name'] = ['John Smith', 'JOHN SMITH, Inc.']
+
+    vendor_names = canonical_names(vendors.name)
+    employee_names = canonical_names(employees.employee_name)
+
+    records, _ = vmf.employee_vs_vendor_records(vendors, employees, vendor_names, employee_names, 3, 5)
+
+    matched = records.groupby('employee_id').vendor_id.apply(set)
+
+    first, second = employees.employee_id[3], employees.employee_id[8]
+
+    assert first in matched.index and second in matched.index
+    assert matched[first] == matched[second]
+    assert len(records) == len(records[['employee_id', 'vendor_id']].drop_duplicates())
+
+
+def test_employees_editing_own_records_compare_canonical_names():
+    r6 = pd.DataFrame({'vendor_name': ['ACME SUPPLIES, INC.', 'Bolt Ltd', None],
+                       'creation_user_name': ['Acme Supplies', 'Jane Doe', None],
+                       'modification_user_name': ['Jane Doe', 'Jane Doe', None]})
+
+    r7 = vmf.employees_editing_own_records(r6)
+
+    # the suffix and the case don't count, missing names never match
+    assert r7.vendor_name.tolist() == ['ACME SUPPLIES, INC.']
+    assert r7.similarity_creation.tolist() == [1]
+
+
+def test_canonical_names_drop_case_accents_punctuation_and_legal_suffixes():
+    names = ['Pfannerstill, LLC', 'PFANNERSTILL Inc.', 'Café  Müller & Sons Ltd', "O'Reilly-Smith Co.", 'Inc', None]
+
+    assert canonical_names(names).tolist() == ['pfannerstill', 'pfannerstill', 'cafe muller and sons',
+                                               'oreilly smith', 'inc', '']
+
+
+def test_cached_canonical_names_are_reused_while_the_names_dont_change(tmp_path, capsys):
+    names = ['Acme, Inc.', 'Bolt Ltd']
+
+    first = cached_canonical_names(names, str(tmp_path))
+    second = cached_canonical_names(names, str(tmp_path))
+
+    assert capsys.readouterr().out.count('loading saved canonical names') == 1
+    assert second.tolist() == first.tolist() == ['acme', 'bolt']
+
+    assert cached_canonical_names(names + ['Zeta'], str(tmp_path)).tolist() == ['acme', 'bolt', 'zeta']
+
+
+def test_abbreviations_are_paired_with_their_full_names():
+    names = ['Procter & Gamble', 'P&G', 'PricewaterhouseCoopers', 'PwC', 'Bank of America (BOFA)', 'BofA',
+             'Acme', 'ACME']
+
+    pairs = set(zip(*(side.tolist() for side in acronym_pairs(build_acronym_index(names), names))))
+
+    # single words aren't full names, 'ACME' is no abbreviation of 'Acme'
+    assert pairs == {(1, 0), (3, 2), (5, 4)}
+
+
+def test_exact_pairs_join_equal_canonical_names():
+    vendors = np.array(['acme', 'bolt', 'acme', '', '', 'acme'], dtype=object)
+
+    assert set(zip(*(side.tolist() for side in exact_pairs(vendors)))) == {(0, 2), (0, 5), (2, 5)}
+
+    employees = np.array(['bolt', '', 'zeta', 'acme'], dtype=object)
+
+    assert set(zip(*(side.tolist() for side in exact_pairs(employees, vendors)))) == {(0, 1), (3, 0), (3, 2), (3, 5)}
@@ -0,0 +1,118 @@
+import threading
+import time
+import pytest
+from vmf_pipeline import Stage, check_stages, run_stages, input_columns
+
+# stages run as soon as their inputs are available, a failing stage stops the run before its dependents start.
+# inputs are loaded with the columns read by the stages, whole when any stage doesn't declare them
+
+
+def _read(vmf_df, employees_df):
+    return None
+
+
+def _listed(vmf_df):
+    return None
+
+
+def test_input_columns_are_the_union_of_the_declared_columns():
+    stages = [Stage('names', _read, ['names'], columns={'vmf_df': ['name'], 'employees_df': ['employee_name']}),
+              Stage('ids', _read, ['ids'], columns={'vmf_df': ['id', 'name'], 'employees_df': ['employee_id']})]
+
+    columns = input_columns(stages, {'vmf_df': 'vendors', 'employees_df': 'employees', 'po_df': 'po'})
+
+    assert columns == {'vendors': {'id', 'name'}, 'employees': {'employee_name', 'employee_id'}, 'po': set()}
+
+
+def test_input_read_whole_by_any_stage_is_loaded_whole():
+    stages = [Stage('names', _read, ['names'], columns={'vmf_df': ['name'], 'employees_df': ['employee_name']}),
+              Stage('listing', _listed, ['listing'])]
+
+    columns = input_columns(stages, {'vmf_df': 'vendors', 'employees_df': 'employees'})
+
+    assert columns == {'vendors': None, 'employees': {'employee_name'}}
+
+
+def _add(a, b):
+    return a + b
+
+
+def _split(c):
+    return c // 2, c % 2
+
+
+def test_invalid_graphs_are_rejected_before_running():
+    with pytest.raises(ValueError, match='cycle'):
+        check_stages([Stage('first', _add, ['c'], inputs=['a', 'd']),
+                      Stage('second', _add, ['d'], inputs=['a', 'c'])], {'a': 1})
+
+    with pytest.raises(ValueError, match='never produced'):
+        check_stages([Stage('first', _add, ['c'])], {'a': 1})
+
+    with pytest.raises(ValueError, match='more than once'):
+        check_stages([Stage('first', _add, ['a'])], {'a': 1, 'b': 2})
+
+    calls = []
+
+    with pytest.raises(ValueError, match='cycle'):
+        run_stages([Stage('start', lambda a: calls.append(a), ['x']),
+                    Stage('first', _add, ['c'], inputs=['a', 'd']),
+                    Stage('second', _add, ['d'], inputs=['a', 'c'])], {'a': 1})
+
+    assert calls == []
+
+
+def test_outputs_are_handed_to_dependent_stages():
+    checkpoints = []
+
+    context = run_stages([Stage('halves', _split, ['half', 'rest']),
+                          Stage('sum', _add, ['c'])], {'a': 3, 'b': 4},
+                         checkpoint=lambda name, value: checkpoints.append(name))
+
+    assert {name: context[name] for name in ['c', 'half', 'rest']} == {'c': 7, 'half': 3, 'rest': 1}
+    assert checkpoints == ['c', 'half', 'rest']
+
+
+def test_independent_stages_run_concurrently():
+    # each stage waits for the other one, which only returns when both run at once
+    barrier = threading.Barrier(2, timeout=10)
+
+    def meet(a):
+        return barrier.wait()
+
+    context = run_stages([Stage('first', meet, ['x']), Stage('second', meet, ['y'])], {'a': 1}, max_workers=2)
+
+    assert {context['x'], context['y']} == {0, 1}
+
+
+def test_single_worker_runs_stages_in_declaration_order():
+    order = []
+
+    def record(name):
+        return lambda a: order.append(name)
+
+    run_stages([Stage(name, record(name), [name], inputs=['a']) for name in ['c', 'b', 'd']], {'a': 1},
+               max_workers=1)
+
+    assert order == ['c', 'b', 'd']
+
+
+def test_failing_stage_stops_dependents_and_waits_for_running_stages():
+    finished = []
+
+    def fail(a):
+        raise RuntimeError('stage failed')
+
+    def slow(a):
+        time.sleep(.3)
+        finished.append('slow')
+
+    def dependent(x):
+        finished.append('dependent')
+
+    with pytest.raises(RuntimeError, match='stage failed'):
+        run_stages([Stage('slow', slow, ['y']), Stage('failing', fail, ['x']),
+                    Stage('dependent', dependent, ['z'])], {'a': 1}, max_workers=2)
+
+    # the stage already running was waited for, the dependent one never started
+    assert finished == ['slow']
@@ -0,0 +1,81 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import vmf_report
+from vmf_report import open_workbook, write_detail_sheets, sheet_name, save_detail_table, detail_formats
+
+# detail tables split over several sheets must read back as the full table, in order
+
+
+def _table(n_rows):
+    return pd.DataFrame({'vendor_id': np.arange(n_rows), 'vendor_name': [f'vendor {i}' for i in range(n_rows)],
+                         'similarity': np.linspace(0, 1, n_rows),
+                         'creation_date': pd.date_range('2023-01-01 08:30', periods=n_rows, freq='D')})
+
+
+def _write(file_name, tables, max_rows=None):
+    workbook, formats = open_workbook(file_name)
+
+    sheets = {name: write_detail_sheets(workbook, name, df, formats, max_rows) for name, df in tables.items()}
+
+    workbook.close()
+
+    return sheets
+
+
+def test_long_tables_are_split_over_sheets(tmp_path, monkeypatch):
+    # 3 data rows under the header of every sheet
+    monkeypatch.setattr(vmf_report, 'EXCEL_MAX_ROWS', 4)
+
+    df = _table(8)
+    df.loc[2, 'vendor_name'] = None
+
+    file_name = str(tmp_path / 'report.xlsx')
+
+    sheets = _write(file_name, {'r1': df, 'r2': df.iloc[:3], 'r3': df.iloc[:0]})
+
+    assert sheets == {'r1': ['r1', 'r1_2', 'r1_3'], 'r2': ['r2'], 'r3': ['r3']}
+
+    read = pd.read_excel(file_name, sheet_name=None)
+
+    assert list(read) == ['r1', 'r1_2', 'r1_3', 'r2', 'r3']
+    assert [len(read[name]) for name in read] == [3, 3, 2, 3, 0]
+
+    # empty tables still get their header
+    assert list(read['r3'].columns) == list(df.columns)
+
+    pd.testing.assert_frame_equal(pd.concat([read['r1'], read['r1_2'], read['r1_3']], ignore_index=True), df,
+                                  check_dtype=False)
+
+
+def test_max_rows_keeps_the_first_rows(tmp_path):
+    file_name = str(tmp_path / 'report.xlsx')
+
+    assert _write(file_name, {'r1': _table(10)}, max_rows=4) == {'r1': ['r1']}
+
+    pd.testing.assert_frame_equal(pd.read_excel(file_name), _table(10).iloc[:4], check_dtype=False)
+
+
+def test_sheet_names_fit_excel():
+    name = 'Similarity across all terminated employees'
+
+    assert sheet_name(name, 1) == name[:31]
+    assert sheet_name(name, 12) == name[:28] + '_12'
+    assert all(len(sheet_name(name, part)) == 31 for part in [1, 2, 12])
+
+
+@pytest.mark.parametrize('detail_format', ['csv', 'parquet'])
+def test_full_detail_tables_are_saved(tmp_path, detail_format):
+    if detail_format not in detail_formats():
+        pytest.skip('pyarrow is not installed')
+
+    df = _table(5)
+
+    file_name = save_detail_table(df, str(tmp_path / 'details'), 'r1', detail_format)
+
+    saved = pd.read_parquet(file_name) if detail_format == 'parquet' else pd.read_csv(
+        file_name, parse_dates=['creation_date'])
+
+    pd.testing.assert_frame_equal(saved, df, check_dtype=False)
+    assert [path.name for path in (tmp_path / 'details').iterdir()] == [os.path.basename(file_name)]
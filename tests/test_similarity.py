@@ -0,0 +1,82 @@
+from difflib import SequenceMatcher
+import numpy as np
+import pytest
+import vmf_similarity
+from vmf_similarity import batch_similarity, metric_available, clear_cache
+
+# batch scores must be those of scoring every row on its own, whatever the duplicates, gaps and cache state
+
+
+LEFT = ['McDonalds', 'ACME SUPPLIES', None, 'McDonalds', 'Jane Doe', 42, '']
+RIGHT = ['McDnlds', 'ACME SUPPLY', 'Bolt Ltd', 'McDnlds', None, 42, 'x']
+
+
+def test_ratio_matches_row_wise_sequence_matcher():
+    clear_cache()
+
+    scores = batch_similarity(LEFT, RIGHT)
+
+    expected = [0 if (a is None or b is None) else SequenceMatcher(None, str(a), str(b)).ratio()
+                for a, b in zip(LEFT, RIGHT)]
+
+    np.testing.assert_array_equal(scores, expected)
+
+    # missing sides score 0, numbers are compared as text
+    assert scores[2] == 0 and scores[4] == 0 and scores[5] == 1
+
+
+def test_quick_ratio_is_an_upper_bound_of_ratio():
+    clear_cache()
+
+    ratio, quick = batch_similarity(LEFT, RIGHT), batch_similarity(LEFT, RIGHT, metric='quick')
+
+    assert (quick >= ratio).all()
+
+    # reordered characters are a full match for quick_ratio only
+    assert batch_similarity(['abc'], ['cba'], metric='quick')[0] == 1
+    assert batch_similarity(['abc'], ['cba'])[0] < 1
+
+
+def test_cached_scores_are_kept_per_metric():
+    clear_cache()
+
+    first = batch_similarity(LEFT, RIGHT)
+
+    # a distinct pair is cached once, under its metric
+    assert sum(metric == 'ratio' for metric, _, _ in vmf_similarity._pair_cache) == 4
+
+    np.testing.assert_array_equal(batch_similarity(LEFT, RIGHT), first)
+
+    batch_similarity(LEFT, RIGHT, metric='quick')
+
+    assert len(vmf_similarity._pair_cache) == 8
+
+
+def test_cache_is_dropped_when_full(monkeypatch):
+    clear_cache()
+
+    monkeypatch.setattr(vmf_similarity, 'CACHE_SIZE', 3)
+
+    batch_similarity(['a', 'b'], ['a', 'c'])
+    scores = batch_similarity(['d', 'e'], ['f', 'e'])
+
+    assert len(vmf_similarity._pair_cache) == 2
+    np.testing.assert_array_equal(scores, [0, 1])
+
+
+def test_unknown_and_unavailable_metrics():
+    with pytest.raises(ValueError):
+        batch_similarity(LEFT, RIGHT, metric='jaro')
+
+    assert not metric_available('jaro')
+    assert metric_available('ratio') and metric_available('quick')
+    assert metric_available('indel') == (vmf_similarity.rf_process is not None)
+
+
+@pytest.mark.skipif(vmf_similarity.rf_process is None, reason='rapidfuzz is not installed')
+def test_indel_is_close_to_ratio():
+    clear_cache()
+
+    ratio, indel = batch_similarity(LEFT, RIGHT), batch_similarity(LEFT, RIGHT, metric='indel')
+
+    np.testing.assert_allclose(indel, ratio, atol=.1)
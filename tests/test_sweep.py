@@ -0,0 +1,47 @@
+import VMF_Automated_Test_Procedures as vmf
+from vmf_sweep import parameter_sweep
+from vmf_synthetic import generate_inputs
+
+# every combination of a sweep, derived from a single match per n_gram, must count what a full run reports
+
+
+def _run_counts(vendors, employees, terminated, cache_folder, n_gram, n_matches):
+    '''rows of r1, r2 and r3, of their close matches and exact matches as the tests produce them'''
+    vendor_names, employee_names, terminated_names, acronym_index = vmf.normalize_names(
+        vendors, employees, terminated, cache_folder)
+
+    index = vmf.fit_vendor_name_index(vendor_names, n_gram, cache_folder)
+
+    exact = vmf.exact_name_matching(vendor_names, employee_names, terminated_names)
+
+    r1, _, _ = vmf.vendor_name_matching(vendors, vendor_names, acronym_index, index, exact, {}, False, n_gram,
+                                        n_matches, None)
+
+    counts = {}
+
+    for prefix, records in [('vendor', r1)] + [
+            (status, vmf.employee_vs_vendor_matching(vendors, df, vendor_names, names, index, exact[status], None,
+                                                     False, n_gram, n_matches)[0])
+            for status, df, names in [('active', employees, employee_names),
+                                      ('terminated', terminated, terminated_names)]]:
+        counts.update({f'{prefix}_pairs': len(records),
+                       f'{prefix}_close_matches': len(vmf.details_similarity(records)),
+                       f'{prefix}_exact_matches': int((records.similarity == 1).sum())})
+
+    return counts
+
+
+def test_sweep_counts_match_full_runs(tmp_path):
+    inputs = generate_inputs(300, seed=4)
+
+    vendors, employees, terminated = (inputs[name].reset_index(drop=True)
+                                      for name in ['vendors', 'employees', 'terminated_employees'])
+
+    report = parameter_sweep(vendors, employees, terminated, [2, 3], [1, 4, 10], str(tmp_path))
+
+    assert list(zip(report.n_gram, report.n_matches)) == [(2, 1), (2, 4), (2, 10), (3, 1), (3, 4), (3, 10)]
+
+    for row in report.to_dict('records'):
+        expected = _run_counts(vendors, employees, terminated, str(tmp_path), row['n_gram'], row['n_matches'])
+
+        assert {column: row[column] for column in expected} == expected
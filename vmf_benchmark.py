@@ -0,0 +1,195 @@
+import os
+import sys
+import argparse
+import tempfile
+import pandas as pd
+from termcolor import colored
+import VMF_Automated_Test_Procedures as vmf
+from vmf_pipeline import check_stages
+from vmf_instrument import RunReport
+from vmf_synthetic import generate_inputs, write_inputs
+
+# scaling benchmark of the full test pipeline on synthetic data (see vmf_synthetic).
+# every scale is generated, loaded, run stage by stage (r1 to r30) in a single worker and saved,
+# recording for each stage the measures of the run report (see vmf_instrument): wall and cpu time,
+# peak resident memory of the process and its pool workers while it ran and rows read and produced.
+# a report of a previous run can be given as baseline, the benchmark then fails when any stage
+# got slower or bigger than the baseline by more than the tolerance, or when the memory of a stage
+# is missing from either report (not measured on this platform) so the memory check can't pass unchecked.
+# without psutil only the peak of the process so far is known, the memory of whole runs is then compared.
+# blocking keys (see vmf_blocking) and LSH bands and rows (see vmf_lsh) can be given to measure
+# how the name matching tests scale with blocking and approximate vendor matching.
+
+
+def run_scale(n_vendors, folder, seed=0, n_gram=3, n_matches=10, weekends=(5, 6), abnormal_working_hours=(20, 5),
+              po_chunksize=None, blocking=None, lsh=None):
+    '''generating n_vendors synthetic records in folder and running all tests over them,
+    returns one report row per stage plus loading and saving'''
+    write_inputs(generate_inputs(n_vendors, seed=seed), folder)
+
+    cache_folder = os.path.join(folder, 'vmf_cache')
+
+    report = RunReport()
+
+    (vmf_df, access_rights_df, employees_df, terminated_employees_df, po_df), _ = report.measure(
+        'load', 'Loading data', vmf.load_data, folder, cache_folder, stream_po=po_chunksize is not None)
+
+    context = {'vmf_df': vmf_df, 'access_rights_df': access_rights_df, 'employees_df': employees_df,
+               'terminated_employees_df': terminated_employees_df, 'po_df': po_df,
+               'cache_folder': cache_folder, 'n_gram': n_gram, 'n_matches': min(n_matches, vmf.max_n_matches(
+                   vmf_df, employees_df, terminated_employees_df)),
+               'weekends': list(weekends), 'abnormal_working_hours': list(abnormal_working_hours),
+               'delta_state': None, 'delta_folder': os.path.join(cache_folder, 'delta_state'), 'delta_supported': False,
+               'blocking': blocking, 'lsh': lsh, 'exact_only': False}
+
+    if po_chunksize is not None:
+        context['po_chunks'] = lambda: vmf.iter_input_chunks(
+            folder, 'po', os.path.join(cache_folder, 'inputs'), po_chunksize)
+
+    stages = vmf.test_stages(po_chunksize)
+
+    check_stages(stages, context)
+
+    pending = list(stages)
+
+    while pending:
+        # running stages one at a time so their measures don't overlap
+        stage = next(stage for stage in pending if all(name in context for name in stage.inputs))
+        pending.remove(stage)
+
+        print(f'\n{stage.title}...\n')
+
+        (outputs, _), _ = report.measure(', '.join(stage.outputs), stage.title, stage.run,
+                                         {name: context[name] for name in stage.inputs})
+
+        context.update(outputs)
+
+    report.measure('save', 'Saving results', vmf.save_results, context, folder)
+
+    report = report.to_frame().drop(columns=['start_seconds', 'profile'])
+
+    report.insert(0, 'scale', n_vendors)
+
+    return report
+
+
+def run_benchmark(scales, folder, seed=0, **kwargs):
+    '''running every scale in its own sub folder, returns the report of all scales'''
+    reports = []
+
+    for n_vendors in scales:
+        print(colored(f'scale ---> ### {n_vendors} vendors ###', 'cyan'))
+
+        reports.append(run_scale(n_vendors, os.path.join(folder, f'scale_{n_vendors}'), seed, **kwargs))
+
+    return pd.concat(reports, ignore_index=True)
+
+
+def _with_memory_scope(report):
+    '''report with the memory scope of every stage (see vmf_instrument), reports saved
+    before the scope was recorded sampled the memory of every stage'''
+    return report if 'memory_scope' in report.columns else report.assign(memory_scope='step')
+
+
+def find_regressions(report, baseline, tolerance=.25, min_seconds=1., min_mb=50.):
+    '''stages of the report slower or bigger than in the baseline by more than the tolerance,
+    differences below min_seconds and min_mb are considered noise. peak memory is compared stage by stage
+    when both reports sampled it per stage, the largest peaks of the whole runs are compared when both only
+    measured the peak of the process so far (without psutil), reported as a 'run' stage of their scale.
+    memories measured differently by the two reports aren't compared (see unmeasured_stages)'''
+    merged = _with_memory_scope(report).merge(
+        _with_memory_scope(baseline)[['scale', 'name', 'wall_seconds', 'peak_rss_mb', 'memory_scope']],
+        on=['scale', 'name'], how='inner', suffixes=('', '_baseline'))
+
+    slower = (merged.wall_seconds > merged.wall_seconds_baseline * (1 + tolerance)) & (
+        merged.wall_seconds - merged.wall_seconds_baseline >= min_seconds)
+
+    per_step = (merged.memory_scope == 'step') & (merged.memory_scope_baseline == 'step')
+
+    bigger = per_step & (merged.peak_rss_mb > merged.peak_rss_mb_baseline * (1 + tolerance)) & (
+        merged.peak_rss_mb - merged.peak_rss_mb_baseline >= min_mb)
+
+    per_run = (merged.memory_scope == 'process') & (merged.memory_scope_baseline == 'process')
+
+    runs = merged[per_run].groupby('scale', as_index=False)[['peak_rss_mb', 'peak_rss_mb_baseline']].max()
+
+    runs = runs[(runs.peak_rss_mb > runs.peak_rss_mb_baseline * (1 + tolerance)) & (
+        runs.peak_rss_mb - runs.peak_rss_mb_baseline >= min_mb)].assign(name='run')
+
+    return pd.concat([merged[slower | bigger], runs], ignore_index=True)
+
+
+def unmeasured_stages(report, baseline):
+    '''stages of both the report and the baseline missing their peak memory in either of them,
+    or whose peak memory was measured differently by the two (see vmf_instrument)'''
+    merged = _with_memory_scope(report).merge(
+        _with_memory_scope(baseline)[['scale', 'name', 'peak_rss_mb', 'memory_scope']],
+        on=['scale', 'name'], how='inner', suffixes=('', '_baseline'))
+
+    return merged[merged.peak_rss_mb.isna() | merged.peak_rss_mb_baseline.isna() |
+                  (merged.memory_scope != merged.memory_scope_baseline)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark of the VMF test procedures on synthetic data.')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1000, 10000, 100000],
+                        help='numbers of vendors to benchmark')
+    parser.add_argument('--folder', help='folder receiving generated inputs and results (default: temporary folder)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the generated data')
+    parser.add_argument('--n-gram', dest='n_gram', type=int, default=3)
+    parser.add_argument('--n-matches', dest='n_matches', type=int, default=10)
+    parser.add_argument('--po-chunksize', dest='po_chunksize', type=int,
+                        help='stream the PO list in chunks of this many rows')
+    parser.add_argument('--blocking', nargs='+', choices=vmf.BLOCKING_KEYS,
+                        help='score only names sharing a block under any of these keys')
+    parser.add_argument('--lsh', type=int, nargs=2, metavar=('BANDS', 'ROWS'),
+                        help='approximate vendor name matching over MinHash/LSH buckets')
+    parser.add_argument('--output', default='VMF_benchmark.csv', help='CSV report of this run')
+    parser.add_argument('--baseline', help='CSV report of a previous run to compare against')
+    parser.add_argument('--tolerance', type=float, default=.25,
+                        help='relative slow down or memory growth allowed against the baseline')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_folder:
+        report = run_benchmark(args.scales, args.folder or temp_folder, args.seed, n_gram=args.n_gram,
+                               n_matches=args.n_matches, po_chunksize=args.po_chunksize,
+                               blocking=args.blocking, lsh=args.lsh)
+
+    report.to_csv(args.output, index=False)
+
+    print(report.drop(columns='title').to_string(index=False))
+
+    if args.baseline:
+        baseline = pd.read_csv(args.baseline)
+
+        regressions = find_regressions(report, baseline, args.tolerance)
+
+        unmeasured = unmeasured_stages(report, baseline)
+
+        per_run = sorted(set(_with_memory_scope(report).query("memory_scope == 'process'").scale) |
+                         set(_with_memory_scope(baseline).query("memory_scope == 'process'").scale))
+
+        if per_run:
+            print(colored(f'\npeak memory measured for the whole process (psutil missing) at scales '
+                          f'{", ".join(map(str, per_run))}, compared per run rather than per stage', 'cyan'))
+
+        if len(unmeasured):
+            print(colored(f'\n{len(unmeasured)} stages lack a peak memory measure in this run or in the baseline, '
+                          f'or were measured differently, memory regressions can\'t be checked:', 'red'))
+            print(unmeasured[['scale', 'name', 'peak_rss_mb', 'peak_rss_mb_baseline', 'memory_scope',
+                              'memory_scope_baseline']].to_string(index=False))
+
+        if len(regressions):
+            print(colored(f'\n{len(regressions)} stages regressed beyond {args.tolerance:.0%}:', 'red'))
+            print(regressions[['scale', 'name', 'wall_seconds', 'wall_seconds_baseline', 'peak_rss_mb',
+                               'peak_rss_mb_baseline']].to_string(index=False))
+            sys.exit(1)
+
+        if len(unmeasured):
+            sys.exit(1)
+
+        print(colored(f'\nNo stage regressed beyond {args.tolerance:.0%}.', 'yellow'))
+
+
+if __name__ == '__main__':
+    main()
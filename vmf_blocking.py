@@ -0,0 +1,238 @@
+import re
+from functools import lru_cache
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from termcolor import colored
+from vmf_matcher import rank_rows
+from vmf_fields import normalize_identifiers
+from vmf_names import STOP_WORDS
+from vmf_similarity import batch_similarity
+
+# optional blocking of the name matching tests.
+# every record is assigned to blocks by one or more keys:
+#   'soundex' ---> phonetic code of every word of its canonical name (see vmf_names), i.e. 'reinger' ---> R526
+#   'postal'  ---> its postal code, separators and case removed
+#   'prefix'  ---> first PREFIX_LENGTH letters of its canonical name
+# two records are a candidate pair when they share a block under any of the selected keys (union of keys),
+# only candidate pairs are scored by the n_gram tf-idf cosine and ranked to keep the n_matches best of each record.
+# blocks holding more than MAX_BLOCK_SIZE lookup records (common words, a shared head office postal code)
+# are skipped, as they would bring back most of the pairs blocking is meant to prune.
+# the pair reduction is counted exactly, the recall loss is estimated on a sample of records
+# whose close matches (name similarity of CLOSE_MATCH and above) are also computed without blocking.
+
+BLOCKING_KEYS = ['soundex', 'postal', 'prefix']
+
+# letters of the canonical name forming the prefix key
+PREFIX_LENGTH = 3
+
+# lookup records above which a block is skipped
+MAX_BLOCK_SIZE = 1000
+
+# records matched without blocking to estimate the recall loss
+RECALL_SAMPLE = 1000
+
+# name similarity of the matches counted by the recall estimate, same threshold as the details tests
+CLOSE_MATCH = .6
+
+# query rows of a candidate or scoring chunk
+CHUNK_ROWS = 5000
+
+_SOUNDEX_CODES = str.maketrans('bfpvcgjkqsxzdtlmnr', '111122222222334556')
+
+
+@lru_cache(maxsize=None)
+def soundex(word):
+    '''american soundex code of a word: first letter followed by three digits,
+    letters coded alike are merged unless a vowel separates them'''
+    word = re.sub(r'[^a-z]', '', word.lower())
+
+    if not word:
+        return ''
+
+    codes = word.translate(_SOUNDEX_CODES)
+
+    result, last = word[0].upper(), codes[0] if codes[0].isdigit() else ''
+
+    for letter, code in zip(word[1:], codes[1:]):
+        if code.isdigit():
+            if code != last:
+                result += code
+            last = code
+        elif letter not in 'hw':
+            last = ''
+
+    return (result + '000')[:4]
+
+
+def record_blocks(names, postal_codes, keys):
+    '''blocks of every record under the selected keys, names being canonical,
+    returns two aligned arrays (record position, block label)'''
+    positions, labels = [], []
+
+    names = pd.Series(names, dtype=object).fillna('').astype(str).reset_index(drop=True)
+
+    if 'soundex' in keys:
+        words = names.str.split().explode()
+        words = words[words.notna() & (words.str.len() > 1) & ~words.isin(STOP_WORDS)]
+        codes = 'soundex:' + words.map(soundex)
+        positions.append(codes.index.to_numpy())
+        labels.append(codes.to_numpy(dtype=object))
+
+    if 'postal' in keys:
+        codes = pd.Series(normalize_identifiers(postal_codes), dtype=object)
+        codes = 'postal:' + codes[codes.notna()]
+        positions.append(codes.index.to_numpy())
+        labels.append(codes.to_numpy(dtype=object))
+
+    if 'prefix' in keys:
+        codes = names.str.replace(r'[^a-z0-9]', '', regex=True).str[:PREFIX_LENGTH]
+        codes = 'prefix:' + codes[codes.str.len() > 0]
+        positions.append(codes.index.to_numpy())
+        labels.append(codes.to_numpy(dtype=object))
+
+    return np.concatenate(positions).astype(np.int64), np.concatenate(labels)
+
+
+def _membership(positions, codes, n_rows, n_blocks):
+    '''records x blocks binary matrix'''
+    matrix = sparse.csr_matrix((np.ones(len(positions), dtype=np.float32), (positions, codes)),
+                               shape=(n_rows, n_blocks))
+    matrix.data[:] = 1
+    return matrix
+
+
+def candidate_pairs(query_blocks, lookup_blocks, n_query, n_lookup, self_match=False, max_block_size=MAX_BLOCK_SIZE):
+    '''pairs of query and lookup records sharing at least one block, blocks are given by record_blocks.
+    self_match pairs records of a single list, each unordered pair listed once (left before right).
+    returns left positions, right positions and the number of skipped blocks'''
+    query_positions, query_labels = query_blocks
+    lookup_positions, lookup_labels = lookup_blocks
+
+    codes, labels = pd.factorize(np.concatenate([query_labels, lookup_labels]))
+
+    query = _membership(query_positions, codes[:len(query_labels)], n_query, len(labels))
+    lookup = _membership(lookup_positions, codes[len(query_labels):], n_lookup, len(labels))
+
+    # oversized blocks are dropped from the lookup side
+    block_sizes = np.asarray(lookup.sum(axis=0)).ravel()
+    skipped = block_sizes > max_block_size
+
+    lookup = sparse.csr_matrix(lookup.dot(sparse.diags((~skipped).astype(np.float32))))
+    lookup.eliminate_zeros()
+
+    lookup_transposed = sparse.csr_matrix(lookup.T)
+
+    left, right = [], []
+
+    for start in range(0, n_query, CHUNK_ROWS):
+        shared = sparse.coo_matrix(query[start:start + CHUNK_ROWS].dot(lookup_transposed))
+
+        rows = shared.row.astype(np.int64) + start
+        keep = shared.col > rows if self_match else np.ones(len(rows), dtype=bool)
+
+        left.append(rows[keep])
+        right.append(shared.col[keep].astype(np.int64))
+
+    if not left:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), int(skipped.sum())
+
+    return np.concatenate(left), np.concatenate(right), int(skipped.sum())
+
+
+def pair_scores(query_matrix, lookup_matrix, left, right):
+    '''cosine scores of aligned pairs of rows of two l2 normalized tf-idf matrices'''
+    scores = np.zeros(len(left), dtype=np.float32)
+
+    for start in range(0, len(left), CHUNK_ROWS):
+        end = start + CHUNK_ROWS
+        scores[start:end] = np.asarray(query_matrix[left[start:end]].multiply(
+            lookup_matrix[right[start:end]]).sum(axis=1)).ravel()
+
+    return scores
+
+
+def blocked_top_k_pairs(query_matrix, lookup_matrix, left, right, n_matches):
+    '''scoring candidate pairs and keeping the n_matches best of every query row,
+    pairs sharing no n_gram are dropped. returns left positions, right positions and scores'''
+    scores = pair_scores(query_matrix, lookup_matrix, left, right)
+
+    found = scores > 0
+
+    left, right, scores = left[found], right[found], scores[found]
+
+    keep, _ = rank_rows(left, right, scores, n_matches)
+
+    return left[keep], right[keep], scores[keep]
+
+
+def blocked_self_top_k_pairs(matrix, left, right, n_matches):
+    '''self match version of blocked_top_k_pairs over candidate pairs listed once (left before right),
+    every record ranks the candidates on both of its sides and a pair is kept when either of its records
+    ranks the other, as self_top_k_pairs. returns left positions, right positions and scores'''
+    scores = pair_scores(matrix, matrix, left, right)
+
+    found = scores > 0
+
+    left, right, scores = left[found], right[found], scores[found]
+
+    keep, _ = rank_rows(np.concatenate([left, right]), np.concatenate([right, left]),
+                        np.concatenate([scores, scores]), n_matches)
+
+    # folding the pairs ranked from their right record back onto (left, right)
+    keep = np.unique(keep % len(left))
+
+    return left[keep], right[keep], scores[keep]
+
+
+def estimate_recall_loss(query_matrix, lookup_matrix, left, right, n_matches, query_names, lookup_names,
+                         self_match=False, metric='ratio', sample_size=RECALL_SAMPLE, seed=0):
+    '''share of the close matches among the n_matches best matches of sampled query rows,
+    computed without blocking, that are not candidate pairs. returns the sampled rows and the estimated recall loss'''
+    n_query, n_lookup = query_matrix.shape[0], lookup_matrix.shape[0]
+
+    sample = np.sort(np.random.default_rng(seed).choice(n_query, min(sample_size, n_query), replace=False))
+
+    scores = sparse.coo_matrix(query_matrix[sample].dot(sparse.csr_matrix(lookup_matrix.T)))
+
+    rows, cols = sample[scores.row], scores.col.astype(np.int64)
+
+    # the best matches of a record in a self match are any other record
+    other = rows != cols
+    rows, cols, data = rows[other], cols[other], scores.data[other]
+
+    keep, _ = rank_rows(rows, cols, data, n_matches)
+
+    rows, cols = rows[keep], cols[keep]
+
+    close = batch_similarity(np.asarray(query_names, dtype=object)[rows], np.asarray(
+        lookup_names, dtype=object)[cols], metric=metric) >= CLOSE_MATCH
+
+    rows, cols = rows[close], cols[close]
+
+    if not len(rows):
+        return len(sample), 0.
+
+    if self_match:
+        rows, cols = np.minimum(rows, cols), np.maximum(rows, cols)
+
+    found = np.isin(rows * n_lookup + cols, left * n_lookup + right)
+
+    return len(sample), float(1 - found.mean())
+
+
+def blocking_summary(test, keys, n_query, n_lookup, left, right, skipped, recall, self_match=False):
+    '''one row of the blocking report'''
+    all_pairs = n_query * (n_query - 1) // 2 if self_match else n_query * n_lookup
+
+    sampled, recall_loss = recall
+
+    return {'test': test, 'keys': ' '.join(keys), 'records': n_query, 'all_pairs': all_pairs,
+            'candidate_pairs': len(left), 'reduction_ratio': round(1 - len(left) / all_pairs, 4) if all_pairs else 0.,
+            'skipped_blocks': skipped, 'sampled_records': sampled, 'estimated_recall_loss': round(recall_loss, 4)}
+
+
+def print_blocking_report(report):
+    print(colored('blocking ---> ' + ', '.join(
+        f"{row.test}: {row.reduction_ratio:.1%} of pairs pruned, ~{row.estimated_recall_loss:.1%} of matches lost"
+        for row in report.itertuples()), 'cyan'))
@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# duplicate vendor clusters built from the matched vendor pairs.
+# pairs passing both thresholds (close names and a high total similarity, as the vendor summary)
+# are merged into connected components by an array backed union-find (union by size, path halving),
+# so a group of N near identical vendors is reviewed as one cluster of N rows rather than up to N^2 pairs.
+# vendors are the nodes, records sharing a vendor id being a single vendor.
+
+# name similarity of the clustered pairs, close matches as in the details tests
+CLUSTER_SIMILARITY = .6
+
+# total similarity score of the clustered pairs, same filter as the vendor similarity summary
+CLUSTER_SCORE = 2
+
+
+def _find(parent, node):
+    '''root of a node, halving the path on the way'''
+    while parent[node] != node:
+        parent[node] = parent[parent[node]]
+        node = parent[node]
+
+    return node
+
+
+def union_find(left, right, n_nodes):
+    '''root of every node once the pairs (left, right) are merged,
+    nodes in no pair are their own root'''
+    parent = np.arange(n_nodes, dtype=np.int64)
+    size = np.ones(n_nodes, dtype=np.int64)
+
+    for a, b in zip(np.asarray(left, dtype=np.int64).tolist(), np.asarray(right, dtype=np.int64).tolist()):
+        a, b = _find(parent, a), _find(parent, b)
+
+        if a == b:
+            continue
+
+        # the smaller tree is attached under the larger one
+        if size[a] < size[b]:
+            a, b = b, a
+
+        parent[b] = a
+        size[a] += size[b]
+
+    # every node pointing straight to its root
+    for node in range(n_nodes):
+        parent[node] = _find(parent, node)
+
+    return parent
+
+
+def cluster_labels(left, right, n_nodes):
+    '''dense cluster label of every node in at least one pair (connected components of the pairs),
+    -1 for nodes in no pair'''
+    roots = union_find(left, right, n_nodes)
+
+    paired = np.zeros(n_nodes, dtype=bool)
+    paired[np.asarray(left, dtype=np.int64)] = True
+    paired[np.asarray(right, dtype=np.int64)] = True
+
+    labels = np.full(n_nodes, -1, dtype=np.int64)
+    labels[paired] = pd.factorize(roots[paired])[0]
+
+    return labels
@@ -0,0 +1,248 @@
+import os
+import json
+import shutil
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from termcolor import colored
+from vmf_matcher import self_top_k_matches, top_k_pairs, BLOCK_SIZE
+
+# incremental (delta) matching between monitoring runs.
+# each run keeps a snapshot of vendor and employee ids and names and the fuzzy matches behind r1, r2 and r3
+# as ranked by the matcher, before they are folded and expanded: the n_matches best matches of the first vendor
+# of every canonical name among the others, and of every employee canonical name among all vendors.
+# the next run matches again, with the same matcher as a full run, only the names whose matches may have changed:
+# new names, names of new or changed employee records (hired, terminated or renamed since the previous run),
+# names that lost a match to a removed or changed record, and names a new or changed record could now rank
+# among their matches. the others keep their stored matches, then all matches go through the same
+# folding, expansion and exact joins as a full run.
+# tables are stored column by column as numpy arrays (.npz), text as unicode arrays, so loading a state
+# never unpickles anything.
+
+# bumped whenever the stored tables change layout, older states are ignored
+STATE_VERSION = 3
+
+
+def data_as_of(date_columns):
+    '''latest date found in the loaded data, used as the reference point of the next delta run
+    rather than the wall clock so late exports don't skip any record'''
+    dates = [pd.to_datetime(column, errors='coerce').max()
+             for column in date_columns]
+
+    dates = [date for date in dates if not pd.isna(date)]
+
+    return max(dates) if dates else pd.Timestamp.min
+
+
+def _write_table(file_name, df):
+    '''saving the columns of a table as numpy arrays, text columns (compacted to categories or not)
+    as unicode arrays'''
+    arrays = {column: df[column].to_numpy() for column in df.columns}
+
+    np.savez(file_name, **{column: values.astype(str) if values.dtype == object else values
+                           for column, values in arrays.items()})
+
+
+def _read_table(file_name):
+    '''loading a table saved by _write_table, text columns are returned as objects like the loaded inputs'''
+    with np.load(file_name, allow_pickle=False) as arrays:
+        return pd.DataFrame({column: arrays[column].astype(object) if arrays[column].dtype.kind == 'U'
+                             else arrays[column] for column in arrays.files})
+
+
+def load_state(folder, n_gram, n_matches):
+    '''loading the state saved by the previous run, returns None when there's no state, it can't be read
+    or it was produced with different n_gram/n_matches parameters'''
+    state_file = os.path.join(folder, 'state.json')
+
+    if not os.path.exists(state_file):
+        return None
+
+    with open(state_file) as f:
+        state = json.load(f)
+
+    if (state.get('version') != STATE_VERSION) or (state['n_gram'] != n_gram) or (state['n_matches'] != n_matches):
+        return None
+
+    state['as_of'] = pd.Timestamp(state['as_of'])
+
+    try:
+        state['tables'] = {name: _read_table(os.path.join(folder, f'{name}.npz'))
+                           for name in state['tables']}
+    except (OSError, ValueError):
+        # missing tables, or arrays that could only be loaded by unpickling them
+        return None
+
+    return state
+
+
+def save_state(folder, as_of, n_gram, n_matches, tables):
+    '''saving snapshots and matched pairs of this run for the next delta run,
+    written to a temporary folder first so an interrupted run keeps the previous state'''
+    temp_folder = folder + '.tmp'
+
+    shutil.rmtree(temp_folder, ignore_errors=True)
+    os.makedirs(temp_folder)
+
+    for name, df in tables.items():
+        _write_table(os.path.join(temp_folder, f'{name}.npz'), df)
+
+    with open(os.path.join(temp_folder, 'state.json'), 'w') as f:
+        json.dump({'version': STATE_VERSION, 'as_of': str(as_of), 'n_gram': n_gram,
+                   'n_matches': n_matches, 'tables': list(tables)}, f)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(temp_folder, folder)
+
+
+def changed_records(df, id_col, name_col, date_cols, snapshot, as_of):
+    '''flagging records that are new, renamed or dated after the previous run,
+    returns the boolean mask of changed rows and the ids that no longer exist'''
+    changed = np.zeros(len(df), dtype=bool)
+
+    for col in date_cols:
+        changed |= (pd.to_datetime(df[col], errors='coerce') > as_of).to_numpy()
+
+    previous_names = snapshot.set_index(
+        id_col)[name_col].reindex(df[id_col]).to_numpy()
+
+    changed |= pd.isna(previous_names) | (
+        previous_names != df[name_col].to_numpy())
+
+    removed_ids = snapshot.loc[~snapshot[id_col].isin(
+        df[id_col]), id_col].to_numpy()
+
+    return changed, removed_ids
+
+
+def _positions(names, values):
+    '''position of the first row of every value among names, -1 for values missing from them'''
+    names = pd.Index(np.asarray(names, dtype=object))
+
+    first = np.flatnonzero(~names.duplicated())
+
+    found = names[first].get_indexer(pd.Index(np.asarray(values, dtype=object)))
+
+    return np.where(found >= 0, first[np.maximum(found, 0)], -1)
+
+
+def _rescore(query_matrix, lookup_matrix, left, right):
+    '''cosine scores of aligned pairs of rows with the current weights'''
+    if not len(left):
+        return np.zeros(0, dtype=np.float32)
+
+    return np.asarray(query_matrix[left].multiply(lookup_matrix[right]).sum(axis=1)).ravel().astype(np.float32)
+
+
+def _outranked(left, scores, query_matrix, lookup_matrix, candidates, n_matches, self_match=False):
+    '''query rows whose stored matches (left, scores) a candidate lookup row could enter:
+    scoring at least the n_matches-th stored score, or any positive score when fewer matches are stored'''
+    n_rows = query_matrix.shape[0]
+
+    count = np.bincount(left, minlength=n_rows)
+
+    lowest = np.full(n_rows, np.inf, dtype=np.float32)
+    np.minimum.at(lowest, left, scores)
+
+    threshold = np.where(count >= n_matches, lowest, 0)
+
+    outranked = np.zeros(n_rows, dtype=bool)
+
+    for start in range(0, len(candidates), BLOCK_SIZE):
+        block = candidates[start:start + BLOCK_SIZE]
+
+        product = sparse.coo_matrix(query_matrix.dot(sparse.csr_matrix(lookup_matrix[block].T)))
+
+        rows, cols, data = product.row, block[product.col], product.data
+
+        found = (data > 0) & (data >= threshold[rows])
+
+        if self_match:
+            found &= rows != cols
+
+        outranked[rows[found]] = True
+
+    return outranked
+
+
+def update_vendor_matches(stored, matrix, names, n_matches):
+    '''matches of every row of the vendor matrix among the others as self_top_k_matches returns them,
+    names are the canonical names of the rows (first vendor of every canonical name).
+    stored holds the matches of the previous run by name (name, match_name), rows are matched again
+    when their name is new, lost a stored match to a removed name, or could now rank a new name
+    among its matches. returns row positions, match positions and scores'''
+    n_rows = matrix.shape[0]
+
+    left, right = _positions(names, stored.name), _positions(names, stored.match_name)
+
+    # names never seen by the previous run, names without any match then can't match a known name now
+    new = np.ones(n_rows, dtype=bool)
+    new[left[left >= 0]] = False
+    new[right[right >= 0]] = False
+
+    touched = new.copy()
+    touched[left[(left >= 0) & (right < 0)]] = True
+
+    keep = left >= 0
+    keep[keep] = ~touched[left[keep]]
+
+    left, right = left[keep], right[keep]
+
+    scores = _rescore(matrix, matrix, left, right)
+
+    touched |= _outranked(left, scores, matrix, matrix, np.flatnonzero(new), n_matches, self_match=True)
+
+    print(colored(f'{touched.sum()} of {n_rows} vendor names matched again', 'cyan'))
+
+    keep = ~touched[left]
+
+    new_left, new_right, new_scores = self_top_k_matches(matrix, n_matches, rows=np.flatnonzero(touched))
+
+    return np.concatenate([left[keep], new_left]), np.concatenate([right[keep], new_right]), \
+        np.concatenate([scores[keep], new_scores])
+
+
+def update_employee_matches(stored, employee_matrix, employee_names, changed_employees, vendor_matrix, vendor_ids,
+                            changed_vendors, removed_vendor_ids, n_matches):
+    '''matches of every employee name against all vendors as top_k_pairs returns them,
+    employee_names are the distinct canonical names of the employee matrix rows, changed_employees flags
+    the names of new or changed employee records (see changed_records).
+    stored holds the matches of the previous run (name, vendor_id), names are matched again when they are new,
+    changed, a stored match was changed or removed, a changed vendor could now rank among their matches,
+    or their zero score matches (listed in vendor order) may have moved. returns row positions, vendor positions and scores'''
+    n_rows = employee_matrix.shape[0]
+
+    n_matches = min(n_matches, vendor_matrix.shape[0])
+
+    left = _positions(employee_names, stored.name)
+    right = pd.Index(vendor_ids).get_indexer(stored.vendor_id)
+
+    touched = np.ones(n_rows, dtype=bool)
+    touched[left[left >= 0]] = False
+    touched |= changed_employees
+
+    lost = (left >= 0) & ((right < 0) | changed_vendors[np.maximum(right, 0)])
+    touched[left[lost]] = True
+
+    keep = left >= 0
+    keep[keep] = ~touched[left[keep]]
+
+    left, right = left[keep], right[keep]
+
+    scores = _rescore(employee_matrix, vendor_matrix, left, right)
+
+    if changed_vendors.any() or len(removed_vendor_ids):
+        touched[left[scores == 0]] = True
+
+    touched |= _outranked(left, scores, employee_matrix, vendor_matrix, np.flatnonzero(changed_vendors), n_matches)
+
+    print(colored(f'{touched.sum()} of {n_rows} employee names matched again', 'cyan'))
+
+    keep = ~touched[left]
+
+    rows = np.flatnonzero(touched)
+
+    new_left, new_right, new_scores = top_k_pairs(employee_matrix[rows], vendor_matrix, n_matches)
+
+    return np.concatenate([left[keep], rows[new_left]]), np.concatenate([right[keep], new_right]), \
+        np.concatenate([scores[keep], new_scores])
@@ -0,0 +1,47 @@
+import pandas as pd
+
+# employee index shared by every test enriching rows with employee attributes.
+# active and terminated employees are stacked once into a single frame holding
+# their status, department, hiring/termination dates, name and contact fields,
+# so attributes of any column of ids (or names) are collected by one vectorized join
+# instead of rebuilding a mapping dictionary per employee.
+
+# attributes kept in the index, when present in the employee lists
+EMPLOYEE_COLUMNS = ['employee_id', 'employee_name', 'employee_status', 'departement', 'hiring_date',
+                    'termination_date', 'phone', 'postal_code', 'address', 'social_security_number_ssn']
+
+
+def name_key(names):
+    '''normalized names used to look employees up by name: lower case, single spaced'''
+    return pd.Series(names, dtype=object).astype(str).str.lower().str.split().str.join(' ')
+
+
+def build_employee_index(employees_df, terminated_employees_df):
+    '''one frame of all employees with their status and a normalized name key,
+    active employees come first so an id listed in both lists resolves to the active record'''
+    index = pd.concat([employees_df.assign(employee_status='Active'),
+                       terminated_employees_df.assign(employee_status='Terminated')], ignore_index=True)
+
+    index = index[[col for col in EMPLOYEE_COLUMNS if col in index.columns]]
+
+    if 'termination_date' not in index.columns:
+        index['termination_date'] = pd.NaT
+
+    index['name_key'] = name_key(index.employee_name).to_numpy()
+
+    return index
+
+
+def lookup_employees(index, keys, columns, by='employee_id', status=None):
+    '''attributes (columns) of the employee matching every key, aligned to keys,
+    missing for unknown keys. by is 'employee_id' or 'name_key' (normalized names are
+    matched when looking up by name), status limits the lookup to 'Active' or 'Terminated'
+    employees, the first matching employee is kept when several share a key'''
+    table = index if status is None else index[index.employee_status == status]
+
+    if by == 'name_key':
+        keys = name_key(keys)
+
+    table = table.drop_duplicates(subset=by).set_index(by)
+
+    return table[columns].reindex(pd.Index(keys)).reset_index(drop=True)
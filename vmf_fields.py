@@ -0,0 +1,132 @@
+import re
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from vmf_similarity import batch_similarity
+
+# field-aware comparators used by the "similarity across all data" tests.
+# each details field is compared with the logic fitting its content rather than a sequence ratio:
+#   'exact'  ---> identifiers (phone, tin, ssn) compared after dropping separators and case,
+#                 1 when equal and 0 otherwise
+#   'prefix' ---> postal codes scored by the length of their common leading part over the longest code
+#   'tokens' ---> addresses scored by the cosine of their word tf-idf vectors, idf fitted on the compared batch
+#   'ratio'  ---> plain string similarity (see vmf_similarity), used for fields without a comparator
+# every comparator scores whole aligned arrays of values at once, pairs having a missing side score 0.
+
+# comparator of each details field, fields are named after their column without the
+# vendor_ / match_vendor_ / employee_ prefix
+FIELD_COMPARATORS = {'phone': 'exact', 'tin': 'exact', 'ssn': 'exact',
+                     'postal_code': 'prefix', 'address': 'tokens'}
+
+
+def field_of(column):
+    '''details field compared by a column, i.e. vendor_phone ---> phone'''
+    return re.sub(r'^(match_)?(vendor|employee)_', '', column)
+
+
+def normalize_identifiers(values):
+    '''upper case alphanumeric characters only, values left empty become missing'''
+    values = pd.Series(values, dtype=object).astype(
+        str).where(pd.notna(values)).str.upper().str.replace(r'[^0-9A-Z]', '', regex=True)
+
+    return values.where(values != '').to_numpy()
+
+
+def _valid_pairs(left, right):
+    left = normalize_identifiers(left)
+    right = normalize_identifiers(right)
+
+    return left, right, ~(pd.isna(left) | pd.isna(right))
+
+
+def exact_similarity(left, right):
+    '''1 for pairs of identical normalized identifiers, 0 otherwise'''
+    left, right, valid = _valid_pairs(left, right)
+
+    return (valid & (left == right)).astype(float)
+
+
+def prefix_similarity(left, right):
+    '''length of the common prefix of normalized codes over the length of the longest one'''
+    left, right, valid = _valid_pairs(left, right)
+
+    scores = np.zeros(len(left), dtype=float)
+
+    if not valid.any():
+        return scores
+
+    left = left[valid].astype(str)
+    right = right[valid].astype(str)
+
+    # comparing characters of both sides as fixed width code point matrices
+    width = max(left.dtype.itemsize, right.dtype.itemsize) // 4
+
+    left_codes = left.astype(f'U{width}').view(np.uint32).reshape(-1, width)
+    right_codes = right.astype(f'U{width}').view(np.uint32).reshape(-1, width)
+
+    left_lengths = np.char.str_len(left)
+    right_lengths = np.char.str_len(right)
+
+    prefix = np.cumprod(left_codes == right_codes, axis=1).sum(axis=1)
+
+    scores[valid] = np.minimum(prefix, np.minimum(
+        left_lengths, right_lengths)) / np.maximum(left_lengths, right_lengths)
+
+    return scores
+
+
+def token_cosine_similarity(left, right):
+    '''cosine of the word tf-idf vectors of each pair, idf is fitted on both sides of all pairs'''
+    left = np.asarray(left, dtype=object)
+    right = np.asarray(right, dtype=object)
+
+    valid = ~(pd.isna(left) | pd.isna(right))
+
+    scores = np.zeros(len(left), dtype=float)
+
+    if not valid.any():
+        return scores
+
+    n_pairs = int(valid.sum())
+
+    # rows 0..n_pairs-1 hold left values, the following ones their right values
+    tokens = pd.Series(np.concatenate([left[valid], right[valid]])).astype(
+        str).str.lower().str.findall(r'\w+').explode().dropna()
+
+    codes, vocabulary = pd.factorize(tokens)
+
+    counts = sparse.csr_matrix((np.ones(len(codes)), (tokens.index.to_numpy(), codes)),
+                               shape=(2 * n_pairs, len(vocabulary)))
+
+    counts.sum_duplicates()
+
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+
+    idf = np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1
+
+    weights = sparse.csr_matrix(counts.multiply(idf.reshape(1, -1)))
+
+    norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+
+    weights = sparse.csr_matrix(sparse.diags(1 / norms).dot(weights))
+
+    scores[valid] = np.asarray(weights[:n_pairs].multiply(
+        weights[n_pairs:]).sum(axis=1)).ravel()
+
+    return scores
+
+
+COMPARATORS = {'exact': exact_similarity, 'prefix': prefix_similarity,
+               'tokens': token_cosine_similarity}
+
+
+def compare_field(field, left, right, metric='ratio'):
+    '''scoring two aligned arrays of a details field with its comparator (see FIELD_COMPARATORS),
+    fields without a comparator fall back to the string similarity metric'''
+    comparator = FIELD_COMPARATORS.get(field, 'ratio')
+
+    if comparator == 'ratio':
+        return batch_similarity(left, right, metric=metric)
+
+    return COMPARATORS[comparator](left, right)
@@ -0,0 +1,258 @@
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import pandas as pd
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# run report of the test procedures.
+# every measured step (loading, each stage, saving) records:
+#   wall_seconds ---> elapsed time
+#   cpu_seconds  ---> cpu time of the thread running the step plus the cpu time of the matcher pool
+#                     workers running its blocks (reported by the workers, see worker_usage)
+#   peak_rss_mb  ---> peak resident memory while the step ran, memory_scope telling how it was measured:
+#                     'step'    ---> sampled with psutil over the process and all its child processes
+#                                    (the matcher pool workers and their fork server)
+#                     'process' ---> without psutil, the peak of the process so far (resource.getrusage)
+#                                    plus the peaks reported by the pool workers of the step. a step using
+#                                    less memory than an earlier one reports the earlier peak, so these peaks
+#                                    only compare whole runs, not steps
+#   rss_delta_mb ---> that peak over the resident memory (or the peak so far) when the step started,
+#                     steps running concurrently share the same processes so their deltas overlap
+#   input_rows / output_rows ---> rows of the tables read and produced by the step
+# records are saved as JSON and CSV next to the results. steps named in profile (or all of them)
+# are also run under cProfile with a tracemalloc snapshot comparison, to find hot spots
+# without editing the code, preferably with a single worker so measures don't overlap.
+
+# resident memory sampling interval in seconds
+SAMPLE_INTERVAL = .05
+
+# lines kept in the profile and memory summaries
+PROFILE_LINES = 30
+
+# a single profiler can be active at once on recent python versions, profiled steps wait for each other
+_profile_lock = threading.Lock()
+
+REPORT_COLUMNS = ['name', 'title', 'start_seconds', 'wall_seconds', 'cpu_seconds', 'peak_rss_mb', 'rss_delta_mb',
+                  'memory_scope', 'input_rows', 'output_rows', 'profile']
+
+# pool worker usage of the step running in each thread, see worker_usage
+_step_usage = threading.local()
+
+
+def max_rss():
+    '''peak resident memory of the process so far in bytes, None where getrusage isn't available (windows)'''
+    if resource is None:
+        return None
+
+    # ru_maxrss is given in bytes on macOS and in kilobytes elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+
+
+def worker_usage(pid, cpu_seconds, peak_rss):
+    '''adding the cpu time and the peak memory so far (bytes, None when unknown) of a pool worker
+    that ran a task of the step measured in the calling thread, nothing is recorded outside of a step'''
+    usage = getattr(_step_usage, 'usage', None)
+
+    if usage is None:
+        return
+
+    usage['cpu_seconds'] += cpu_seconds
+
+    if peak_rss is not None:
+        usage['peak_rss'][pid] = max(usage['peak_rss'].get(pid, 0), peak_rss)
+
+
+def table_rows(value):
+    '''rows of all dataframes and series held by a value, searching dictionaries, lists and tuples'''
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return len(value)
+
+    if isinstance(value, dict):
+        value = list(value.values())
+
+    if isinstance(value, (list, tuple)):
+        return sum(table_rows(item) for item in value)
+
+    return 0
+
+
+class _MemorySampler:
+    '''sampling the resident memory of the process and its child processes in a background thread,
+    keeps the memory at start and the peak seen until stopped.
+    without psutil the peak of the process so far is read at start and when stopped instead'''
+
+    def __init__(self):
+        self.process = psutil.Process() if psutil is not None else None
+        self.start = self.peak = None
+        self.scope = 'step' if self.process is not None else 'process'
+
+        if self.process is None:
+            self.start = max_rss()
+            return
+
+        self.start = self.peak = self._rss()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def _rss(self):
+        '''resident memory of the process and of all its child processes'''
+        rss = self.process.memory_info().rss
+
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+
+        return rss
+
+    def _sample(self):
+        while not self._done.wait(SAMPLE_INTERVAL):
+            self.peak = max(self.peak, self._rss())
+
+    def stop(self, worker_peaks=()):
+        '''stopping the sampling, returns peak memory and its delta over the start in MB.
+        worker_peaks are the peaks reported by the pool workers, added to the peak of the process so far
+        without psutil, their memory is sampled with the process otherwise'''
+        if self.process is None:
+            self.peak = max_rss()
+
+            if self.peak is None:
+                return None, None
+
+            workers = sum(worker_peaks)
+
+            return (self.peak + workers) / 2**20, (self.peak - self.start + workers) / 2**20
+
+        self._done.set()
+        self._thread.join()
+
+        self.peak = max(self.peak, self._rss())
+
+        return self.peak / 2**20, (self.peak - self.start) / 2**20
+
+
+class RunReport:
+    '''measures of every step of a run, profile holds the names of the steps to profile
+    ('all' profiles every step), their profiles are saved to profile_folder'''
+
+    def __init__(self, profile=(), profile_folder=None):
+        self.records = []
+        self.profile = set(profile or ())
+        self.profile_folder = profile_folder
+        self.start_time = time.time()
+        self._lock = threading.Lock()
+
+        if self.profile and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def _profiled(self, name):
+        return 'all' in self.profile or any(part in self.profile for part in name.split(', '))
+
+    def measure(self, name, title, func, *args, **kwargs):
+        '''calling func with the given arguments and recording its measures under name,
+        returns its result and its record'''
+        profiler = cProfile.Profile() if self._profiled(name) else None
+
+        if profiler is not None:
+            _profile_lock.acquire()
+
+        snapshot = tracemalloc.take_snapshot() if profiler is not None else None
+
+        sampler = _MemorySampler()
+
+        # pool workers running blocks of this step report their usage to this thread
+        previous_usage = getattr(_step_usage, 'usage', None)
+        usage = _step_usage.usage = {'cpu_seconds': 0., 'peak_rss': {}}
+
+        start_time, start_cpu = time.time(), time.thread_time()
+
+        if profiler is not None:
+            profiler.enable()
+
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+
+            _step_usage.usage = previous_usage
+
+            wall_seconds = time.time() - start_time
+            cpu_seconds = time.thread_time() - start_cpu + usage['cpu_seconds']
+
+            peak_rss_mb, rss_delta_mb = sampler.stop(usage['peak_rss'].values())
+
+            if profiler is not None:
+                try:
+                    profile = self._save_profile(name, profiler, tracemalloc.take_snapshot().compare_to(
+                        snapshot, 'lineno'))
+                finally:
+                    _profile_lock.release()
+
+        record = {'name': name, 'title': title, 'start_seconds': start_time - self.start_time,
+                  'wall_seconds': wall_seconds, 'cpu_seconds': cpu_seconds, 'peak_rss_mb': peak_rss_mb,
+                  'rss_delta_mb': rss_delta_mb, 'memory_scope': sampler.scope if peak_rss_mb is not None else None,
+                  'input_rows': table_rows([args, kwargs]),
+                  'output_rows': table_rows(result), 'profile': profile if profiler is not None else None}
+
+        with self._lock:
+            self.records.append(record)
+
+        return result, record
+
+    def _save_profile(self, name, profiler, allocations):
+        '''saving the raw cProfile stats of a step with a readable summary of its slowest functions
+        and of the lines that allocated the most memory, returns the stats file'''
+        os.makedirs(self.profile_folder, exist_ok=True)
+
+        file_name = os.path.join(self.profile_folder, name.split(', ')[0])
+
+        profiler.dump_stats(file_name + '.prof')
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(PROFILE_LINES)
+
+        summary.write('\nLargest memory allocations (tracemalloc):\n')
+
+        for line in allocations[:PROFILE_LINES]:
+            summary.write(f'{line}\n')
+
+        with open(file_name + '.txt', 'w') as f:
+            f.write(summary.getvalue())
+
+        return file_name + '.prof'
+
+    def to_frame(self):
+        '''records as a dataframe in the order steps were started'''
+        with self._lock:
+            records = list(self.records)
+
+        return pd.DataFrame(records, columns=REPORT_COLUMNS).sort_values(
+            by='start_seconds', kind='stable').reset_index(drop=True)
+
+    def save(self, file_name):
+        '''saving records as file_name.json and file_name.csv, file_name has no extension'''
+        report = self.to_frame()
+
+        with open(file_name + '.json', 'w') as f:
+            json.dump({'total_seconds': time.time() - self.start_time,
+                       'steps': json.loads(report.to_json(orient='records'))}, f, indent=2)
+
+        report.to_csv(file_name + '.csv', index=False)
@@ -0,0 +1,561 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyarrow import feather
+except ImportError:
+    pa = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# typed ingest cache of the input CSV files.
+# every utf-16 CSV is decoded and typed once (dates parsed, po totals converted to integers)
+# then saved as an uncompressed Arrow (feather) file in the cache folder, later runs
+# memory-map that file and read only the requested columns, numeric and date columns without
+# missing values are used in place rather than copied.
+# a cached file is reused while its CSV keeps the same size and modification time,
+# when these change the CSV is hashed and only re-converted if its content differs.
+# without pyarrow the typed frames are cached as pickles instead, read in full.
+# large inputs can also be streamed in chunks (iter_input_chunks) rather than loaded whole,
+# the first pass over a source without a valid cache writes the cache as it goes (with pyarrow)
+# and passes started meanwhile wait for it, so the source is only decoded once.
+# every input declares its schema, the header of every CSV is checked against it before any row
+# is parsed so a column renamed in VMF.xlsm fails the load rather than a test, and rows are
+# parsed with explicit columns and dtypes so pandas doesn't infer them. inputs loaded from a valid cache
+# were checked when they were cached (the cache records the schema it was checked against), only the
+# inputs read from their source are checked, the headers of all sheets with a single opening of the workbook. inputs are read concurrently.
+# inputs can also be read straight from the sheets of VMF.xlsm (or any .xlsx holding the same sheets),
+# streamed row by row by openpyxl in read only mode, skipping the CSV export macro. rows are typed
+# like the CSV files, po totals rounded as displayed by the export, and cached the same way.
+
+# bumped whenever typing rules change, invalidating cached inputs
+CACHE_VERSION = 2
+
+# input files with their schema, columns in the order of the excel export with their type:
+#   int    ---> integers, read as floats and converted once empty rows are dropped (floats when missing)
+#   float  ---> decimal numbers
+#   text   ---> strings converted to str, missing values included
+#   object ---> strings, missing values kept as missing
+#   date   ---> parsed as datetime with date_format, inferred when the format doesn't match (i.e. ISO dates)
+#   amount ---> integers written with thousands separators
+# dropna ---> dropping empty rows left by the excel export
+INPUTS = {
+    'vendors': {'file': 'VMF_vendor_list.csv', 'sheet': 'vendor_list',
+                'columns': {'id': 'int', 'name': 'text', 'vendor_status': 'object', 'contact_name': 'object',
+                            'payment_terms': 'object', 'phone': 'object', 'postal_code': 'object',
+                            'address': 'object', 'taxpayer_identification_number_tin': 'object',
+                            'creation_date': 'date', 'creation_user_id': 'int', 'modification_date': 'date',
+                            'modification_user_id': 'int'},
+                'date_format': '%m/%d/%y %H:%M', 'dropna': False},
+    'access_rights': {'file': 'VMF_access_rights.csv', 'sheet': 'access_rights',
+                      'columns': {'creation_user_id': 'int', 'modification_user_id': 'int', 'departement': 'object'},
+                      'dropna': True},
+    'employees': {'file': 'VMF_employee_list.csv', 'sheet': 'employee_list',
+                  'columns': {'employee_id': 'int', 'employee_name': 'text', 'hiring_date': 'date',
+                              'departement': 'object', 'phone': 'object', 'postal_code': 'object',
+                              'address': 'object', 'social_security_number_ssn': 'object'},
+                  'date_format': '%d-%b-%y', 'dropna': True},
+    'terminated_employees': {'file': 'VMF_terminated_employees.csv', 'sheet': 'terminated_employees',
+                             'columns': {'employee_id': 'int', 'employee_name': 'text', 'hiring_date': 'date',
+                                         'termination_date': 'date', 'termination_reason': 'object',
+                                         'departement': 'object', 'phone': 'object', 'postal_code': 'object',
+                                         'address': 'object', 'social_security_number_ssn': 'object'},
+                             'date_format': '%d-%b-%y', 'dropna': True},
+    'po': {'file': 'VMF_po_list.csv', 'sheet': 'po_list',
+           'columns': {'po_number': 'int', 'po_approval_status': 'object', 'po_status': 'object', 'po_date': 'date',
+                       'item_description': 'object', 'vendor_name': 'object', 'total_quantity': 'float',
+                       'currency': 'object', 'po_total': 'amount'},
+           'date_format': '%d-%b-%y', 'thousands': ',', 'dropna': True},
+}
+
+# dtypes the CSV parser is given for every column type
+_PARSED_DTYPES = {'int': 'float64', 'float': 'float64', 'text': 'object', 'object': 'object',
+                  'date': 'object', 'amount': 'float64'}
+
+# hashing buffer size
+HASH_CHUNK = 1 << 20
+
+# worksheet rows typed at once when reading a workbook
+SHEET_CHUNK = 50_000
+
+
+def check_columns(header, spec, source):
+    '''checking a header holds every column of an input schema, returns their positions'''
+    header = [str(col).strip() if col is not None else None for col in header]
+
+    missing = [col for col in spec['columns'] if col not in header]
+
+    if missing:
+        raise ValueError(f'{source} misses the columns {missing}, '
+                         f'found {[col for col in header if col is not None]} (was a header renamed in VMF.xlsm?)')
+
+    return [header.index(col) for col in spec['columns']]
+
+
+def check_header(csv_file, spec):
+    '''reading only the header of a CSV input and checking it holds every column of its schema'''
+    check_columns(pd.read_csv(csv_file, sep='\t', encoding='utf-16', nrows=0).columns, spec,
+                  os.path.basename(csv_file))
+
+
+def _open_workbook(workbook):
+    if openpyxl is None:
+        raise ImportError('reading inputs from a workbook requires openpyxl, install it or export the CSV files')
+
+    return openpyxl.load_workbook(workbook, read_only=True, data_only=True)
+
+
+def check_sheet_headers(workbook, specs):
+    '''reading only the header row of the worksheets of inputs and checking them against their schema,
+    the workbook is opened once for all of them'''
+    book = _open_workbook(workbook)
+
+    try:
+        for spec in specs:
+            if spec['sheet'] not in book.sheetnames:
+                raise ValueError(f"{os.path.basename(workbook)} has no sheet {spec['sheet']!r}, found {book.sheetnames}")
+
+            check_columns(next(book[spec['sheet']].iter_rows(max_row=1, values_only=True), ()), spec,
+                          f"{os.path.basename(workbook)}[{spec['sheet']}]")
+    finally:
+        book.close()
+
+
+def _sheet_frame(rows, positions, spec):
+    '''typing a list of worksheet rows like the CSV export of the sheet'''
+    df = pd.DataFrame([[np.nan if i >= len(row) or row[i] is None else row[i] for i in positions] for row in rows],
+                      columns=list(spec['columns']), dtype=object)
+
+    # blank rows of the used range
+    df = df.dropna(how='all')
+
+    for col, kind in spec['columns'].items():
+        if kind in ('int', 'float'):
+            df[col] = pd.to_numeric(df[col]).astype('float64')
+        elif kind == 'amount':
+            # rounded half to even, as written by the export macro
+            df[col] = np.round(pd.to_numeric(df[col]).astype('float64'))
+        elif kind == 'object':
+            # numbers typed in text columns (postal codes...) are read as the export writes them
+            df[col] = df[col].where(df[col].isna(), df[col].astype(str))
+
+    df = apply_types(df, spec)
+
+    # dates cut to the precision of the date format written by the export macro,
+    # so both sources give the same frames
+    for col in [col for col, kind in spec['columns'].items() if kind == 'date']:
+        df[col] = df[col].dt.floor(_date_precision(spec.get('date_format')))
+
+    return df
+
+
+def _date_precision(date_format):
+    if date_format is None or '%S' in date_format:
+        return 's'
+
+    return 'min' if '%M' in date_format else 'D'
+
+
+def iter_sheet_chunks(workbook, spec, chunksize=SHEET_CHUNK):
+    '''reading the worksheet of an input from a workbook in typed chunks of chunksize rows,
+    rows are streamed in read only mode so memory is bounded by the chunk size'''
+    book = _open_workbook(workbook)
+
+    try:
+        rows = book[spec['sheet']].iter_rows(values_only=True)
+
+        positions = check_columns(next(rows, ()), spec, f"{os.path.basename(workbook)}[{spec['sheet']}]")
+
+        chunk, empty = [], True
+
+        for row in rows:
+            chunk.append(row)
+
+            if len(chunk) == chunksize:
+                yield _sheet_frame(chunk, positions, spec)
+                chunk, empty = [], False
+
+        # an empty sheet still yields a (typed) empty frame
+        if chunk or empty:
+            yield _sheet_frame(chunk, positions, spec)
+    finally:
+        book.close()
+
+
+def read_typed_sheet(workbook, spec):
+    '''reading the worksheet of an input from a workbook with proper dtypes'''
+    return pd.concat(iter_sheet_chunks(workbook, spec), ignore_index=True)
+
+
+def csv_options(spec):
+    '''read_csv arguments parsing the columns of an input schema without type inference'''
+    return {'sep': '\t', 'encoding': 'utf-16', 'usecols': list(spec['columns']),
+            'dtype': {col: _PARSED_DTYPES[kind] for col, kind in spec['columns'].items()},
+            'thousands': spec.get('thousands')}
+
+
+def read_typed_csv(csv_file, spec):
+    '''reading one utf-16 CSV input and applying proper dtypes'''
+    return apply_types(pd.read_csv(csv_file, **csv_options(spec)), spec)
+
+
+def _parse_dates(values, date_format):
+    try:
+        return pd.to_datetime(values, format=date_format)
+    except (ValueError, TypeError):
+        return pd.to_datetime(values)
+
+
+def apply_types(df, spec):
+    '''applying the typing rules of an input to a frame or chunk read from its CSV'''
+    if spec.get('dropna'):
+        df = df.dropna(how='all')
+
+    # columns in the order of the schema, whatever their order in the file
+    df = df[list(spec['columns'])].copy()
+
+    for col, kind in spec['columns'].items():
+        if kind == 'text':
+            df[col] = df[col].astype(str)
+        elif kind == 'date':
+            df[col] = _parse_dates(df[col], spec.get('date_format'))
+        elif kind == 'amount':
+            df[col] = df[col].astype('int64')
+        elif kind == 'int' and df[col].notna().all():
+            df[col] = df[col].astype('int64')
+
+    # positions and labels are kept aligned, cached files can't hold a gapped index
+    return df.reset_index(drop=True)
+
+
+def file_hash(file_name):
+    '''sha256 of a file content'''
+    digest = hashlib.sha256()
+
+    with open(file_name, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def _cache_files(cache_folder, name):
+    extension = 'arrow' if pa is not None else 'pkl'
+    return os.path.join(cache_folder, f'{name}.{extension}'), os.path.join(cache_folder, f'{name}.json')
+
+
+def _cache_is_valid(source_file, meta_file, spec):
+    '''checking the cached copy against the size and modification time of its source (CSV or workbook),
+    falling back to the content hash when these changed (copied or touched files), and against the schema
+    its header was checked against'''
+    if not os.path.exists(meta_file):
+        return False
+
+    with open(meta_file) as f:
+        meta = json.load(f)
+
+    if meta.get('version') != CACHE_VERSION or meta.get('format') != ('arrow' if pa is not None else 'pkl'):
+        return False
+
+    # cached from another source, i.e. the CSV export rather than the workbook
+    if meta.get('source') != os.path.basename(source_file):
+        return False
+
+    if meta.get('columns') != list(spec['columns']):
+        return False
+
+    stat = os.stat(source_file)
+
+    if meta['size'] == stat.st_size and meta['mtime_ns'] == stat.st_mtime_ns:
+        return True
+
+    if meta['size'] != stat.st_size or meta['sha256'] != file_hash(source_file):
+        return False
+
+    # same content under a new modification time, refreshing it to skip hashing next time
+    meta['mtime_ns'] = stat.st_mtime_ns
+    _write_json(meta_file, meta)
+
+    return True
+
+
+def prune_cache(folder, prefix, keep):
+    '''removing all but the keep most recently used entries (files or folders) of the cache folder
+    named with prefix, entries are touched when loaded so the ones still in use are kept.
+    content keyed entries (saved indexes, canonical names) would otherwise pile up as the inputs change'''
+    if not os.path.isdir(folder):
+        return
+
+    entries = [os.path.join(folder, name) for name in os.listdir(folder)
+               if name.startswith(prefix) and not name.endswith('.tmp')]
+
+    for entry in sorted(entries, key=os.path.getmtime, reverse=True)[keep:]:
+        if os.path.isdir(entry):
+            shutil.rmtree(entry, ignore_errors=True)
+        else:
+            os.remove(entry)
+
+
+def _write_json(file_name, content):
+    with open(file_name + '.tmp', 'w') as f:
+        json.dump(content, f)
+
+    os.replace(file_name + '.tmp', file_name)
+
+
+def _save_cache(df, source_file, data_file, meta_file, spec):
+    '''saving the typed frame then its metadata, both written to temporary files first
+    so an interrupted run never leaves a partial cache behind'''
+    if pa is not None:
+        feather.write_feather(df, data_file + '.tmp',
+                              compression='uncompressed')
+    else:
+        df.to_pickle(data_file + '.tmp')
+
+    os.replace(data_file + '.tmp', data_file)
+
+    _save_cache_meta(source_file, meta_file, spec)
+
+
+def _save_cache_meta(source_file, meta_file, spec):
+    stat = os.stat(source_file)
+
+    _write_json(meta_file, {'version': CACHE_VERSION, 'format': 'arrow' if pa is not None else 'pkl',
+                            'source': os.path.basename(source_file), 'columns': list(spec['columns']),
+                            'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_hash(source_file)})
+
+
+def _mapped_frame(table):
+    '''frame of a memory-mapped table, one block per column so numeric and date columns without missing values
+    stay views of the mapped file (read only) rather than copies, text columns are still converted'''
+    return table.to_pandas(split_blocks=True)
+
+
+def _load_cache(data_file, columns):
+    if pa is not None:
+        return _mapped_frame(feather.read_table(data_file, columns=columns, memory_map=True))
+
+    df = pd.read_pickle(data_file)
+
+    return df if columns is None else df[columns]
+
+
+def _source_file(path, spec, workbook=None):
+    '''the workbook when reading one, the CSV file of the input otherwise'''
+    return workbook if workbook is not None else os.path.join(path, spec['file'])
+
+
+def _check_sources(path, names, workbook=None):
+    '''checking the headers of inputs in their worksheets when reading a workbook, in their CSV files otherwise'''
+    if workbook is not None:
+        if names:
+            check_sheet_headers(workbook, [INPUTS[name] for name in names])
+        return
+
+    for name in names:
+        check_header(_source_file(path, INPUTS[name]), INPUTS[name])
+
+
+def _is_cached(source_file, cache_folder, name):
+    if cache_folder is None:
+        return False
+
+    data_file, meta_file = _cache_files(cache_folder, name)
+
+    return os.path.exists(data_file) and _cache_is_valid(source_file, meta_file, INPUTS[name])
+
+
+def _read_source(source_file, spec, workbook=None):
+    return read_typed_sheet(source_file, spec) if workbook is not None else read_typed_csv(source_file, spec)
+
+
+def _read_checked(source_file, name, cache_folder, columns, workbook, cached):
+    '''loading one typed input whose cache was found valid (cached) or whose header was checked'''
+    spec = INPUTS[name]
+
+    if cached:
+        return _load_cache(_cache_files(cache_folder, name)[0], columns)
+
+    df = _read_source(source_file, spec, workbook)
+
+    if cache_folder is not None:
+        os.makedirs(cache_folder, exist_ok=True)
+        _save_cache(df, source_file, *_cache_files(cache_folder, name), spec)
+
+    return df if columns is None else df[columns]
+
+
+def read_input(path, name, cache_folder=None, columns=None, workbook=None):
+    '''loading one typed input by name (see INPUTS) from the CSV files in path, or from its sheet
+    of a workbook when given, through the cache when a cache folder is given. columns limits the loaded columns'''
+    return read_inputs(path, cache_folder, {name: columns}, [name], workbook)[name]
+
+
+def read_inputs(path, cache_folder=None, columns=None, names=None, workbook=None):
+    '''loading typed inputs (all of them unless names are given) as a dictionary of dataframes by name,
+    from the sheets of a workbook when given. columns optionally maps input names to the columns to load.
+    the headers of all inputs that aren't cached are checked first, then inputs are read concurrently'''
+    columns = columns or {}
+
+    names = list(names or INPUTS)
+
+    sources = {name: _source_file(path, INPUTS[name], workbook) for name in names}
+
+    cached = {name for name in names if _is_cached(sources[name], cache_folder, name)}
+
+    _check_sources(path, [name for name in names if name not in cached], workbook)
+
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = {name: executor.submit(_read_checked, sources[name], name, cache_folder, columns.get(name),
+                                         workbook, name in cached)
+                   for name in names}
+
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _source_chunks(source_file, spec, chunksize, workbook=None):
+    '''typed chunks of an input read from its source, worksheet headers are checked as they're read'''
+    if workbook is not None:
+        yield from iter_sheet_chunks(workbook, spec, chunksize)
+        return
+
+    check_header(source_file, spec)
+
+    for chunk in pd.read_csv(source_file, chunksize=chunksize, **csv_options(spec)):
+        yield apply_types(chunk, spec)
+
+
+def _caching_chunks(chunks, source_file, data_file, meta_file, spec):
+    '''passing typed chunks through while appending them to the cache file, the cache is only saved
+    once every chunk was written with the column types of the first one, a chunk typed differently
+    (i.e. an integer column with missing values) stops caching and the next full load caches the input'''
+    writer = schema = None
+
+    try:
+        for chunk in chunks:
+            if writer is not False:
+                try:
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+
+                    if writer is None:
+                        schema = table.schema
+                        writer = pa.ipc.new_file(data_file + '.tmp', schema)
+
+                    writer.write_table(table.cast(schema))
+                except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                    if writer is not None:
+                        writer.close()
+                        os.remove(data_file + '.tmp')
+
+                    writer = False
+
+            yield chunk
+
+        if writer:
+            writer.close()
+            os.replace(data_file + '.tmp', data_file)
+            _save_cache_meta(source_file, meta_file, spec)
+            writer = None
+    finally:
+        # interrupted pass
+        if writer:
+            writer.close()
+            os.remove(data_file + '.tmp')
+
+
+# one lock per cache file, held by the pass writing it
+_cache_locks = {}
+_cache_locks_lock = threading.Lock()
+
+
+def _cache_lock(data_file):
+    with _cache_locks_lock:
+        return _cache_locks.setdefault(data_file, threading.Lock())
+
+
+def iter_input_chunks(path, name, cache_folder=None, chunksize=500_000, workbook=None):
+    '''reading one typed input in chunks of chunksize rows with bounded memory,
+    slices of the memory-mapped cache when it's valid, typed CSV or worksheet chunks otherwise,
+    written to the cache along the way when a cache folder is given'''
+    spec = INPUTS[name]
+
+    source_file = _source_file(path, spec, workbook)
+
+    if cache_folder is None or pa is None:
+        yield from _source_chunks(source_file, spec, chunksize, workbook)
+        return
+
+    os.makedirs(cache_folder, exist_ok=True)
+
+    data_file, meta_file = _cache_files(cache_folder, name)
+
+    lock = _cache_lock(data_file)
+
+    # waiting for a pass writing the cache, then reading it if valid
+    lock.acquire()
+
+    if not (os.path.exists(data_file) and _cache_is_valid(source_file, meta_file, spec)):
+        try:
+            yield from _caching_chunks(_source_chunks(source_file, spec, chunksize, workbook),
+                                       source_file, data_file, meta_file, spec)
+        finally:
+            lock.release()
+
+        return
+
+    lock.release()
+
+    table = feather.read_table(data_file, memory_map=True)
+
+    for offset in range(0, table.num_rows, chunksize):
+        yield _mapped_frame(table.slice(offset, chunksize))
+
+
+def save_frame(df, file_name):
+    '''saving an intermediate result keeping its dtypes, as Parquet when pyarrow is installed
+    and can represent every column, as a pickle otherwise. file_name has no extension,
+    returns the saved file'''
+    os.makedirs(os.path.dirname(file_name), exist_ok=True)
+
+    table = None
+
+    if pa is not None:
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # mixed type columns are only kept by pickles
+            table = None
+
+    saved_file, stale_file = (file_name + '.parquet', file_name + '.pkl') if table is not None \
+        else (file_name + '.pkl', file_name + '.parquet')
+
+    if table is not None:
+        pq.write_table(table, saved_file + '.tmp')
+    else:
+        df.to_pickle(saved_file + '.tmp')
+
+    os.replace(saved_file + '.tmp', saved_file)
+
+    if os.path.exists(stale_file):
+        os.remove(stale_file)
+
+    return saved_file
+
+
+def read_frame(file_name):
+    '''loading an intermediate result saved by save_frame, file_name has no extension'''
+    if os.path.exists(file_name + '.parquet'):
+        return pd.read_parquet(file_name + '.parquet')
+
+    return pd.read_pickle(file_name + '.pkl')
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+from termcolor import colored
+
+# integer surrogate keys of the columns joining the input lists.
+# every key gets one vocabulary of its distinct values across all the lists holding it,
+# and every column holding it is encoded once as dense integer codes into that vocabulary:
+#   'vendor_name' ---> vendor names of the vendor list and of the PO list
+#   'user_id'     ---> employee ids of both employee lists and the creation and modification
+#                      user ids of the vendor list and of the access rights
+# joins and membership checks then compare int arrays instead of hashing strings on every test.
+# values missing from a vocabulary (empty cells, or PO chunks read after it was built) get the code -1,
+# joins never pair -1 codes while membership checks treat them alike, as isin treats empty cells.
+
+KEYS = {
+    'vendor_name': {'vendors': ['name'], 'po': ['vendor_name']},
+    'user_id': {'employees': ['employee_id'], 'terminated_employees': ['employee_id'],
+                'vendors': ['creation_user_id', 'modification_user_id'],
+                'access_rights': ['creation_user_id', 'modification_user_id']},
+}
+
+
+def build_key_codes(inputs):
+    '''vocabulary of every key and codes of every column holding it, inputs maps input names
+    to frames (None for inputs that aren't loaded, i.e. a streamed PO list).
+    returns {'vocabularies': {key: index}, 'codes': {(input, column): codes}}'''
+    vocabularies, codes = {}, {}
+
+    for key, columns in KEYS.items():
+        values = [inputs[name][col] for name, cols in columns.items()
+                  for col in cols if inputs.get(name) is not None and col in inputs[name].columns]
+
+        vocabularies[key] = pd.Index(pd.unique(pd.concat(values, ignore_index=True).dropna()))
+
+        for name, cols in columns.items():
+            for col in cols:
+                if inputs.get(name) is not None and col in inputs[name].columns:
+                    codes[(name, col)] = encode(vocabularies[key], inputs[name][col])
+
+    return {'vocabularies': vocabularies, 'codes': codes}
+
+
+def encode(vocabulary, values):
+    '''codes of values into a vocabulary, -1 for values missing from it'''
+    return vocabulary.get_indexer(pd.Index(values)).astype(np.int64)
+
+
+def join_positions(left_codes, right_codes):
+    '''inner join of two code arrays, every left row is paired with every right row sharing its code
+    (fan out of duplicate keys) in the order of both arrays, -1 codes are never paired.
+    returns left and right positions'''
+    left_codes, right_codes = np.asarray(left_codes, dtype=np.int64), np.asarray(right_codes, dtype=np.int64)
+
+    order = np.argsort(right_codes, kind='stable')
+
+    sorted_codes = right_codes[order]
+
+    start = np.searchsorted(sorted_codes, left_codes, side='left')
+
+    counts = np.searchsorted(sorted_codes, left_codes, side='right') - start
+    counts[left_codes < 0] = 0
+
+    left = np.repeat(np.arange(len(left_codes), dtype=np.int64), counts)
+
+    # offset of every pair among the right rows of its left row
+    offsets = np.arange(counts.sum(), dtype=np.int64) - np.repeat(np.cumsum(counts) - counts, counts)
+
+    return left, order[np.repeat(start, counts) + offsets]
+
+
+def last_by_code(codes, values, n_codes, label='values'):
+    '''value of the last row of every code, missing for codes held by no row.
+    codes held by rows of different values are reported, as a mapping by key would keep the last one silently'''
+    codes, values = np.asarray(codes, dtype=np.int64), pd.Series(values).reset_index(drop=True)
+
+    known = codes >= 0
+
+    last = np.full(n_codes, -1, dtype=np.int64)
+    np.maximum.at(last, codes[known], np.flatnonzero(known))
+
+    result = np.full(n_codes, None, dtype=object)
+    result[last >= 0] = values.to_numpy(dtype=object)[last[last >= 0]]
+
+    conflicts = int((values[known].groupby(codes[known]).nunique() > 1).sum())
+
+    if conflicts:
+        print(colored(f'{conflicts} keys shared by records of different {label}, the last record is used', 'cyan'))
+
+    return result
+
+
+def lookup_codes(table, codes):
+    '''values of a per code table (see last_by_code) aligned to codes, missing for -1 codes'''
+    codes = np.asarray(codes, dtype=np.int64)
+
+    result = np.full(len(codes), None, dtype=object)
+    result[codes >= 0] = table[codes[codes >= 0]]
+
+    return result
@@ -0,0 +1,57 @@
+import numpy as np
+
+# approximate neighbours of the vendor self match for very large vendor lists.
+# every vendor name is reduced to a MinHash signature over the ids of its n_grams, read from the
+# fitted vendor name index (see vmf_matcher) so the same n_gram and canonical names are used,
+# the signature is cut into `bands` bands of `rows` hashes and names sharing all hashes of any band
+# fall in the same bucket. two names are a candidate pair with a probability of 1 - (1 - s^rows)^bands,
+# s being the jaccard similarity of their n_gram sets, i.e. about half the pairs of s = (1 / bands)^(1 / rows).
+# buckets are handed over as blocks (see vmf_blocking), only candidate pairs are scored.
+
+# default bands and rows per band, candidates from a jaccard similarity of about .15,
+# low enough to keep most close matches of the mock data (see the blocking report)
+LSH_BANDS = 50
+LSH_ROWS = 2
+
+# bands are numbered in the low byte of the bucket labels
+MAX_BANDS = 256
+
+# universal hashing h(x) = (a * x + b) mod prime of the n_gram ids
+_PRIME = np.int64(2**31 - 1)
+
+# multiplier combining the hashes of a band into a bucket
+_BAND_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _minhash(matrix, nonempty, a, b):
+    '''minimum hash of the n_gram ids of every row having n_grams'''
+    values = (a * matrix.indices.astype(np.int64) + b) % _PRIME
+
+    return np.minimum.reduceat(values, matrix.indptr[:-1][nonempty]).astype(np.uint64)
+
+
+def lsh_blocks(matrix, bands=LSH_BANDS, rows=LSH_ROWS, seed=0):
+    '''bucket of every row of an n_gram matrix in every band, as blocks of vmf_blocking.candidate_pairs,
+    rows without n_grams are left out. returns two aligned arrays (row position, bucket label)'''
+    rng = np.random.default_rng(seed)
+
+    nonempty = np.diff(matrix.indptr) > 0
+
+    positions = np.flatnonzero(nonempty).astype(np.int64)
+
+    all_positions, all_labels = [], []
+
+    # one band at a time, so only rows hashes per name are held at once
+    for band in range(bands):
+        bucket = np.zeros(len(positions), dtype=np.uint64)
+
+        for a, b in zip(rng.integers(1, _PRIME, rows), rng.integers(0, _PRIME, rows)):
+            bucket = bucket * _BAND_MULTIPLIER + _minhash(matrix, nonempty, a, b)
+
+        all_positions.append(positions)
+        all_labels.append((bucket & ~np.uint64(MAX_BANDS - 1)) | np.uint64(band))
+
+    if not all_positions:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.uint64)
+
+    return np.concatenate(all_positions), np.concatenate(all_labels)
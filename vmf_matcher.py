@@ -0,0 +1,586 @@
+import os
+import re
+import json
+import shutil
+import hashlib
+import time
+import tempfile
+import multiprocessing as mp
+from itertools import islice
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from scipy import sparse
+from termcolor import colored
+from vmf_io import prune_cache
+from vmf_instrument import max_rss, worker_usage
+
+# n_gram tf-idf matching engine used by all fuzzy name tests.
+# names are split into character n_grams, weighted by tf-idf and l2 normalized,
+# then the cosine top n_matches of every name are computed in row blocks
+# spread over a process pool, each block scoring one column chunk of the lookup at a time
+# and carrying only the best matches of its rows to the next chunk, so memory is bounded
+# by the block and chunk sizes rather than by the full (names x lookup) similarity matrix.
+# pool workers are started by a fork server, not forked from the threads of the pipeline,
+# and memory-map the matrices saved once per call to a temporary folder.
+# matches are returned as long aligned arrays of positions and scores (one row per pair),
+# records are attached by the callers with a single positional gather.
+# a self match scores every pair of rows once: each block scores its rows only against the rows after them
+# (the upper triangle of the similarity matrix), skipping the chunks before it. every score counts for both
+# rows, the later row keeps it when it reaches a lower bound of its n_matches-th best score, the bound being
+# its n_matches-th best score within a window of neighbouring rows scored beforehand, so every row still gets
+# its n_matches best matches among all other rows.
+
+# number of query rows scored at once by a single worker
+BLOCK_SIZE = 500
+
+# bumped whenever tokenization or weighting changes, invalidating saved indexes
+INDEX_VERSION = 1
+
+# number of lookup rows per column chunk scored at once by a block
+CHUNK_SIZE = 25_000
+
+# rows scored against every row of a self match to bound its n_matches-th best score,
+# a wider window gives a tighter bound so fewer scores are kept for the later rows
+BOUND_WINDOW = 2_000
+
+# saved indexes kept in the cache folder, the least recently used are removed,
+# enough for a parameter sweep over a few n_gram values next to the monthly runs
+INDEX_CACHE_SIZE = 4
+
+# matrices of the current call in a pool worker, loaded once per worker by the initializer
+_worker_matrices = None
+
+
+def ngrams(string, n=3):
+    '''split a name into character n_grams after removing punctuation,
+    same tokenization as tfidf matcher so match results stay comparable'''
+    string = re.sub(r'[,-./]|\sBD', r'', string)
+    return [string[i:i + n] for i in range(len(string) - n + 1)]
+
+
+def _count_matrix(names, n_gram, vocabulary, grow):
+    '''building sparse n_gram count matrix, new n_grams are only
+    added to the vocabulary while fitting (grow = True)'''
+    indices = []
+    indptr = [0]
+
+    for name in names:
+        for gram in ngrams(str(name).lower(), n_gram):
+            if grow:
+                indices.append(vocabulary.setdefault(gram, len(vocabulary)))
+            elif gram in vocabulary:
+                indices.append(vocabulary[gram])
+        indptr.append(len(indices))
+
+    counts = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int64), np.array(indptr, dtype=np.int64)),
+                               shape=(len(indptr) - 1, len(vocabulary)))
+
+    counts.sum_duplicates()
+
+    return counts
+
+
+def _normalize(counts, idf):
+    '''applying idf weights and l2 row normalization so that a dot product
+    between two rows is their cosine similarity'''
+    matrix = sparse.csr_matrix(counts.multiply(idf.reshape(1, -1)), dtype=np.float32)
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1
+
+    return sparse.csr_matrix(sparse.diags(1 / norms).dot(matrix), dtype=np.float32)
+
+
+def fit_ngram_index(names, n_gram):
+    '''fitting n_gram vocabulary and smoothed idf weights on the lookup names,
+    returns the index used for matching any other list of names against them'''
+    vocabulary = {}
+
+    counts = _count_matrix(names, n_gram, vocabulary, grow=True)
+
+    document_frequency = np.bincount(counts.indices, minlength=len(vocabulary))
+
+    idf = (np.log((1 + counts.shape[0]) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    return {'n_gram': n_gram, 'vocabulary': vocabulary, 'idf': idf, 'matrix': _normalize(counts, idf)}
+
+
+def transform_names(index, names):
+    '''vectorizing names using an already fitted index, unknown n_grams are ignored'''
+    counts = _count_matrix(
+        names, index['n_gram'], index['vocabulary'], grow=False)
+
+    return _normalize(counts, index['idf'])
+
+
+def index_key(names, n_gram):
+    '''content hash identifying an index fitted on these names with this n_gram'''
+    digest = hashlib.sha256(f'{INDEX_VERSION}|{n_gram}|'.encode('utf-8'))
+
+    for name in names:
+        digest.update(str(name).encode('utf-8'))
+        digest.update(b'\x00')
+
+    return digest.hexdigest()
+
+
+def save_ngram_index(index, folder):
+    '''saving vocabulary, idf weights and normalized matrix as plain .npy files
+    so they can be memory-mapped on load, written to a temporary folder first
+    so an interrupted run never leaves a partial index behind'''
+    temp_folder = folder + '.tmp'
+
+    shutil.rmtree(temp_folder, ignore_errors=True)
+    os.makedirs(temp_folder)
+
+    matrix = index['matrix']
+
+    vocabulary = np.empty(len(index['vocabulary']), dtype=object)
+    vocabulary[list(index['vocabulary'].values())] = list(index['vocabulary'].keys())
+
+    np.save(os.path.join(temp_folder, 'vocabulary.npy'), vocabulary.astype(str))
+    np.save(os.path.join(temp_folder, 'idf.npy'), index['idf'])
+    np.save(os.path.join(temp_folder, 'data.npy'), matrix.data)
+    np.save(os.path.join(temp_folder, 'indices.npy'), matrix.indices)
+    np.save(os.path.join(temp_folder, 'indptr.npy'), matrix.indptr)
+
+    with open(os.path.join(temp_folder, 'meta.json'), 'w') as f:
+        json.dump({'n_gram': index['n_gram'], 'shape': list(matrix.shape)}, f)
+
+    shutil.rmtree(folder, ignore_errors=True)
+    os.replace(temp_folder, folder)
+
+
+def load_ngram_index(folder):
+    '''loading an index saved by save_ngram_index, matrix arrays are memory-mapped'''
+    with open(os.path.join(folder, 'meta.json')) as f:
+        meta = json.load(f)
+
+    def load(name):
+        return np.load(os.path.join(folder, name + '.npy'), mmap_mode='r')
+
+    matrix = sparse.csr_matrix((load('data'), load('indices'), load('indptr')),
+                               shape=tuple(meta['shape']), copy=False)
+
+    vocabulary = {gram: i for i, gram in enumerate(load('vocabulary').tolist())}
+
+    return {'n_gram': meta['n_gram'], 'vocabulary': vocabulary, 'idf': np.asarray(load('idf')), 'matrix': matrix}
+
+
+def cached_ngram_index(names, n_gram, folder):
+    '''loading the index of these names from the cache folder, fitting and saving it
+    only when the names or n_gram changed since it was last built'''
+    names = list(names)
+
+    index_folder = os.path.join(
+        folder, f'vendor_index_{index_key(names, n_gram)[:16]}')
+
+    if os.path.exists(os.path.join(index_folder, 'meta.json')):
+        print(colored('loading saved vendor name index', 'cyan'))
+        os.utime(index_folder)
+        return load_ngram_index(index_folder)
+
+    index = fit_ngram_index(names, n_gram)
+
+    save_ngram_index(index, index_folder)
+
+    prune_cache(folder, 'vendor_index_', INDEX_CACHE_SIZE)
+
+    return index
+
+
+def _share_matrices(matrices, folder):
+    '''saving the arrays of matrices (csr matrices, arrays and tuples or lists of them) to folder as .npy files,
+    returns a description of matrices to load them back memory-mapped in the pool workers'''
+    if sparse.issparse(matrices):
+        return ('csr', matrices.shape, [_share_matrices(array, folder)
+                                        for array in (matrices.data, matrices.indices, matrices.indptr)])
+
+    if isinstance(matrices, np.ndarray):
+        file_name = os.path.join(folder, f'{len(os.listdir(folder))}.npy')
+        np.save(file_name, matrices)
+        return ('array', file_name)
+
+    if isinstance(matrices, (tuple, list)):
+        return (type(matrices).__name__, [_share_matrices(item, folder) for item in matrices])
+
+    return ('value', matrices)
+
+
+def _load_shared(shared):
+    '''matrices described by _share_matrices, arrays are memory-mapped'''
+    kind, content = shared[0], shared[-1]
+
+    if kind == 'csr':
+        return sparse.csr_matrix(tuple(_load_shared(array) for array in content), shape=shared[1], copy=False)
+
+    if kind == 'array':
+        return np.load(content, mmap_mode='r')
+
+    if kind in ('tuple', 'list'):
+        return (tuple if kind == 'tuple' else list)(_load_shared(item) for item in content)
+
+    return content
+
+
+def _init_worker(shared):
+    global _worker_matrices
+    _worker_matrices = _load_shared(shared)
+
+
+def _worker_task(task, start, end, n_matches):
+    '''running a block task in a pool worker over the matrices set by its initializer,
+    returns its result with the worker pid, the cpu time of the task and the peak memory of the worker'''
+    start_cpu = time.process_time()
+
+    result = task(_worker_matrices, start, end, n_matches)
+
+    return result, os.getpid(), time.process_time() - start_cpu, max_rss()
+
+
+def _worker_result(future):
+    '''result of a block run in a pool, its cpu time and memory are reported to the run report (see vmf_instrument)'''
+    result, pid, cpu_seconds, peak_rss = future.result()
+
+    worker_usage(pid, cpu_seconds, peak_rss)
+
+    return result
+
+
+def rank_rows(row_ids, cols, data, n_matches):
+    '''sorting scores of every row in a descending order, ties broken by lookup position,
+    returns positions of the n_matches best entries of each row and their rank'''
+    order = np.lexsort((cols, -data, row_ids))
+    row_start = np.searchsorted(row_ids[order], row_ids[order], side='left')
+    rank = np.arange(len(order)) - row_start
+    return order[rank < n_matches], rank[rank < n_matches]
+
+
+def _best_of_rows(row_ids, data, n_rows, n_matches):
+    '''positions of the entries reaching the n_matches-th best score of their row (row_ids sorted),
+    the threshold of a row holding more entries is found by partitioning its segment,
+    entries tied at the threshold are all kept and ordered by rank_rows'''
+    lengths = np.bincount(row_ids, minlength=n_rows)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+
+    threshold = np.full(n_rows, -np.inf, dtype=np.float32)
+
+    for row in np.flatnonzero(lengths > n_matches):
+        segment = data[indptr[row]:indptr[row + 1]]
+        threshold[row] = np.partition(segment, len(segment) - n_matches)[len(segment) - n_matches]
+
+    return np.flatnonzero(data >= threshold[row_ids])
+
+
+def _chunked_top_k(query, lookup_chunks, n_matches, positions=None):
+    '''running top n_matches of query rows over the lookup column chunks, only the product of
+    a single chunk is held at a time and only the best entries of each row are carried over.
+    positions are the lookup positions of the query rows in a self match, a row is never matched to itself.
+    returns row ids, lookup positions, scores and rank of the kept entries'''
+    rows, cols = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    data, rank = np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+
+    for offset, chunk in lookup_chunks:
+        scores = sparse.csr_matrix(query.dot(chunk))
+
+        chunk_rows = np.repeat(np.arange(query.shape[0], dtype=np.int64), np.diff(scores.indptr))
+        chunk_cols = scores.indices.astype(np.int64) + offset
+        chunk_data = scores.data
+
+        if positions is not None:
+            other = chunk_cols != positions[chunk_rows]
+            chunk_rows, chunk_cols, chunk_data = chunk_rows[other], chunk_cols[other], chunk_data[other]
+
+        keep = _best_of_rows(chunk_rows, chunk_data, query.shape[0], n_matches)
+
+        # merging the best entries of this chunk into the running top n_matches
+        rows = np.concatenate([rows, chunk_rows[keep]])
+        cols = np.concatenate([cols, chunk_cols[keep]])
+        data = np.concatenate([data, chunk_data[keep]])
+
+        keep, rank = rank_rows(rows, cols, data, n_matches)
+
+        rows, cols, data = rows[keep], cols[keep], data[keep]
+
+    return rows, cols, data, rank
+
+
+def _top_k_block(matrices, start, end, n_matches):
+    '''scoring query rows [start, end) against all lookup rows and keeping
+    the n_matches highest cosine scores of each row'''
+    query_matrix, lookup_chunks = matrices
+
+    n_rows = end - start
+    n_lookup = sum(chunk.shape[1] for _, chunk in lookup_chunks)
+
+    indices = np.zeros((n_rows, n_matches), dtype=np.int64)
+    values = np.zeros((n_rows, n_matches), dtype=np.float32)
+
+    rows, cols, data, rank = _chunked_top_k(query_matrix[start:end], lookup_chunks, n_matches)
+
+    indices[rows, rank] = cols
+    values[rows, rank] = data
+
+    # rows sharing fewer than n_matches n_grams with the lookup are padded
+    # with zero score lookups in their original order, as nearest neighbours would
+    found = np.bincount(rows, minlength=n_rows)
+    for row in np.flatnonzero(found < n_matches):
+        taken = set(indices[row, :found[row]].tolist())
+        indices[row, found[row]:] = list(islice(
+            (i for i in range(n_lookup) if i not in taken), n_matches - found[row]))
+
+    return start, indices, values
+
+
+def _self_top_k_block(matrices, start, end, n_matches):
+    '''scoring the matched rows [start, end) against every other row of the matrix and keeping
+    the n_matches highest cosine scores of each row, a row is never matched to itself'''
+    matrix, lookup_chunks, positions = matrices
+
+    positions = positions[start:end]
+
+    rows, cols, data, _ = _chunked_top_k(matrix[positions], lookup_chunks, n_matches, positions)
+
+    return start, positions[rows], cols, data
+
+
+def _bound_block(matrices, start, end, n_matches):
+    '''lower bound of the n_matches-th best score of rows [start, end) among all other rows:
+    their n_matches-th best score among a window of BOUND_WINDOW rows starting at the block,
+    0 for rows of windows too small to hold n_matches other rows'''
+    (matrix,) = matrices
+
+    size = max(BOUND_WINDOW, end - start)
+
+    window_start = max(min(start, matrix.shape[0] - size), 0)
+
+    scores = matrix[start:end].dot(matrix[window_start:window_start + size].T).toarray()
+
+    # a row is never its own match
+    scores[np.arange(end - start), np.arange(start, end) - window_start] = 0
+
+    bound = np.zeros(end - start, dtype=scores.dtype)
+
+    if scores.shape[1] > n_matches:
+        bound[:] = np.partition(scores, scores.shape[1] - n_matches, axis=1)[:, scores.shape[1] - n_matches]
+
+    # lowered slightly so a score tied with the bound is never lost to rounding
+    return start, bound * (1 - 1e-6)
+
+
+def _upper_top_k_block(matrices, start, end, n_matches):
+    '''scoring rows [start, end) against the rows after them only and keeping the n_matches highest
+    cosine scores of each row (see _chunked_top_k), every score is also kept for the later row when it
+    reaches its bound. returns the best matches of the block rows and the scores kept for the later rows'''
+    matrix, lookup_chunks, bound = matrices
+
+    n_rows = end - start
+
+    # the chunk holding the first row is cut at that row, the chunks before it are skipped
+    pieces = []
+
+    for offset, chunk in lookup_chunks:
+        if offset + chunk.shape[1] <= start:
+            continue
+
+        if offset < start:
+            offset, chunk = start, sparse.csr_matrix(matrix[start:offset + chunk.shape[1]].T)
+
+        pieces.append((offset, chunk))
+
+    rows, cols = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    data = np.zeros(0, dtype=np.float32)
+
+    later_rows, later_cols, later_data = [], [], []
+
+    query = matrix[start:end]
+
+    for offset, chunk in pieces:
+        scores = sparse.csr_matrix(query.dot(chunk))
+
+        chunk_rows = np.repeat(np.arange(n_rows, dtype=np.int64), np.diff(scores.indptr))
+        chunk_cols = scores.indices.astype(np.int64) + offset
+        chunk_data = scores.data
+
+        # pieces overlapping the block hold the rows before each row and the row itself
+        if offset < end:
+            later = chunk_cols > chunk_rows + start
+            chunk_rows, chunk_cols, chunk_data = chunk_rows[later], chunk_cols[later], chunk_data[later]
+
+        reached = chunk_data >= bound[chunk_cols]
+        later_rows.append(chunk_cols[reached])
+        later_cols.append(chunk_rows[reached] + start)
+        later_data.append(chunk_data[reached])
+
+        keep = _best_of_rows(chunk_rows, chunk_data, n_rows, n_matches)
+
+        # merging the best entries of this piece into the running top n_matches
+        rows = np.concatenate([rows, chunk_rows[keep]])
+        cols = np.concatenate([cols, chunk_cols[keep]])
+        data = np.concatenate([data, chunk_data[keep]])
+
+        keep, _ = rank_rows(rows, cols, data, n_matches)
+
+        rows, cols, data = rows[keep], cols[keep], data[keep]
+
+    return start, np.concatenate([rows + start] + later_rows), np.concatenate([cols] + later_cols), \
+        np.concatenate([data] + later_data)
+
+
+def _lookup_chunks(lookup_matrix, chunk_size):
+    '''lookup split into transposed column chunks once, so every block is a plain csr product'''
+    return [(offset, sparse.csr_matrix(lookup_matrix[offset:offset + chunk_size].T))
+            for offset in range(0, lookup_matrix.shape[0], chunk_size)]
+
+
+def _executor(n_jobs, shared):
+    '''process pool loading the shared matrices in its workers. workers are started by a fork server
+    (spawned where fork isn't available), never forked from the calling process: matchers run in the
+    threads of the pipeline, and forking a threaded process copies the locks held by the other threads'''
+    if 'forkserver' in mp.get_all_start_methods():
+        mp_context = mp.get_context('forkserver')
+        mp_context.set_forkserver_preload(['__main__', 'vmf_matcher'])
+    else:
+        mp_context = mp.get_context('spawn')
+
+    return ProcessPoolExecutor(max_workers=n_jobs, mp_context=mp_context,
+                               initializer=_init_worker, initargs=(shared,))
+
+
+def _run_blocks(task, n_rows, n_matches, matrices, block_size, n_jobs):
+    '''running task over row blocks in a pool, yields block results as they
+    finish and reports progress per block. blocks run in the calling thread are
+    given the matrices directly, so matchers running in parallel threads never share them'''
+    n_jobs = n_jobs or os.cpu_count() or 1
+
+    blocks = [(start, min(start + block_size, n_rows))
+              for start in range(0, n_rows, block_size)]
+
+    executor = shared_folder = None
+
+    if n_jobs == 1 or len(blocks) <= 1:
+        done = (task(matrices, start, end, n_matches) for start, end in blocks)
+    else:
+        # matrices are handed to the workers as memory-mapped files rather than copied to each of them
+        shared_folder = tempfile.mkdtemp(prefix='vmf_matcher_')
+        executor = _executor(n_jobs, _share_matrices(matrices, shared_folder))
+        futures = [executor.submit(_worker_task, task, start, end, n_matches)
+                   for start, end in blocks]
+        done = (_worker_result(future) for future in as_completed(futures))
+
+    try:
+        for i, result in enumerate(done, 1):
+            print(colored(f'matched block {i} of {len(blocks)}', 'cyan'), end='\r')
+            yield result
+    finally:
+        if executor is not None:
+            executor.shutdown()
+            shutil.rmtree(shared_folder, ignore_errors=True)
+
+    print()
+
+
+def top_k_matches(query_matrix, lookup_matrix, n_matches, block_size=BLOCK_SIZE, chunk_size=CHUNK_SIZE, n_jobs=None):
+    '''computing the n_matches nearest lookup rows of every query row,
+    returns two (query rows x n_matches) arrays of lookup positions and cosine scores
+    sorted in a descending order'''
+    n_rows = query_matrix.shape[0]
+    n_matches = min(n_matches, lookup_matrix.shape[0])
+
+    indices = np.zeros((n_rows, n_matches), dtype=np.int64)
+    values = np.zeros((n_rows, n_matches), dtype=np.float32)
+
+    for start, block_indices, block_values in _run_blocks(_top_k_block, n_rows, n_matches,
+                                                          (query_matrix, _lookup_chunks(lookup_matrix, chunk_size)),
+                                                          block_size, n_jobs):
+        indices[start:start + len(block_indices)] = block_indices
+        values[start:start + len(block_values)] = block_values
+
+    return indices, values
+
+
+def self_top_k_matches(matrix, n_matches, rows=None, block_size=BLOCK_SIZE, chunk_size=CHUNK_SIZE, n_jobs=None):
+    '''matching rows of a matrix against themselves, each row keeps its n_matches best matches
+    among all other rows, rows optionally restricts the matched rows to these positions.
+    every pair is scored once when all rows are matched (see _upper_top_k_block).
+    returns three aligned arrays (row position, match position, cosine score)
+    sorted by row and in a descending order of score within each row'''
+    lookup_chunks = _lookup_chunks(matrix, chunk_size)
+
+    left, right, scores = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.float32)]
+
+    if rows is None:
+        bound = np.zeros(matrix.shape[0], dtype=matrix.dtype)
+
+        for start, block_bound in _run_blocks(_bound_block, matrix.shape[0], n_matches, (matrix,), block_size, n_jobs):
+            bound[start:start + len(block_bound)] = block_bound
+
+        task, n_rows, matrices = _upper_top_k_block, matrix.shape[0], (matrix, lookup_chunks, bound)
+    else:
+        rows = np.asarray(rows, dtype=np.int64)
+        task, n_rows, matrices = _self_top_k_block, len(rows), (matrix, lookup_chunks, rows)
+
+    for _, block_left, block_right, block_scores in _run_blocks(task, n_rows, n_matches, matrices, block_size, n_jobs):
+        left.append(block_left)
+        right.append(block_right)
+        scores.append(block_scores)
+
+        # scores kept for later rows are merged as blocks finish, so they never exceed a few matches per row
+        if sum(len(block) for block in left) > 2 * matrix.shape[0] * n_matches:
+            keep, _ = rank_rows(np.concatenate(left), np.concatenate(right), np.concatenate(scores), n_matches)
+            left, right, scores = [np.concatenate(left)[keep]], [np.concatenate(right)[keep]], [np.concatenate(scores)[keep]]
+
+    left, right, scores = np.concatenate(left), np.concatenate(right), np.concatenate(scores)
+
+    # blocks finish in any order, the best matches of every row are sorted by row and rank
+    keep, _ = rank_rows(left, right, scores, n_matches)
+
+    return left[keep], right[keep], scores[keep]
+
+
+def fold_pairs(left, right, scores, n_rows):
+    '''folding the matches of a self match into unordered pairs, a pair is kept when either of its rows
+    ranks the other and (j, i) is folded onto (i, j). returns left positions, right positions and scores,
+    every pair once with left before right'''
+    left, right = np.minimum(left, right), np.maximum(left, right)
+
+    _, first = np.unique(left * n_rows + right, return_index=True)
+
+    return left[first], right[first], scores[first]
+
+
+def self_top_k_pairs(matrix, n_matches, block_size=BLOCK_SIZE, chunk_size=CHUNK_SIZE, n_jobs=None):
+    '''matching rows of a matrix against themselves (see self_top_k_matches),
+    returns three aligned arrays (left position, right position, cosine score)
+    holding every pair ranked by either of its rows once, left always before right'''
+    return fold_pairs(*self_top_k_matches(matrix, n_matches, block_size=block_size, chunk_size=chunk_size,
+                                          n_jobs=n_jobs), matrix.shape[0])
+
+
+def top_k_pairs(query_matrix, lookup_matrix, n_matches, block_size=BLOCK_SIZE, n_jobs=None):
+    '''long format of top_k_matches, returns three aligned arrays (query position, lookup position,
+    cosine score) holding the n_matches best matches of every query row in a descending order'''
+    indices, values = top_k_matches(query_matrix, lookup_matrix, n_matches, block_size=block_size, n_jobs=n_jobs)
+
+    return np.repeat(np.arange(indices.shape[0], dtype=np.int64), indices.shape[1]), indices.ravel(), values.ravel()
+
+
+def matcher(original, lookup, n_gram=3, n_matches=10, index=None, block_size=BLOCK_SIZE, n_jobs=None):
+    '''matching each of the original names to its n_matches closest lookup names,
+    returns original positions, lookup positions and cosine scores of the matched pairs (see top_k_pairs).
+    an index already fitted on the lookup names can be passed to skip vectorizing them'''
+    if index is None:
+        index = fit_ngram_index(list(lookup), n_gram)
+
+    return top_k_pairs(transform_names(index, list(original)), index['matrix'], n_matches,
+                       block_size=block_size, n_jobs=n_jobs)
+
+
+def self_matcher(names, n_gram=3, n_matches=10, index=None, block_size=BLOCK_SIZE, n_jobs=None):
+    '''matching a list of names against itself without self pairs or reverse duplicates,
+    returns left positions, right positions and cosine scores of the matched pairs'''
+    if index is None:
+        index = fit_ngram_index(list(names), n_gram)
+
+    return self_top_k_pairs(index['matrix'], n_matches, block_size=block_size, n_jobs=n_jobs)
@@ -0,0 +1,89 @@
+import pandas as pd
+from termcolor import colored
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# compact in-memory representation of the loaded inputs (low-memory mode).
+# columns keep the dtypes read from the CSV files by default, object strings and int64 ids,
+# low-memory mode shrinks them according to the rules below:
+#   categories ---> low cardinality labels held as categorical codes
+#   strings    ---> free text held as Arrow strings, left as objects without pyarrow
+#   integers   ---> ids and po numbers downcast to the smallest integer width holding them
+# po totals are kept as int64 since they're summed, and dates are already compact.
+# tests only read these columns, so categorical keys must be grouped with observed=True
+# to get the same groups as with plain strings.
+COMPACT = {
+    'vendors': {'categories': ['vendor_status', 'payment_terms'],
+                'strings': ['name', 'contact_name', 'address'],
+                'integers': ['id', 'creation_user_id', 'modification_user_id']},
+    'access_rights': {'categories': ['departement'],
+                      'integers': ['creation_user_id', 'modification_user_id']},
+    'employees': {'categories': ['departement'], 'strings': ['employee_name', 'address'],
+                  'integers': ['employee_id']},
+    'terminated_employees': {'categories': ['departement', 'termination_reason'],
+                             'strings': ['employee_name', 'address'], 'integers': ['employee_id']},
+    'po': {'categories': ['po_approval_status', 'po_status', 'currency'],
+           'strings': ['item_description', 'vendor_name'], 'integers': ['po_number']},
+}
+
+# dtype of free text columns, None keeps them as python objects
+STRING_DTYPE = 'string[pyarrow]' if pyarrow is not None else None
+
+
+def compact_frame(df, name):
+    '''applying the compact dtypes of an input (see COMPACT) to a frame or chunk of it,
+    columns missing from the frame are skipped'''
+    spec = COMPACT[name]
+
+    # shallow copy, converted columns replace the original ones without modifying the input
+    df = df.copy(deep=False)
+
+    for col in spec.get('categories', []):
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    if STRING_DTYPE is not None:
+        for col in spec.get('strings', []):
+            if col in df.columns:
+                df[col] = df[col].astype(STRING_DTYPE)
+
+    for col in spec.get('integers', []):
+        # float ids are only downcast when all of them are whole numbers
+        if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+            df[col] = pd.to_numeric(df[col], downcast='integer')
+
+    return df
+
+
+def frame_memory(df):
+    '''memory held by a frame in bytes, including python string objects'''
+    return int(df.memory_usage(deep=True).sum())
+
+
+def compact_frames(frames):
+    '''compacting a dictionary of input frames by name and printing the memory footprint
+    of each one before and after, inputs that aren't loaded (None) are skipped'''
+    report = []
+
+    for name, df in frames.items():
+        if df is None:
+            continue
+
+        before = frame_memory(df)
+
+        frames[name] = compact_frame(df, name)
+
+        report.append({'input': name, 'rows': len(df), 'before_mb': before / 2**20,
+                       'after_mb': frame_memory(frames[name]) / 2**20})
+
+    report = pd.DataFrame(report, columns=['input', 'rows', 'before_mb', 'after_mb'])
+
+    report.loc[len(report)] = ['total', report.rows.sum(),
+                               report.before_mb.sum(), report.after_mb.sum()]
+
+    print(colored(report.to_string(index=False, float_format='{:.2f}'.format), 'cyan'))
+
+    return frames
@@ -0,0 +1,279 @@
+import os
+import re
+import hashlib
+import numpy as np
+import pandas as pd
+from termcolor import colored
+from vmf_io import prune_cache
+
+# name normalization shared by every name matching and similarity test.
+# vendor and employee names are reduced once to a canonical form before being matched:
+#   lower case, accents folded, '&' spelled 'and', apostrophes dropped, any other punctuation
+#   replaced by a space, single spaced and trailing legal suffixes (LLC, Inc, Ltd...) removed,
+# so 'Pfannerstill, LLC' and 'PFANNERSTILL Inc.' share the same canonical name 'pfannerstill'.
+# canonical names are cached next to the input files and reused while the names don't change.
+# abbreviations are found through an acronym index rather than by n_grams:
+#   full names ---> indexed by their initials, with and without stop words, and by any
+#                   abbreviation written between parentheses, i.e. 'Procter and Gamble' ---> 'pg', 'pag'
+#   abbreviations ---> short mostly upper case names, i.e. 'P&G' or 'PwC', looked up by their letters
+#                      and by their capitals, each lookup is a single dictionary access
+# equal canonical names are paired by a hash join (exact_pairs) before any fuzzy matching.
+
+# bumped whenever normalization rules change, invalidating cached canonical names
+NAMES_VERSION = 1
+
+# cached canonical names kept, the least recently used are removed,
+# a run normalizes three lists (vendors, active and terminated employees)
+NAMES_CACHE_SIZE = 6
+
+# legal suffixes removed from the end of names, in their canonical (punctuation free) spelling
+LEGAL_SUFFIXES = ['llc', 'llp', 'lp', 'pllc', 'inc', 'incorporated', 'ltd', 'limited', 'corp', 'corporation',
+                  'co', 'company', 'plc', 'gmbh', 'ag', 'sa', 'bv', 'nv', 'pty', 'pvt']
+
+# words left out of the initials of full names, initials are also indexed with them
+STOP_WORDS = {'and', 'of', 'the', 'for', 'de'}
+
+# letters of a name written as an abbreviation
+ABBREVIATION_LENGTH = (2, 6)
+
+_SUFFIXES = r'(?:\s+(?:' + '|'.join(LEGAL_SUFFIXES) + r'))+$'
+
+
+def canonical_names(names):
+    '''canonical form of every name (see above), names left empty by the suffix removal
+    keep their suffix, i.e. a vendor named 'Inc' stays 'inc' '''
+    names = pd.Series(names, dtype=object).fillna('').astype(str)
+
+    names = names.str.normalize('NFKD').str.replace('[\u0300-\u036f]', '', regex=True).str.lower()
+
+    names = names.str.replace('&', ' and ', regex=False).str.replace(r"['`’]", '', regex=True)
+
+    names = names.str.replace(r'[\W_]+', ' ', regex=True).str.strip()
+
+    return names.str.replace(_SUFFIXES, '', regex=True).to_numpy(dtype=object)
+
+
+def names_key(names):
+    '''content hash identifying a list of names under the current normalization rules'''
+    digest = hashlib.sha256(f'{NAMES_VERSION}|'.encode('utf-8'))
+
+    for name in names:
+        digest.update(str(name).encode('utf-8'))
+        digest.update(b'\x00')
+
+    return digest.hexdigest()
+
+
+def cached_canonical_names(names, folder):
+    '''canonical names loaded from the cache folder, normalized and saved
+    only when the names changed since they were last normalized'''
+    names = list(names)
+
+    file_name = os.path.join(folder, f'canonical_names_{names_key(names)[:16]}.npy')
+
+    if os.path.exists(file_name):
+        print(colored('loading saved canonical names', 'cyan'))
+        os.utime(file_name)
+        return np.load(file_name, allow_pickle=True)
+
+    canonical = canonical_names(names)
+
+    os.makedirs(folder, exist_ok=True)
+
+    # written to a temporary file first so an interrupted run never leaves a partial file behind
+    with open(file_name + '.tmp', 'wb') as f:
+        np.save(f, canonical)
+
+    os.replace(file_name + '.tmp', file_name)
+
+    prune_cache(folder, 'canonical_names_', NAMES_CACHE_SIZE)
+
+    return canonical
+
+
+def abbreviation_keys(name):
+    '''keys an abbreviation is looked up by: its letters and its capitals,
+    no keys when the name doesn't look like an abbreviation'''
+    name = re.sub(_SUFFIXES, '', str(name).strip().rstrip('.'), flags=re.IGNORECASE).strip()
+
+    # abbreviations are single words, optionally joined by '&' or dots, i.e. 'P&G', 'A.B.C.', 'PwC'
+    if not re.fullmatch(r'[A-Za-z]+(?:\s*[&.]\s*[A-Za-z]+)*\.?', name):
+        return set()
+
+    letters = re.sub(r'[^A-Za-z]', '', name)
+
+    capitals = re.sub(r'[^A-Z]', '', letters)
+
+    if not ABBREVIATION_LENGTH[0] <= len(letters) <= ABBREVIATION_LENGTH[1] or 2 * len(capitals) < len(letters):
+        return set()
+
+    return {key.lower() for key in (letters, capitals) if len(key) >= ABBREVIATION_LENGTH[0]}
+
+
+def full_name_keys(name):
+    '''keys a full name is indexed by: its initials with and without stop words,
+    and abbreviations written between parentheses'''
+    name = str(name)
+
+    keys = {alias.lower() for alias in re.findall(r'\(\s*([A-Z]{%d,%d})\s*\)' % ABBREVIATION_LENGTH, name)}
+
+    # words of the name out of parentheses, camel case words split, i.e. PricewaterhouseCoopers
+    words = re.sub(r'\([^)]*\)', ' ', name)
+    words = re.sub(r'([a-z])([A-Z])', r'\1 \2', words).replace('&', ' and ')
+    words = re.sub(_SUFFIXES, '', ' '.join(re.findall(r'[^\W\d_]+', words.lower())))
+    words = words.split()
+
+    if len(words) < 2:
+        return keys
+
+    keys.add(''.join(word[0] for word in words))
+
+    initials = ''.join(word[0] for word in words if word not in STOP_WORDS)
+
+    if len(initials) >= ABBREVIATION_LENGTH[0]:
+        keys.add(initials)
+
+    return keys
+
+
+def build_acronym_index(names):
+    '''positions of the full names under each of their keys'''
+    index = {}
+
+    for position, name in enumerate(names):
+        for key in full_name_keys(name):
+            index.setdefault(key, []).append(position)
+
+    return index
+
+
+def acronym_pairs(index, names):
+    '''matching every abbreviation among names to the full names sharing one of its keys,
+    returns two aligned arrays (abbreviation position, full name position)'''
+    left, right = [], []
+
+    for position, name in enumerate(names):
+        matched = set()
+
+        for key in abbreviation_keys(name):
+            matched.update(index.get(key, ()))
+
+        matched.discard(position)
+
+        left.extend([position] * len(matched))
+        right.extend(sorted(matched))
+
+    return np.array(left, dtype=np.int64), np.array(right, dtype=np.int64)
+
+
+def exact_pairs(left_names, right_names=None):
+    '''pairs of equal canonical names found by a hash join, empty names are left out.
+    without right_names, left_names are paired among themselves, each unordered pair once (left before right).
+    returns two aligned arrays (left position, right position)'''
+    left = pd.DataFrame({'name': np.asarray(left_names, dtype=object), 'left': np.arange(len(left_names))})
+    left = left[left.name != '']
+
+    if right_names is None:
+        right = left.rename(columns={'left': 'right'})
+    else:
+        right = pd.DataFrame({'name': np.asarray(right_names, dtype=object), 'right': np.arange(len(right_names))})
+        right = right[right.name != '']
+
+    pairs = left.merge(right, on='name')
+
+    if right_names is None:
+        pairs = pairs[pairs.left < pairs.right]
+
+    return pairs.left.to_numpy(dtype=np.int64), pairs.right.to_numpy(dtype=np.int64)
+
+
+def name_groups(names):
+    '''group of every record by canonical name, empty names are groups of their own'''
+    names = np.asarray(names, dtype=object)
+
+    groups, _ = pd.factorize(names)
+
+    empty = names == ''
+    groups[empty] = groups.max(initial=-1) + 1 + np.arange(empty.sum())
+
+    return groups
+
+
+def expand_matches(left, right, names, left_names=None):
+    '''pairs of records matched to the first record of a canonical name expanded to
+    every record sharing that name, each pair once. with left_names, the left records are also
+    the first of their canonical name among left_names and are expanded the same way.
+    returns left and right positions'''
+    groups = name_groups(names)
+
+    members = pd.DataFrame({'group': groups, 'right': np.arange(len(groups))})
+
+    if left_names is None:
+        pairs = pd.DataFrame({'left': np.asarray(left, dtype=np.int64), 'group': groups[right]}).drop_duplicates()
+    else:
+        left_groups = name_groups(left_names)
+
+        pairs = pd.DataFrame({'left_group': left_groups[left], 'group': groups[right]}).drop_duplicates().merge(
+            pd.DataFrame({'left_group': left_groups, 'left': np.arange(len(left_groups))}), on='left_group')
+
+    pairs = pairs.merge(members, on='group')
+
+    return pairs.left.to_numpy(dtype=np.int64), pairs.right.to_numpy(dtype=np.int64)
+
+
+def expand_pairs(left, right, names):
+    '''pairs of a self match computed over the first record of every canonical name,
+    expanded to all records sharing these names. returns left and right positions, left before right'''
+    groups = name_groups(names)
+
+    members = pd.DataFrame({'group': groups, 'position': np.arange(len(groups))})
+
+    pairs = pd.DataFrame({'group': groups[left], 'match_group': groups[right]}).merge(members, on='group').merge(
+        members.rename(columns={'group': 'match_group', 'position': 'match_position'}), on='match_group')
+
+    left, right = pairs.position.to_numpy(dtype=np.int64), pairs.match_position.to_numpy(dtype=np.int64)
+
+    return np.minimum(left, right), np.maximum(left, right)
+
+
+def add_pairs(left, right, extra_left, extra_right):
+    '''adding extra pairs of a self match to its pairs, extra pairs are ordered
+    like the others (left before right) and listed once. returns left and right positions
+    and whether every pair is one of the extra pairs'''
+    extra_left, extra_right = np.minimum(extra_left, extra_right), np.maximum(extra_left, extra_right)
+
+    pairs = pd.MultiIndex.from_arrays([np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64)])
+
+    extra = pd.MultiIndex.from_arrays([extra_left.astype(np.int64), extra_right.astype(np.int64)]).unique()
+
+    new = extra[~extra.isin(pairs)]
+
+    return np.concatenate([pairs.get_level_values(0).to_numpy(dtype=np.int64), new.get_level_values(0).to_numpy(dtype=np.int64)]), \
+        np.concatenate([pairs.get_level_values(1).to_numpy(dtype=np.int64), new.get_level_values(1).to_numpy(dtype=np.int64)]), \
+        np.concatenate([pairs.isin(extra), np.ones(len(new), dtype=bool)])
+
+
+def add_acronym_pairs(left, right, acronym_left, acronym_right):
+    '''adding acronym pairs of a self match to its fuzzy pairs (see add_pairs),
+    returns left and right positions and whether every pair was found by the acronym index'''
+    return add_pairs(left, right, acronym_left, acronym_right)
+
+
+def equal_names(left_names, right_names):
+    '''pairs of equal canonical names, empty names are never equal'''
+    left_names = np.asarray(left_names, dtype=object)
+
+    return (left_names == np.asarray(right_names, dtype=object)) & (left_names != '')
+
+
+def match_types(left_names, right_names, acronym=None):
+    '''how each pair was matched: 'exact' for equal (non empty) canonical names,
+    'acronym' for pairs found by the acronym index and 'fuzzy' otherwise'''
+    types = np.full(len(left_names), 'fuzzy', dtype=object)
+
+    if acronym is not None:
+        types[np.asarray(acronym, dtype=bool)] = 'acronym'
+
+    types[equal_names(left_names, right_names)] = 'exact'
+
+    return types
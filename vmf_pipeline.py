@@ -0,0 +1,152 @@
+import os
+import time
+import inspect
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from termcolor import colored
+
+# dependency graph scheduler of the test procedures.
+# every test is declared as a stage naming the inputs it reads and the outputs it produces,
+# a stage is started as soon as all of its inputs are available, so tests that don't depend
+# on the fuzzy matching (weekend modifications, gaps, missing details...) run alongside it
+# and the total run time approaches the longest chain of dependent stages.
+# stages run in threads sharing the loaded data, they must never modify their inputs.
+# stages may also declare the columns they read of their input frames, so that inputs are only
+# loaded with the columns some stage reads (see input_columns).
+
+
+class Stage:
+    '''a test procedure with the names of its inputs and outputs,
+    func is called with the inputs as keyword arguments and returns
+    a single value or a tuple holding one value per output.
+    inputs default to the names of func parameters. columns optionally maps input frames
+    to the columns the stage reads, frames it doesn't list are read whole'''
+
+    def __init__(self, title, func, outputs, inputs=None, columns=None):
+        self.title = title
+        self.func = func
+        self.outputs = tuple(outputs)
+        self.inputs = tuple(inspect.signature(func).parameters) if inputs is None \
+            else tuple(inputs)
+        self.columns = dict(columns or {})
+
+    def __repr__(self):
+        return f'Stage({self.func.__name__}: {", ".join(self.inputs)} -> {", ".join(self.outputs)})'
+
+    def run(self, inputs):
+        '''running the stage over its inputs by name, returns its outputs by name and elapsed seconds'''
+        start_time = time.time()
+
+        result = self.func(**inputs)
+
+        if len(self.outputs) == 1:
+            result = (result,)
+
+        return dict(zip(self.outputs, result)), time.time() - start_time
+
+
+def check_stages(stages, available):
+    '''validating the graph before running anything: every output is produced once,
+    every input is either available upfront or produced by a stage, and there are no cycles'''
+    producers = {}
+
+    for stage in stages:
+        for name in stage.outputs:
+            if name in producers or name in available:
+                raise ValueError(f'{name!r} is produced more than once ({stage!r})')
+            producers[name] = stage
+
+    for stage in stages:
+        for name in stage.inputs:
+            if name not in producers and name not in available:
+                raise ValueError(f'{name!r} required by {stage!r} is never produced')
+
+    # resolving stages in waves, anything left unresolved is part of a cycle
+    resolved = set(available)
+    pending = list(stages)
+
+    while pending:
+        ready = [stage for stage in pending if all(
+            name in resolved for name in stage.inputs)]
+
+        if not ready:
+            raise ValueError(f'stages depend on each other in a cycle: {pending}')
+
+        for stage in ready:
+            resolved.update(stage.outputs)
+            pending.remove(stage)
+
+
+def input_columns(stages, frames):
+    '''columns of every input frame read by the stages, frames maps the input names of the stages
+    to the names of the frames (i.e. 'vmf_df' to 'vendors'). a frame read whole by any stage is None,
+    returns {frame name: set of columns or None}'''
+    columns = {}
+
+    for input_name, frame in frames.items():
+        readers = [stage for stage in stages if input_name in stage.inputs]
+
+        if any(input_name not in stage.columns for stage in readers):
+            columns[frame] = None
+        else:
+            columns[frame] = {col for stage in readers for col in stage.columns[input_name]}
+
+    return columns
+
+
+def run_stages(stages, context, max_workers=None, checkpoint=None, report=None):
+    '''running stages concurrently in a thread pool as their inputs become available,
+    context holds the values available upfront and receives the outputs of every stage,
+    later stages get these outputs in memory. max_workers of 1 runs the stages one after
+    another in declaration order. checkpoint is an optional function called with the name
+    and value of every output as it's produced, to persist intermediate results.
+    report is an optional vmf_instrument.RunReport recording the measures of every stage'''
+    check_stages(stages, context)
+
+    max_workers = max_workers or os.cpu_count() or 1
+
+    pending = list(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            # starting every stage whose inputs are available, up to the number of workers
+            for stage in [stage for stage in pending if all(name in context for name in stage.inputs)]:
+                if len(running) >= max_workers:
+                    break
+
+                print(f'\n{stage.title}...\n')
+                pending.remove(stage)
+                inputs = {name: context[name] for name in stage.inputs}
+
+                running[executor.submit(stage.run, inputs) if report is None else executor.submit(
+                    report.measure, ', '.join(stage.outputs), stage.title, stage.run, inputs)] = stage
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                stage = running.pop(future)
+
+                try:
+                    result = future.result()
+                except Exception:
+                    # not starting anything else, stages already running are waited for
+                    pending.clear()
+                    raise
+
+                if report is None:
+                    outputs, seconds = result
+                else:
+                    (outputs, _), record = result
+                    seconds = record['wall_seconds']
+
+                context.update(outputs)
+
+                if checkpoint is not None:
+                    for name, value in outputs.items():
+                        checkpoint(name, value)
+
+                print(colored(
+                    f"\nSuccess! {stage.title} took {seconds} seconds.", 'yellow'))
+                print(colored('-'*80, 'magenta'))
+
+    return context
@@ -0,0 +1,141 @@
+import os
+import datetime as dt
+import numpy as np
+import pandas as pd
+import xlsxwriter
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# report writer of the test results.
+# the Excel workbook is written in xlsxwriter constant memory mode: rows are written in order
+# and flushed to disk as soon as the next row starts, so memory doesn't grow with the workbook.
+# detail tables longer than an Excel sheet are split over several sheets (name, name_2, name_3...)
+# and can also be saved in full next to the workbook as Parquet or gzipped CSV files,
+# optionally keeping only their first rows in the workbook for a fast review copy.
+
+# rows of an Excel sheet, including the header row
+EXCEL_MAX_ROWS = 1_048_576
+
+# characters of an Excel sheet name
+SHEET_NAME_LENGTH = 31
+
+# detail table formats saved next to the workbook, with their file extension
+DETAIL_FORMATS = {'parquet': '.parquet', 'csv': '.csv.gz'}
+
+
+def open_workbook(file_name):
+    '''constant memory workbook with the header and date formats used by pandas to_excel,
+    returns the workbook and its formats by name'''
+    workbook = xlsxwriter.Workbook(file_name, {'constant_memory': True})
+
+    formats = {'header': workbook.add_format({'bold': True, 'border': 1, 'align': 'center', 'valign': 'top'}),
+               'datetime': workbook.add_format({'num_format': 'YYYY-MM-DD HH:MM:SS'}),
+               'date': workbook.add_format({'num_format': 'YYYY-MM-DD'})}
+
+    return workbook, formats
+
+
+def _cell_values(series):
+    '''python values of a column ready to be written, None for missing values'''
+    if pd.api.types.is_datetime64_any_dtype(series):
+        values = np.empty(len(series), dtype=object)
+        values[:] = series.dt.tz_localize(None).dt.to_pydatetime() if series.dt.tz is not None \
+            else series.dt.to_pydatetime()
+        values[series.isna().to_numpy()] = None
+        return values
+
+    values = series.astype(object).to_numpy()
+
+    # copy on write (pandas 3) hands out read only views of object columns
+    if not values.flags.writeable:
+        values = values.copy()
+
+    values[pd.isna(values)] = None
+
+    return values
+
+
+def write_table(worksheet, df, start_row, formats, start_col=0):
+    '''writing a frame with its header at start_row, one row at a time,
+    missing values are left empty. returns the row following the table'''
+    for col, name in enumerate(df.columns):
+        worksheet.write(start_row, start_col + col, name if isinstance(
+            name, (str, int, float)) else str(name), formats['header'])
+
+    columns = [_cell_values(df.iloc[:, col]) for col in range(df.shape[1])]
+
+    for row, values in enumerate(zip(*columns), start=start_row + 1):
+        for col, value in enumerate(values, start=start_col):
+            if value is None:
+                continue
+
+            if isinstance(value, np.generic):
+                value = value.item()
+
+            if isinstance(value, dt.datetime):
+                worksheet.write_datetime(row, col, value, formats['datetime'])
+            elif isinstance(value, dt.date):
+                worksheet.write_datetime(row, col, value, formats['date'])
+            elif isinstance(value, float) and np.isinf(value):
+                # same representation as pandas to_excel
+                worksheet.write_string(row, col, 'inf' if value > 0 else '-inf')
+            else:
+                worksheet.write(row, col, value)
+
+    return start_row + 1 + len(df)
+
+
+def sheet_name(name, part):
+    '''name of the part-th sheet (1 based) of a detail table, shortened to fit Excel's limit'''
+    if part == 1:
+        return name[:SHEET_NAME_LENGTH]
+
+    suffix = f'_{part}'
+
+    return name[:SHEET_NAME_LENGTH - len(suffix)] + suffix
+
+
+def write_detail_sheets(workbook, name, df, formats, max_rows=None):
+    '''writing a detail table over as many sheets as needed, each holding up to
+    EXCEL_MAX_ROWS - 1 data rows under its header. max_rows keeps only the first rows
+    of the table in the workbook. returns the names of the written sheets'''
+    if max_rows is not None:
+        df = df.iloc[:max_rows]
+
+    rows_per_sheet = EXCEL_MAX_ROWS - 1
+
+    sheets = []
+
+    for part, offset in enumerate(range(0, max(len(df), 1), rows_per_sheet), start=1):
+        worksheet = workbook.add_worksheet(sheet_name(name, part))
+
+        write_table(worksheet, df.iloc[offset:offset + rows_per_sheet], 0, formats)
+
+        sheets.append(worksheet.name)
+
+    return sheets
+
+
+def detail_formats():
+    '''detail table formats that can be saved with the installed packages'''
+    return tuple(name for name in DETAIL_FORMATS if name != 'parquet' or pyarrow is not None)
+
+
+def save_detail_table(df, folder, name, detail_format):
+    '''saving a full detail table as Parquet or gzipped CSV (see DETAIL_FORMATS),
+    written to a temporary file first. returns the saved file'''
+    os.makedirs(folder, exist_ok=True)
+
+    file_name = os.path.join(folder, name + DETAIL_FORMATS[detail_format])
+
+    if detail_format == 'parquet':
+        df.to_parquet(file_name + '.tmp', index=False)
+    else:
+        df.to_csv(file_name + '.tmp', index=False, compression='gzip')
+
+    os.replace(file_name + '.tmp', file_name)
+
+    return file_name
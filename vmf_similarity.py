@@ -0,0 +1,101 @@
+from difflib import SequenceMatcher
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz import process as rf_process
+    from rapidfuzz.distance import Indel
+except ImportError:
+    rf_process = None
+
+# batch string similarity used by every test comparing two columns of names or details.
+# available metrics:
+#   'ratio' ---> difflib SequenceMatcher ratio, identical to scoring each row with SequenceMatcher
+#   'quick' ---> difflib quick_ratio, an upper bound of ratio based on shared characters only,
+#                faster but scores reordered characters as a match
+#   'indel' ---> normalized indel similarity 2 * LCS / (len(a) + len(b)) computed by rapidfuzz
+#                in native code over the whole batch, close to ratio but without difflib's
+#                junk heuristics, requires rapidfuzz to be installed
+METRICS = ('ratio', 'quick', 'indel')
+
+# scores are cached by (metric, a, b) since the same pairs repeat across tests,
+# the cache is dropped once it holds more than CACHE_SIZE pairs
+CACHE_SIZE = 5_000_000
+
+_pair_cache = {}
+
+
+def metric_available(metric):
+    '''whether a metric can run here, 'indel' needs rapidfuzz'''
+    return metric in METRICS and (metric != 'indel' or rf_process is not None)
+
+
+def _as_text(value):
+    return value if isinstance(value, str) else str(value)
+
+
+def _score_pairs(pairs, metric):
+    '''scoring a list of (a, b) text pairs with the selected metric'''
+    if metric == 'ratio':
+        return [SequenceMatcher(None, a, b).ratio() for a, b in pairs]
+
+    if metric == 'quick':
+        return [SequenceMatcher(None, a, b).quick_ratio() for a, b in pairs]
+
+    if rf_process is None:
+        raise ImportError(
+            "similarity metric 'indel' requires rapidfuzz, install it or use 'ratio'")
+
+    return rf_process.cpdist([a for a, _ in pairs], [b for _, b in pairs],
+                             scorer=Indel.normalized_similarity, workers=-1).tolist()
+
+
+def batch_similarity(left, right, metric='ratio'):
+    '''calculating similarities between two aligned arrays of strings,
+    pairs where either side is missing score 0. each distinct pair is scored once
+    and cached, returns a float array of the same length as the inputs'''
+    if metric not in METRICS:
+        raise ValueError(
+            f'unknown similarity metric {metric!r}, expected one of {METRICS}')
+
+    left = np.asarray(left, dtype=object)
+    right = np.asarray(right, dtype=object)
+
+    scores = np.zeros(len(left), dtype=float)
+
+    valid = ~(pd.isna(left) | pd.isna(right))
+
+    if not valid.any():
+        return scores
+
+    # scoring distinct pairs only, then broadcasting back to all rows
+    codes, unique_pairs = pd.factorize(
+        pd.MultiIndex.from_arrays([left[valid], right[valid]]))
+
+    unique_pairs = [(metric, _as_text(a), _as_text(b)) for a, b in unique_pairs]
+
+    # looking up into a local copy of the hits, tests running concurrently may clear the cache meanwhile
+    found = {key: score for key in unique_pairs
+             if (score := _pair_cache.get(key)) is not None}
+
+    missing = [key for key in unique_pairs if key not in found]
+
+    if missing:
+        found.update(
+            zip(missing, _score_pairs([(a, b) for _, a, b in missing], metric)))
+
+        if len(_pair_cache) + len(missing) > CACHE_SIZE:
+            _pair_cache.clear()
+
+        _pair_cache.update((key, found[key]) for key in missing)
+
+    unique_scores = np.array([found[key] for key in unique_pairs], dtype=float)
+
+    scores[valid] = unique_scores[codes]
+
+    return scores
+
+
+def clear_cache():
+    '''dropping all cached pair scores'''
+    _pair_cache.clear()
@@ -0,0 +1,139 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from termcolor import colored
+from vmf_matcher import cached_ngram_index, transform_names, top_k_matches, self_top_k_matches, fold_pairs
+from vmf_similarity import batch_similarity
+from vmf_names import cached_canonical_names, build_acronym_index, acronym_pairs, add_acronym_pairs, add_pairs, \
+    exact_pairs, expand_pairs, expand_matches, equal_names
+
+# parameter sweep over the name matching tests (r1, r2 and r3).
+# names are tokenized once per n_gram and matched once with the largest n_matches,
+# every smaller n_matches is derived by truncating the ranked matches of every name before
+# they are folded and expanded, so a grid of n_gram x n_matches costs about one run per n_gram.
+# pairs are built by the same steps as the tests: exact pairs of equal canonical names first,
+# the fuzzy matches of the first record of every canonical name expanded to the records sharing it,
+# and the acronym pairs of vendors (see vmf_names). the counts of every combination are those of a full run:
+# pairs are the rows of r1, r2 and r3 and close matches the rows of r15, r16 and r17.
+
+
+def _match_counts(prefix, left_names, right_names, similarity_metric, acronym=None):
+    '''counting matched pairs, close matches (similarity >= .6 or acronym) and exact matches (similarity == 1),
+    equal canonical names score 1 without being compared as in the tests'''
+    left_names = np.asarray(left_names, dtype=object)
+    right_names = np.asarray(right_names, dtype=object)
+
+    equal = equal_names(left_names, right_names)
+
+    similarity = np.ones(len(left_names), dtype=float)
+    similarity[~equal] = np.round(batch_similarity(
+        left_names[~equal], right_names[~equal], metric=similarity_metric), 2)
+
+    close = similarity >= .6
+
+    if acronym is not None:
+        close |= acronym
+
+    return {f'{prefix}_pairs': len(similarity), f'{prefix}_close_matches': int(close.sum()),
+            f'{prefix}_exact_matches': int((similarity == 1).sum())}
+
+
+def _ranks(left):
+    '''rank of every match among the matches of its row, matches sorted by row and score (see self_top_k_matches)'''
+    return np.arange(len(left)) - np.searchsorted(left, left, side='left')
+
+
+def parameter_sweep(vendor_df, employee_df, terminated_employee_df, n_grams, n_matches_list, cache_folder,
+                    similarity_metric='ratio'):
+    '''running name matching for every n_gram/n_matches combination,
+    returns a comparison report of match counts and timings for each combination'''
+    names_folder = os.path.join(cache_folder, 'names')
+
+    vendor_names = cached_canonical_names(vendor_df.name, names_folder)
+
+    # vendors sharing a canonical name are matched once, exact pairs and acronyms don't depend on the settings
+    first = np.flatnonzero(~pd.Series(vendor_names).duplicated().to_numpy() | (vendor_names == ''))
+
+    vendor_exact = exact_pairs(vendor_names)
+
+    vendor_acronyms = acronym_pairs(build_acronym_index(vendor_df.name), vendor_df.name)
+
+    # employees without any exact match are matched by the fuzzy engine, the first of every canonical name only
+    employee_lists = []
+
+    for status, df in [('active', employee_df), ('terminated', terminated_employee_df)]:
+        names = cached_canonical_names(df.employee_name, names_folder)
+
+        exact = exact_pairs(names, vendor_names)
+
+        rest_names = names[np.setdiff1d(np.arange(len(names)), exact[0])]
+
+        rest_first = np.flatnonzero(~pd.Series(rest_names).duplicated().to_numpy() | (rest_names == ''))
+
+        employee_lists.append((status, names, exact, rest_names, rest_first))
+
+    max_matches = max(n_matches_list)
+
+    report = []
+
+    for n_gram in sorted(set(n_grams)):
+        print(colored(f'n_gram ---> ### {n_gram} ###', 'cyan'))
+
+        # tokenizing once per n_gram
+        start_time = time.time()
+
+        index = cached_ngram_index(list(vendor_names), n_gram, cache_folder)
+
+        employee_matrices = [(status, names, exact, rest_names, rest_first,
+                              transform_names(index, list(rest_names[rest_first])))
+                             for status, names, exact, rest_names, rest_first in employee_lists]
+
+        tokenize_seconds = time.time() - start_time
+
+        # matching once with the largest n_matches
+        start_time = time.time()
+
+        vendor_left, vendor_right, vendor_scores = self_top_k_matches(
+            index['matrix'][first], max_matches)
+
+        vendor_rank = _ranks(vendor_left)
+
+        employee_matches = [(status, names, exact, rest_names, rest_first,
+                             top_k_matches(matrix, index['matrix'], max_matches))
+                            for status, names, exact, rest_names, rest_first, matrix in employee_matrices]
+
+        match_seconds = time.time() - start_time
+
+        # deriving every n_matches by truncation, then folding and expanding as the tests do
+        for n_matches in sorted(set(n_matches_list)):
+            start_time = time.time()
+
+            row = {'n_gram': n_gram, 'n_matches': n_matches}
+
+            in_top = vendor_rank < n_matches
+
+            vendor_pos, match_pos, _ = fold_pairs(
+                vendor_left[in_top], vendor_right[in_top], vendor_scores[in_top], len(first))
+            vendor_pos, match_pos = expand_pairs(first[vendor_pos], first[match_pos], vendor_names)
+            vendor_pos, match_pos, _ = add_pairs(vendor_pos, match_pos, *vendor_exact)
+            vendor_pos, match_pos, acronym = add_acronym_pairs(vendor_pos, match_pos, *vendor_acronyms)
+
+            row.update(_match_counts('vendor', vendor_names[vendor_pos], vendor_names[match_pos],
+                                     similarity_metric, acronym))
+
+            for status, names, (exact_left, exact_right), rest_names, rest_first, (indices, _) in employee_matches:
+                indices = indices[:, :n_matches]
+
+                employee_pos, vendor_pos = expand_matches(
+                    np.repeat(rest_first, indices.shape[1]), indices.ravel(), vendor_names, rest_names)
+
+                row.update(_match_counts(status, np.concatenate([names[exact_left], rest_names[employee_pos]]),
+                                         vendor_names[np.concatenate([exact_right, vendor_pos])], similarity_metric))
+
+            row.update({'tokenize_seconds': round(tokenize_seconds, 3), 'match_seconds': round(match_seconds, 3),
+                        'derive_seconds': round(time.time() - start_time, 3)})
+
+            report.append(row)
+
+    return pd.DataFrame(report)
@@ -0,0 +1,309 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from termcolor import colored
+from vmf_io import INPUTS
+
+# synthetic input generator for scaling tests of the full pipeline.
+# all five input lists are generated with the column schema of the VMF.xlsm exports at any scale,
+# with the irregularities the tests look for planted at fixed rates (see PLANTED):
+#   duplicates     ---> vendors repeated with a typo in their name, sharing some of their details
+#   abbreviations  ---> vendors recorded twice, under their full name and under its initials
+#   employees      ---> vendors named after active employees (exactly or with a typo), sharing their details
+#   terminated     ---> vendors named after terminated employees, receiving POs after the termination date
+#   non_english    ---> vendor names holding accented characters
+#   id_gaps        ---> vendor ids skipped in the sequence
+#   po_duplicates  ---> po numbers issued twice
+#   weekends       ---> vendor records created or modified on weekends
+#   abnormal_hours ---> vendor records created or modified at night
+#   unauthorized   ---> vendor records created or modified by users missing from the access rights
+# everything else is drawn at random from a seeded generator, so a seed and a scale always give the same data.
+
+# share of records carrying each planted irregularity
+PLANTED = {'duplicates': .02, 'abbreviations': .002, 'employees': .01, 'terminated': .005, 'non_english': .002,
+           'id_gaps': .005, 'po_duplicates': .004, 'weekends': .05, 'abnormal_hours': .03, 'unauthorized': .03}
+
+SYLLABLES = ['an', 'ber', 'co', 'da', 'el', 'fi', 'gor', 'ha', 'in', 'jo', 'ka', 'lu', 'mar', 'ne', 'ol', 'pe',
+             'qui', 'ra', 'son', 'ta', 'ul', 've', 'wil', 'xa', 'yo', 'ze', 'bre', 'chi', 'dor', 'fen', 'gal',
+             'hil', 'ker', 'lin', 'mor', 'nor', 'pat', 'ros', 'sti', 'tor']
+
+COMPANY_SUFFIXES = ['Inc', 'LLC', 'Group', 'and Sons', 'Ltd', 'Co']
+
+STREET_TYPES = ['Drive', 'Trail', 'Way', 'Pass', 'Lane', 'Center', 'Court', 'Plaza', 'Circle', 'Parkway']
+
+PAYMENT_TERMS = ['n/30', '2/10, n/30', 'n/15', '100% in advance', '5/10, n/30']
+
+DEPARTMENTS = ['Engineering', 'Human Resources', 'Sales', 'Services', 'Research and Development', 'Support',
+               'Product Management', 'Business Development', 'Legal', 'Marketing', 'Accounting', 'Training',
+               'Procurement']
+
+TERMINATION_REASONS = ['Resignation', 'Retirement', 'Dismissal', 'End of contract', 'Relocation']
+
+ITEMS = ['Office Chairs', 'Printer Paper', 'Laptop', 'Consulting Services', 'Cleaning Services', 'Coffee Beans',
+         'Software License', 'Toner Cartridge', 'Safety Gloves', 'Courier Services']
+
+ACCENTS = str.maketrans('aeiou', 'áéíóú')
+
+
+def _words(rng, n, min_syllables=2, max_syllables=3):
+    '''capitalized made up words of a few syllables'''
+    syllables = np.array(SYLLABLES, dtype=object)
+    counts = rng.integers(min_syllables, max_syllables + 1, n)
+
+    words = syllables[rng.integers(0, len(syllables), n)]
+
+    for i in range(1, max_syllables):
+        words = np.where(counts > i, words + syllables[rng.integers(0, len(syllables), n)], words)
+
+    return pd.Series(words, dtype=object).str.capitalize().to_numpy()
+
+
+def _person_names(rng, n):
+    return _words(rng, n, 2, 2) + ' ' + _words(rng, n)
+
+
+def _company_names(rng, n):
+    '''names shaped as "A-B", "A Inc" or "A, B and C"'''
+    first, second, third = _words(rng, n), _words(rng, n), _words(rng, n)
+    suffixes = np.array(COMPANY_SUFFIXES, dtype=object)[rng.integers(0, len(COMPANY_SUFFIXES), n)]
+
+    shape = rng.integers(0, 3, n)
+
+    return np.select([shape == 0, shape == 1], [first + '-' + second, first + ' ' + suffixes],
+                     first + ', ' + second + ' and ' + third)
+
+
+def _typos(rng, names):
+    '''names with one character dropped, never the first one'''
+    positions = rng.integers(1, np.maximum([len(name) for name in names], 2))
+
+    return np.array([name[:i] + name[i + 1:] for name, i in zip(names, positions)], dtype=object)
+
+
+def _digits(rng, n, width):
+    return pd.Series(rng.integers(0, 10 ** width, n)).astype(str).str.zfill(width).to_numpy(dtype=object)
+
+
+def _phones(rng, n):
+    return _digits(rng, n, 3) + '-' + _digits(rng, n, 3) + '-' + _digits(rng, n, 4)
+
+
+def _ssns(rng, n):
+    return _digits(rng, n, 3) + '-' + _digits(rng, n, 2) + '-' + _digits(rng, n, 4)
+
+
+def _addresses(rng, n):
+    streets = np.array(STREET_TYPES, dtype=object)[rng.integers(0, len(STREET_TYPES), n)]
+
+    return pd.Series(rng.integers(1, 99999, n)).astype(str).to_numpy(dtype=object) + ' ' + _words(rng, n) + ' ' + streets
+
+
+def _missing(rng, values, share):
+    '''values with a share of them left empty'''
+    values = np.array(values, dtype=object)
+    values[rng.random(len(values)) < share] = None
+
+    return values
+
+
+def _business_times(rng, n, start, end):
+    '''timestamps on weekdays between 8:00 and 18:00, start may hold one date per timestamp'''
+    start = pd.Series(pd.to_datetime(start), index=range(n))
+    days = pd.DatetimeIndex(start + pd.to_timedelta(rng.integers(
+        0, (pd.to_datetime(end) - start.min()).days, n), unit='D')).normalize()
+
+    # moving weekend days to the following monday
+    days = days + pd.to_timedelta(np.where(days.weekday >= 5, 7 - days.weekday, 0), unit='D')
+
+    return days + pd.to_timedelta(rng.integers(8 * 60, 18 * 60, n), unit='m')
+
+
+def _plant_odd_times(rng, times, weekend_share, night_share):
+    '''moving a share of timestamps to saturdays and another share to night hours'''
+    times = pd.Series(times)
+
+    weekend = rng.random(len(times)) < weekend_share
+    times[weekend] = times[weekend] + pd.to_timedelta(5 - times[weekend].dt.weekday, unit='D')
+
+    night = rng.random(len(times)) < night_share
+    times[night] = times[night].dt.normalize() + pd.to_timedelta(rng.choice([1, 2, 3, 22, 23], night.sum()), unit='h')
+
+    return times
+
+
+def _employees(rng, n, ids, terminated):
+    df = pd.DataFrame({'employee_id': ids, 'employee_name': _person_names(rng, n),
+                       'hiring_date': _business_times(rng, n, '1990-01-01', '2015-01-01').normalize()})
+
+    if terminated:
+        df['termination_date'] = (df.hiring_date + pd.to_timedelta(rng.integers(365, 25 * 365, n), unit='D')).clip(
+            upper=pd.Timestamp('2020-06-30'))
+        df['termination_reason'] = np.array(TERMINATION_REASONS, dtype=object)[rng.integers(0, len(TERMINATION_REASONS), n)]
+
+    df['departement'] = np.array(DEPARTMENTS, dtype=object)[rng.integers(0, len(DEPARTMENTS), n)]
+    df['phone'] = _phones(rng, n)
+    df['postal_code'] = _missing(rng, _digits(rng, n, 5), .5)
+    df['address'] = _addresses(rng, n)
+    df['social_security_number_ssn'] = _ssns(rng, n)
+
+    return df
+
+
+def generate_inputs(n_vendors, n_employees=None, n_terminated=None, n_pos=None, seed=0):
+    '''generating the five input lists by name (see vmf_io.INPUTS) with n_vendors vendors,
+    employee lists and PO list default to the same number of records'''
+    rng = np.random.default_rng(seed)
+
+    n_employees = n_employees or n_vendors
+    n_terminated = n_terminated or n_vendors
+    n_pos = n_pos or n_vendors
+
+    # unique 7 digit employee ids shared by both employee lists
+    employee_ids = rng.choice(9_000_000, size=n_employees + n_terminated, replace=False) + 1_000_000
+
+    employees_df = _employees(rng, n_employees, employee_ids[:n_employees], terminated=False)
+    terminated_employees_df = _employees(rng, n_terminated, employee_ids[n_employees:], terminated=True)
+
+    # access rights: a few accounting and procurement users, every other user is unauthorized
+    n_users = 7
+    access_rights_df = pd.DataFrame({'creation_user_id': employee_ids[:n_users],
+                                     'modification_user_id': employee_ids[n_users:2 * n_users],
+                                     'departement': ['Accounting'] * 3 + ['Procurement'] * (n_users - 3)})
+
+    # planted vendors are taken out of the random ones so the vendor list holds n_vendors records
+    n_duplicates = int(n_vendors * PLANTED['duplicates'])
+    n_abbreviations = int(n_vendors * PLANTED['abbreviations'])
+    n_owned = min(int(n_vendors * PLANTED['employees']), n_employees)
+    n_terminated_owned = min(int(n_vendors * PLANTED['terminated']), n_terminated)
+    n_random = max(n_vendors - n_duplicates - 2 * n_abbreviations - n_owned - n_terminated_owned, 1)
+
+    names = _company_names(rng, n_random)
+
+    vendors = pd.DataFrame({'name': names, 'phone': _phones(rng, n_random), 'postal_code': _digits(rng, n_random, 5),
+                            'address': _addresses(rng, n_random),
+                            'taxpayer_identification_number_tin': np.where(rng.random(n_random) < .5, _ssns(rng, n_random),
+                                                                           _digits(rng, n_random, 2) + '-' + _digits(rng, n_random, 7))})
+
+    # duplicates: a typo in the name, each detail copied half of the time
+    sources = vendors.iloc[rng.integers(0, n_random, n_duplicates)].reset_index(drop=True)
+    duplicates = pd.DataFrame({'name': _typos(rng, sources.name.to_numpy())})
+    for col in ['phone', 'postal_code', 'address', 'taxpayer_identification_number_tin']:
+        duplicates[col] = np.where(rng.random(n_duplicates) < .5, sources[col], vendors[col].to_numpy()[
+            rng.integers(0, n_random, n_duplicates)])
+
+    # abbreviations: "A, B and C" next to "ABC"
+    first, second, third = _words(rng, n_abbreviations), _words(rng, n_abbreviations), _words(rng, n_abbreviations)
+    initials = pd.Series(first).str[0] + pd.Series(second).str[0] + pd.Series(third).str[0]
+    abbreviations = pd.DataFrame({'name': np.concatenate([first + ', ' + second + ' and ' + third, initials.to_numpy()])})
+
+    # vendors owned by employees, sharing their phone and address
+    owners = employees_df.iloc[rng.choice(n_employees, n_owned, replace=False)].reset_index(drop=True)
+    owned = pd.DataFrame({'name': np.where(rng.random(n_owned) < .5, owners.employee_name,
+                                           _typos(rng, owners.employee_name.to_numpy())),
+                          'phone': owners.phone, 'postal_code': owners.postal_code, 'address': owners.address})
+
+    terminated_owners = terminated_employees_df.iloc[rng.choice(
+        n_terminated, n_terminated_owned, replace=False)].reset_index(drop=True)
+    terminated_owned = pd.DataFrame({'name': terminated_owners.employee_name, 'phone': terminated_owners.phone,
+                                     'address': terminated_owners.address})
+
+    vmf_df = pd.concat([vendors, duplicates, abbreviations, owned, terminated_owned], ignore_index=True)
+
+    n = len(vmf_df)
+
+    non_english = rng.random(n) < PLANTED['non_english']
+    vmf_df.loc[non_english, 'name'] = vmf_df.name[non_english].str.translate(ACCENTS)
+
+    # sequential ids with gaps of 2 to 5 ids
+    gaps = np.where(rng.random(n) < PLANTED['id_gaps'], rng.integers(1, 5, n), 0)
+    vmf_df.insert(0, 'id', 100001 + np.arange(n) + np.cumsum(gaps))
+
+    vmf_df.insert(2, 'vendor_status', np.where(rng.random(n) < .035, 'In-Active', 'Active'))
+    vmf_df.insert(3, 'contact_name', _person_names(rng, n))
+    vmf_df.insert(4, 'payment_terms', np.array(PAYMENT_TERMS, dtype=object)[rng.integers(0, len(PAYMENT_TERMS), n)])
+
+    for col, share in [('phone', .25), ('postal_code', .5), ('address', .24), ('taxpayer_identification_number_tin', .47)]:
+        vmf_df[col] = _missing(rng, vmf_df[col], share)
+
+    creation_date = _plant_odd_times(rng, _business_times(rng, n, '2000-01-01', '2005-01-01'),
+                                     PLANTED['weekends'], PLANTED['abnormal_hours'])
+    modification_date = _plant_odd_times(rng, _business_times(rng, n, creation_date, '2010-01-01'),
+                                         PLANTED['weekends'], PLANTED['abnormal_hours'])
+
+    # users missing from the access rights are employees outside of the authorized users
+    def users(authorized):
+        return np.where(rng.random(n) < PLANTED['unauthorized'], employee_ids[rng.integers(2 * n_users, len(employee_ids), n)],
+                        authorized[rng.integers(0, len(authorized), n)])
+
+    vmf_df['creation_date'] = creation_date.to_numpy()
+    vmf_df['creation_user_id'] = users(access_rights_df.creation_user_id.to_numpy())
+    vmf_df['modification_date'] = modification_date.to_numpy()
+    vmf_df['modification_user_id'] = users(access_rights_df.modification_user_id.to_numpy())
+
+    # POs of random vendors, then POs issued to terminated employee vendors after their termination
+    n_terminated_pos = min(n_terminated_owned * 2, n_pos)
+    n_random_pos = n_pos - n_terminated_pos
+
+    terminated_vendors = np.repeat(np.arange(n - n_terminated_owned, n), 2)[:n_terminated_pos]
+    terminated_dates = terminated_owners.termination_date.to_numpy()[terminated_vendors - (n - n_terminated_owned)]
+
+    po_vendors = np.concatenate([rng.integers(0, n, n_random_pos), terminated_vendors])
+
+    po_date = np.concatenate([_business_times(rng, n_random_pos, '2018-01-01', '2021-01-01').normalize().to_numpy(),
+                              (pd.to_datetime(terminated_dates) + pd.to_timedelta(
+                                  rng.integers(1, 180, n_terminated_pos), unit='D')).to_numpy()])
+
+    # increasing po numbers with gaps, some of them issued twice
+    po_number = np.sort(rng.choice(int(n_pos * 1.5) + 10, n_pos, replace=False)) + 1
+    repeated = np.flatnonzero(rng.random(n_pos) < PLANTED['po_duplicates'])
+    po_number[repeated[repeated > 0]] = po_number[repeated[repeated > 0] - 1]
+
+    po_df = pd.DataFrame({'po_number': po_number, 'po_approval_status': 'Approved',
+                          'po_status': np.where(rng.random(n_pos) < .9, 'Closed', 'Open'), 'po_date': po_date,
+                          'item_description': np.array(ITEMS, dtype=object)[rng.integers(0, len(ITEMS), n_pos)],
+                          'vendor_name': vmf_df.name.to_numpy()[po_vendors],
+                          'total_quantity': rng.integers(1, 500, n_pos).astype(float),
+                          'currency': np.where(rng.random(n_pos) < .8, 'EUR', 'USD'),
+                          'po_total': rng.integers(100, 1_000_000, n_pos)})
+
+    # PO lists are exported in no particular order
+    po_df = po_df.iloc[rng.permutation(n_pos)].reset_index(drop=True)
+
+    return {'vendors': vmf_df, 'access_rights': access_rights_df, 'employees': employees_df,
+            'terminated_employees': terminated_employees_df, 'po': po_df}
+
+
+def write_inputs(inputs, folder):
+    '''writing generated input lists as the tab separated utf-16 CSV files read by the script,
+    po totals are written with thousands separators like the excel export'''
+    os.makedirs(folder, exist_ok=True)
+
+    for name, df in inputs.items():
+        if name == 'po':
+            df = df.assign(po_total=df.po_total.map('{:,}'.format))
+
+        df.to_csv(os.path.join(folder, INPUTS[name]['file']), sep='\t', encoding='utf-16', index=False,
+                  date_format='%Y-%m-%d %H:%M:%S')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generating synthetic VMF input lists.')
+    parser.add_argument('folder', help='folder receiving the CSV files')
+    parser.add_argument('--vendors', type=int, default=1000, help='number of vendor records')
+    parser.add_argument('--employees', type=int, help='number of active employees (default: vendors)')
+    parser.add_argument('--terminated', type=int, help='number of terminated employees (default: vendors)')
+    parser.add_argument('--pos', type=int, help='number of POs (default: vendors)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    inputs = generate_inputs(args.vendors, args.employees, args.terminated, args.pos, args.seed)
+
+    write_inputs(inputs, args.folder)
+
+    for name, df in inputs.items():
+        print(colored(f'{INPUTS[name]["file"]} ---> {len(df)} records', 'cyan'))
+
+
+if __name__ == '__main__':
+    main()